@@ -1,35 +1,68 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, status
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 from sqlmodel import select
-from sqlalchemy import delete, func
+from sqlalchemy import case, delete, func
 from sqlmodel.ext.asyncio.session import AsyncSession
-from datetime import timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+import asyncio
 import uuid
+import zipfile
 import time
 import os
 import json
-import httpx
 from xai_sdk import AsyncClient
+from jose import JWTError
 
-from config import XAI_API_KEY, XAI_MANAGEMENT_API_KEY, XAI_MODEL, COST_PER_1M_INPUT, COST_PER_1M_OUTPUT
-from xai_sdk.proto import collections_pb2
-from cache import cache_get, cache_set
-from rag import run_rag
-from database import init_db, get_session
-from models import Collection, Document, User, UsageEvent
+from config import (
+    XAI_API_KEY, XAI_MANAGEMENT_API_KEY, XAI_MODEL, COST_PER_1M_INPUT, COST_PER_1M_OUTPUT, INGEST_SPOOL_DIR,
+    UPLOAD_BATCH_MAX_BYTES, UPLOAD_BATCH_MAX_FILES,
+)
+from cache import cache_get_async, cache_set_async, init_l2, single_flight
+from semantic_cache import semantic_get, semantic_set, semantic_clear
+from rag import run_rag, stream_rag
+from database import init_db, get_session, bump_content_version
+from models import Collection, Document, IngestJob, User, UsageEvent, UsageLatencyBin, UsageRollup
 from ingest_folder import guess_content_type
-from filters import build_metadata
-from xai_helpers import extract_document_id, delete_collection_document
-from auth_utils import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from filters import build_metadata, metadata_fields
+from doc_metadata import delete_document_metadata, prefilter_documents
+from xai_helpers import delete_collection_document
+from reconciler import DocumentStatusReconciler
+from usage_recorder import UsageRecorder
+from usage_rollup import bucket_start as usage_bucket_start, percentile_from_bins
+from ingest_jobs import IngestJobQueue
+from extraction import ExtractionError, extraction_pool
+from content_cache import cached_extract, get_analysis, set_analysis
+from uploads import SpooledUpload, spool_upload, unpack_zip
+from http_client import start_http_client, close_http_client, get_http_client, route_timeout, http_stats
+from profiling import ProfileStore, RequestProfiler, to_collapsed, to_speedscope
+from metrics import (
+    CACHE_LOOKUPS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    ServerTimingMiddleware,
+    mark_worker_dead,
+    render_metrics,
+    timed,
+)
+from auth_utils import (
+    create_access_token,
+    decode_access_token,
+    is_admin,
+    principal_cache,
+    password_hasher,
+    PasswordHasherBusy,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+)
 
 # Setup lifecycle management for DB init
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    init_l2()
     
     # Create default user if not exists (for convenience)
     async for session in get_session():
@@ -39,14 +72,25 @@ async def lifespan(app: FastAPI):
         if not user:
             default_user = User(
                 email="info@gngmeta.com",
-                hashed_password=get_password_hash("admin1234"), 
+                hashed_password=await password_hasher.hash("admin1234"),
                 full_name="GnG Admin"
             )
             session.add(default_user)
             await session.commit()
         break
-        
+
+    await start_http_client()
+    await usage_recorder.start()
+    await reconciler.start()
+    await ingest_queue.start()
     yield
+    await ingest_queue.stop()
+    await reconciler.stop()
+    await usage_recorder.stop()
+    extraction_pool.shutdown()
+    password_hasher.shutdown()
+    await close_http_client()
+    mark_worker_dead()
 
 app = FastAPI(title="Grok RAG Extended API", lifespan=lifespan)
 
@@ -59,7 +103,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    # Readable by the browser UI: list paging cursor, stage timings, profile id
+    expose_headers=["X-Next-After-Id", "Server-Timing", "X-Profile-Id"],
 )
+# Per-stage timers: Server-Timing header and the /metrics histograms
+app.add_middleware(ServerTimingMiddleware)
 
 if not XAI_API_KEY:
     print("Warning: XAI_API_KEY is missing. RAG features will fail.")
@@ -85,26 +133,31 @@ except Exception:
     
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-STATUS_PROCESSED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_PROCESSED
-STATUS_FAILED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_FAILED
+# Background poller for documents still indexing on xAI; handlers read its snapshot
+reconciler = DocumentStatusReconciler(mgmt_client)
+ingest_queue = IngestJobQueue(mgmt_client, reconciler)
+# UsageEvents are buffered and written in batches off the request path
+usage_recorder = UsageRecorder()
+# Opt-in sampling profiles of /chat, /analyze and uploads, downloadable by admins
+request_profiler = RequestProfiler(ProfileStore())
 
-def _status_is_processed(status: object) -> bool:
-    return status in ("DOCUMENT_STATUS_PROCESSED", STATUS_PROCESSED)
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    with timed("auth"):
+        return await _authenticate(token, session)
 
-def _status_is_failed(status: object) -> bool:
-    return status in ("DOCUMENT_STATUS_FAILED", STATUS_FAILED)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
-    from jose import JWTError, jwt
-    from auth_utils import SECRET_KEY, ALGORITHM
-    
+async def _authenticate(token: str, session: AsyncSession) -> User:
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -116,9 +169,41 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
     user = result.first()
     if user is None:
         raise credentials_exception
+    principal_cache.put(token, payload, user)
     return user
 
 
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
+
+
+async def profile_request(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    """
+    Runs the request under the sampling profiler when an admin asks for it
+    (X-Profile: 1 header or ?profile=1) or when 1-in-N sampling picks it.
+    The profile id is returned in the X-Profile-Id header.
+    """
+    asked = request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+    route = request.scope.get("route")
+    run = request_profiler.begin(
+        getattr(route, "path", request.url.path), current_user.email, asked and is_admin(current_user)
+    )
+    if run is None:
+        yield
+        return
+    response.headers["X-Profile-Id"] = run.id
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        await request_profiler.finish(run, error)
+
+
 class Filters(BaseModel):
     category: str | None = None
     tags: list[str] | None = None
@@ -138,6 +223,10 @@ class ChatResponse(BaseModel):
     answer: str
     citations: list[dict] = []
     cached: bool
+    cache_tier: str | None = None  # "l1" (in-process), "l2" (shared disk) or "semantic" on hits
+    coalesced: bool = False  # served by an identical request already in flight
+    semantic_score: float | None = None  # cosine similarity of the matched cached query
+    semantic_evictions: int = 0  # semantic cache entries evicted to store this answer
     latency_ms: int
 
 class CollectionCreate(BaseModel):
@@ -179,13 +268,27 @@ class UserRead(BaseModel):
     email: str
     full_name: Optional[str] = None
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many password checks in progress; retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+    # Reject before touching the DB when every bcrypt slot is taken
+    if password_hasher.saturated():
+        raise _hasher_busy()
     statement = select(User).where(User.email == form_data.username)
     result = await session.exec(statement)
     user = result.first()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
+
+    try:
+        valid = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -204,10 +307,14 @@ async def register(user_in: UserCreate, session: AsyncSession = Depends(get_sess
     result = await session.exec(statement)
     if result.first():
         raise HTTPException(status_code=400, detail="Email already registered")
-        
+
+    try:
+        hashed_password = await password_hasher.hash(user_in.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         full_name=user_in.full_name
     )
     session.add(user)
@@ -222,33 +329,48 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 @app.get("/health")
 async def health():
-    return {"ok": True, "model": XAI_MODEL}
+    return {
+        "ok": True,
+        "model": XAI_MODEL,
+        "extraction": extraction_pool.stats(),
+        "http": http_stats(),
+        "password_hasher": password_hasher.stats(),
+        "profiling": request_profiler.stats(),
+    }
 
 
-def _extract_text(content: bytes, filename: str) -> str:
-    """Extract text from file content for AI analysis."""
-    ext = os.path.splitext(filename.lower())[1]
-    if ext in ('.txt', '.md'):
-        return content.decode('utf-8', errors='replace')
-    if ext in ('.docx', '.doc'):
-        try:
-            import docx, io
-            doc = docx.Document(io.BytesIO(content))
-            return "\n".join(para.text for para in doc.paragraphs if para.text.strip())
-        except Exception:
-            return content.decode('utf-8', errors='replace')
-    if ext == '.pdf':
-        try:
-            import PyPDF2, io
-            reader = PyPDF2.PdfReader(io.BytesIO(content))
-            return "\n".join(page.extract_text() or "" for page in reader.pages)
-        except Exception:
-            return f"[PDF 파일: {filename}]"
-    if ext in ('.doc', '.docx'):
-        return f"[문서 파일: {filename}]"
-    if ext in ('.jpg', '.jpeg', '.png', '.gif'):
-        return f"[이미지 파일: {filename}]"
-    return f"[파일: {filename}]"
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request stage timings, cache and in-flight counters."""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/profiles")
+async def list_profiles(current_user: User = Depends(get_current_admin)):
+    """Stored request profiles, newest first."""
+    profiles = await asyncio.to_thread(request_profiler.store.list)
+    return {"profiles": profiles, **request_profiler.stats()}
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: Literal["speedscope", "collapsed"] = Query("speedscope"),
+    current_user: User = Depends(get_current_admin),
+):
+    """A stored profile as speedscope JSON or collapsed stacks (flamegraph.pl)."""
+    profile = await asyncio.to_thread(request_profiler.store.load, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(
+            to_collapsed(profile["stacks"]),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+        )
+    return JSONResponse(
+        to_speedscope(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
 
 
 ANALYZE_SYSTEM_PROMPT = """당신은 문서 온톨로지 구축을 돕는 전문 AI 어시스턴트입니다.
@@ -263,7 +385,7 @@ ANALYZE_SYSTEM_PROMPT = """당신은 문서 온톨로지 구축을 돕는 전문
 }"""
 
 
-@app.post("/analyze")
+@app.post("/analyze", dependencies=[Depends(profile_request)])
 async def analyze_document(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
@@ -272,10 +394,24 @@ async def analyze_document(
     if not XAI_API_KEY:
         raise HTTPException(status_code=500, detail="API Key가 설정되지 않았습니다.")
 
-    content = await file.read()
     filename = file.filename or "unknown"
-
-    text = _extract_text(content, filename)
+    spooled = await spool_upload(file, MAX_FILE_SIZE, allow_empty=True)
+    try:
+        # Identical bytes were analyzed before: skip parsing and the LLM call
+        sha = spooled.sha256
+        cached_analysis = await get_analysis(sha, XAI_MODEL)
+        if cached_analysis is not None:
+            return cached_analysis
+
+        # Unparseable or timed out: analyze the file name alone and cache nothing
+        extracted = True
+        try:
+            text = await cached_extract(spooled.path, filename, sha)
+        except ExtractionError:
+            extracted = False
+            text = f"[파일: {filename}]"
+    finally:
+        spooled.cleanup()
     # Truncate to avoid token limits
     if len(text) > 8000:
         text = text[:8000] + "\n...(이하 생략)"
@@ -283,39 +419,42 @@ async def analyze_document(
     user_msg = f"파일명: {filename}\n\n내용:\n{text}"
 
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {XAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": XAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    "temperature": 0.3,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            answer = data["choices"][0]["message"]["content"]
-
-            # Parse JSON from response (handle markdown code blocks)
-            cleaned = answer.strip()
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-                cleaned = cleaned.rsplit("```", 1)[0]
-            result = json.loads(cleaned)
-
-            return {
-                "category": result.get("category", ""),
-                "tags": result.get("tags", []),
-                "summary": result.get("summary", ""),
-                "consulting": result.get("consulting", ""),
-            }
+        resp = await get_http_client().post(
+            "https://api.x.ai/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {XAI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": XAI_MODEL,
+                "messages": [
+                    {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_msg},
+                ],
+                "temperature": 0.3,
+            },
+            timeout=route_timeout("analyze"),
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        answer = data["choices"][0]["message"]["content"]
+
+        # Parse JSON from response (handle markdown code blocks)
+        cleaned = answer.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
+            cleaned = cleaned.rsplit("```", 1)[0]
+        result = json.loads(cleaned)
+
+        analysis = {
+            "category": result.get("category", ""),
+            "tags": result.get("tags", []),
+            "summary": result.get("summary", ""),
+            "consulting": result.get("consulting", ""),
+        }
+        if extracted:
+            await set_analysis(sha, XAI_MODEL, analysis)
+        return analysis
     except json.JSONDecodeError:
         # If JSON parsing fails, return the raw answer as consulting
         return {
@@ -370,38 +509,38 @@ async def analyze_collection(
     )
 
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(
-                "https://api.x.ai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {XAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": XAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": COLLECTION_ANALYZE_PROMPT},
-                        {"role": "user", "content": user_msg},
-                    ],
-                    "temperature": 0.3,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            answer = data["choices"][0]["message"]["content"]
-
-            cleaned = answer.strip()
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-                cleaned = cleaned.rsplit("```", 1)[0]
-            result = json.loads(cleaned)
-
-            return {
-                "description": result.get("description", ""),
-                "category": result.get("category", ""),
-                "tags": result.get("tags", ""),
-                "consulting": result.get("consulting", ""),
-            }
+        resp = await get_http_client().post(
+            "https://api.x.ai/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {XAI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": XAI_MODEL,
+                "messages": [
+                    {"role": "system", "content": COLLECTION_ANALYZE_PROMPT},
+                    {"role": "user", "content": user_msg},
+                ],
+                "temperature": 0.3,
+            },
+            timeout=route_timeout("analyze_collection"),
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        answer = data["choices"][0]["message"]["content"]
+
+        cleaned = answer.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
+            cleaned = cleaned.rsplit("```", 1)[0]
+        result = json.loads(cleaned)
+
+        return {
+            "description": result.get("description", ""),
+            "category": result.get("category", ""),
+            "tags": result.get("tags", ""),
+            "consulting": result.get("consulting", ""),
+        }
     except json.JSONDecodeError:
         return {
             "description": "",
@@ -430,17 +569,20 @@ async def get_stats(
     result = await session.exec(select(func.count(User.id)))
     total_users = result.one()
     
-    # Total queries (from usage events)
-    result = await session.exec(select(func.count(UsageEvent.id)))
-    total_queries = result.one()
-
-    # Average latency (ms)
-    result = await session.exec(select(func.avg(UsageEvent.latency_ms)))
-    avg_latency = result.one() or 0
-
-    # Total cost (USD)
-    result = await session.exec(select(func.sum(UsageEvent.cost_usd)))
-    total_cost = result.one() or 0
+    # Queries, latency and cost from the all-time usage rollup (one row per
+    # collection x model, maintained by the usage recorder)
+    result = await session.exec(
+        select(
+            func.sum(UsageRollup.requests),
+            func.sum(UsageRollup.latency_sum_ms),
+            func.sum(UsageRollup.latency_count),
+            func.sum(UsageRollup.cost_usd),
+        ).where(UsageRollup.granularity == "total")
+    )
+    total_queries, latency_sum, latency_count, total_cost = result.one()
+    total_queries = total_queries or 0
+    avg_latency = latency_sum / latency_count if latency_count else 0
+    total_cost = total_cost or 0
 
     return {
         "collections": total_collections,
@@ -451,29 +593,139 @@ async def get_stats(
         "cost_usd": float(total_cost),
     }
 
-@app.get("/collections", response_model=list[CollectionRead])
-async def list_collections(
+TIMESERIES_MAX_BUCKETS = 1000
+
+
+class TimeseriesBucket(BaseModel):
+    bucket_start: str
+    requests: int
+    cached: int
+    avg_latency_ms: Optional[int] = None
+    # Upper bound of the histogram bin; None past the last bound (60s)
+    p50_latency_ms: Optional[int] = None
+    p95_latency_ms: Optional[int] = None
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost_usd: float
+
+
+@app.get("/stats/timeseries", response_model=list[TimeseriesBucket])
+async def get_stats_timeseries(
+    granularity: Literal["minute", "hour", "day"] = "hour",
+    start: Optional[datetime] = Query(None, description="ISO 8601; defaults to 24 buckets before end"),
+    end: Optional[datetime] = Query(None, description="ISO 8601; defaults to now"),
+    collection_id: Optional[int] = None,
+    model: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user) # Require login
+    current_user: User = Depends(get_current_user)
 ):
-    result = await session.exec(select(Collection))
-    collections = result.all()
-    # verify format
-    output: list[CollectionRead] = []
-    for c in collections:
-        total_docs = (await session.exec(
-            select(func.count(Document.id)).where(Document.collection_id == c.id)
-        )).one()
-        processing_docs = (await session.exec(
-            select(func.count(Document.id)).where(
-                (Document.collection_id == c.id) & (Document.status == "processing")
+    """사용량 시계열 (요청 수, 지연 p50/p95, 토큰, 비용). 원본 이벤트가 아닌 롤업 테이블에서 조회합니다."""
+    step = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}[granularity]
+    end = usage_bucket_start(end or datetime.now(timezone.utc), granularity)
+    start = usage_bucket_start(start, granularity) if start else end - step * 23
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start) / step >= TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {TIMESERIES_MAX_BUCKETS})")
+
+    def scoped(table):
+        conditions = [
+            table.granularity == granularity,
+            table.bucket_start >= start,
+            table.bucket_start <= end,
+        ]
+        if collection_id is not None:
+            conditions.append(table.collection_id == collection_id)
+        if model:
+            conditions.append(table.model == model)
+        return conditions
+
+    rows = (await session.exec(
+        select(
+            UsageRollup.bucket_start,
+            func.sum(UsageRollup.requests),
+            func.sum(UsageRollup.cached),
+            func.sum(UsageRollup.latency_sum_ms),
+            func.sum(UsageRollup.latency_count),
+            func.sum(UsageRollup.prompt_tokens),
+            func.sum(UsageRollup.completion_tokens),
+            func.sum(UsageRollup.total_tokens),
+            func.sum(UsageRollup.cost_usd),
+        )
+        .where(*scoped(UsageRollup))
+        .group_by(UsageRollup.bucket_start)
+        .order_by(UsageRollup.bucket_start)
+    )).all()
+    bins: dict[datetime, dict[int, int]] = {}
+    for bucket, le_ms, count in (await session.exec(
+        select(UsageLatencyBin.bucket_start, UsageLatencyBin.le_ms, func.sum(UsageLatencyBin.count))
+        .where(*scoped(UsageLatencyBin))
+        .group_by(UsageLatencyBin.bucket_start, UsageLatencyBin.le_ms)
+    )).all():
+        bins.setdefault(bucket, {})[le_ms] = count
+
+    return [
+        TimeseriesBucket(
+            bucket_start=bucket.isoformat(),
+            requests=requests,
+            cached=cached,
+            avg_latency_ms=int(latency_sum / latency_count) if latency_count else None,
+            p50_latency_ms=percentile_from_bins(bins.get(bucket, {}), 0.50),
+            p95_latency_ms=percentile_from_bins(bins.get(bucket, {}), 0.95),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            cost_usd=round(cost, 6),
+        )
+        for bucket, requests, cached, latency_sum, latency_count, prompt_tokens, completion_tokens,
+            total_tokens, cost in rows
+    ]
+
+COLLECTION_COUNT_FIELDS = {"documents_count", "processing_count", "failed_count", "status"}
+COLLECTIONS_PAGE_MAX = 1000
+
+
+async def _list_collection_rows(
+    session: AsyncSession,
+    after_id: int | None = None,
+    limit: int | None = None,
+    with_counts: bool = True,
+) -> list[CollectionRead]:
+    """Collections ordered by id, with document counts from one grouped query."""
+    if with_counts:
+        statement = (
+            select(
+                Collection,
+                func.count(Document.id),
+                func.sum(case((Document.status == "processing", 1), else_=0)),
+                func.sum(case((Document.status == "failed", 1), else_=0)),
             )
-        )).one()
-        failed_docs = (await session.exec(
-            select(func.count(Document.id)).where(
-                (Document.collection_id == c.id) & (Document.status == "failed")
+            .outerjoin(Document, Document.collection_id == Collection.id)
+            .group_by(Collection.id)
+        )
+    else:
+        statement = select(Collection)
+    if after_id is not None:
+        statement = statement.where(Collection.id > after_id)
+    statement = statement.order_by(Collection.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    rows = (await session.exec(statement)).all()
+    output: list[CollectionRead] = []
+    for row in rows:
+        if with_counts:
+            c, total_docs, processing_docs, failed_docs = row
+            processing_docs = processing_docs or 0
+            counts = dict(
+                documents_count=total_docs,
+                processing_count=processing_docs,
+                failed_count=failed_docs or 0,
+                status="processing" if processing_docs > 0 else "active",
             )
-        )).one()
+        else:
+            c, counts = row, {}
         output.append(
             CollectionRead(
                 id=c.id,
@@ -483,14 +735,43 @@ async def list_collections(
                 category=c.category,
                 tags=c.tags,
                 created_at=c.created_at.isoformat(),
-                documents_count=total_docs,
-                processing_count=processing_docs,
-                failed_count=failed_docs,
-                status="processing" if processing_docs > 0 else "active",
+                **counts,
             )
         )
     return output
 
+
+@app.get("/collections", response_model=list[CollectionRead])
+async def list_collections(
+    response: Response,
+    after_id: int | None = Query(None, description="Keyset cursor: return collections with id > after_id"),
+    limit: int | None = Query(None, ge=1, le=COLLECTIONS_PAGE_MAX),
+    fields: str | None = Query(None, description="Comma-separated CollectionRead fields to return"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user) # Require login
+):
+    selected = None
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(selected) - set(CollectionRead.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    with_counts = selected is None or bool(COLLECTION_COUNT_FIELDS & set(selected))
+    output = await _list_collection_rows(session, after_id=after_id, limit=limit, with_counts=with_counts)
+
+    next_cursor = str(output[-1].id) if limit is not None and len(output) == limit else None
+    if selected is None:
+        if next_cursor:
+            response.headers["X-Next-After-Id"] = next_cursor
+        return output
+
+    headers = {"X-Next-After-Id": next_cursor} if next_cursor else None
+    return JSONResponse(
+        content=[c.model_dump(include=set(selected)) for c in output],
+        headers=headers,
+    )
+
 @app.post("/collections", response_model=CollectionRead)
 async def create_collection(
     collection: CollectionCreate, 
@@ -590,7 +871,8 @@ async def delete_collection(
     
     # Use direct SQL delete for robustness
     try:
-        # Delete dependent documents
+        # Delete dependent documents and their metadata
+        await delete_document_metadata(session, select(Document.id).where(Document.collection_id == collection_id))
         await session.exec(delete(Document).where(Document.collection_id == collection_id))
         # Delete collection
         await session.exec(delete(Collection).where(Collection.id == collection_id))
@@ -598,7 +880,9 @@ async def delete_collection(
     except Exception as e:
         print(f"Error deleting collection from DB: {e}")
         raise HTTPException(status_code=500, detail=f"Database Delete Error: {e}")
-    
+
+    semantic_clear(collection.xai_id)
+    await reconciler.refresh_snapshot(session)
     return {"status": "deleted", "id": collection_id}
 
 class DocumentRead(BaseModel):
@@ -626,27 +910,10 @@ async def get_collection_documents(
     results = await session.exec(statement)
     documents = results.all()
 
-    if refresh and mgmt_client and documents:
-        updated = False
-        for doc in documents:
-            if doc.status == "processed":
-                continue
-            try:
-                status_resp = await mgmt_client.collections.get_document(
-                    doc.xai_doc_id,
-                    collection.xai_id,
-                )
-                status = getattr(status_resp, "status", None)
-                if _status_is_processed(status):
-                    doc.status = "processed"
-                    updated = True
-                elif _status_is_failed(status):
-                    doc.status = "failed"
-                    updated = True
-            except Exception as e:
-                print(f"Warning: status check failed for {doc.xai_doc_id}: {e}")
-        if updated:
-            await session.commit()
+    # Status polling happens in the background reconciler; refresh only
+    # bumps this collection to the front of its next pass.
+    if refresh and any(d.status != "processed" for d in documents):
+        reconciler.kick(collection_id)
 
     return [
         DocumentRead(
@@ -681,16 +948,24 @@ async def delete_document(
         print(f"Warning: Failed to delete from xAI: {e}")
         # Proceed to delete from DB anyway so user isn't stuck
         
-    session.delete(doc)
+    await delete_document_metadata(session, [doc.id])
+    await session.delete(doc)
+    await bump_content_version(session, doc.collection_id)
     await session.commit()
-    
+    await reconciler.refresh_snapshot(session)
+
     return {"status": "deleted", "id": document_id}
 
 # File upload limits
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".md", ".docx", ".doc", ".jpg", ".jpeg", ".png", ".gif"}
 
-@app.post("/collections/{collection_id}/upload")
+# Returns a dict, not a JSONResponse: only then is the X-Profile-Id header merged in
+@app.post(
+    "/collections/{collection_id}/upload",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(profile_request)],
+)
 async def upload_document(
     collection_id: int,
     file: UploadFile = File(...),
@@ -725,19 +1000,10 @@ async def upload_document(
             detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
 
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE / (1024 * 1024):.0f} MB"
-        )
-    
-    if len(content) == 0:
-        raise HTTPException(status_code=400, detail="File is empty")
-    
+    # Stream the body to disk (size-checked and hashed on the way in); a
+    # background worker does extraction and the xAI upload
+    spooled = await spool_upload(file, MAX_FILE_SIZE, spool_dir=INGEST_SPOOL_DIR)
+
     metadata = build_metadata(
         category=category,
         tags=tags,
@@ -748,50 +1014,257 @@ async def upload_document(
         policy_note=policy_note,
     )
 
-    # Convert non-text formats to plain text for xAI indexing
-    upload_name = file.filename
-    upload_data = content
-    file_ext = os.path.splitext(file.filename.lower())[1]
-    if file_ext in ('.docx', '.doc', '.pdf'):
-        extracted = _extract_text(content, file.filename)
-        if extracted.strip():
-            upload_data = extracted.encode('utf-8')
-            upload_name = os.path.splitext(file.filename)[0] + '.txt'
-
-    # Upload to xAI
     try:
-        upload_resp = await mgmt_client.collections.upload_document(
-            collection_id=collection.xai_id,
-            name=upload_name,
-            data=upload_data,
-        )
-        xai_doc_id = extract_document_id(upload_resp)
-        if not xai_doc_id:
-            raise Exception("Could not find document_id in upload response")
+        job = await ingest_queue.enqueue(session, collection.id, file.filename, spooled, metadata)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"xAI Upload Error: {str(e)}")
-    
-    # Save to DB
-    doc = Document(
-        name=file.filename,
-        xai_doc_id=xai_doc_id,
-        collection_id=collection.id,
-        status="processing" # You might want to poll status in background
+        spooled.cleanup()
+        raise HTTPException(status_code=500, detail=f"Database Error: {e}")
+
+    return {"status": "queued", "job_id": job.id}
+
+class JobRead(BaseModel):
+    id: int
+    collection_id: int
+    filename: str
+    size: int
+    status: str
+    stage: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    next_run_at: Optional[str] = None
+    last_error: Optional[str] = None
+    uploaded_bytes: Optional[int] = None
+    document_id: Optional[int] = None
+    xai_doc_id: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+@app.get("/jobs/{job_id}", response_model=JobRead)
+async def get_job(
+    job_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    job = await session.get(IngestJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobRead(
+        id=job.id,
+        collection_id=job.collection_id,
+        filename=job.filename,
+        size=job.size,
+        status=job.status,
+        stage=job.stage,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        next_run_at=job.next_run_at.isoformat() if job.status == "queued" else None,
+        last_error=job.last_error,
+        uploaded_bytes=ingest_queue.uploaded_bytes(job.id),
+        document_id=job.document_id,
+        xai_doc_id=job.xai_doc_id,
+        created_at=job.created_at.isoformat(),
+        updated_at=job.updated_at.isoformat(),
     )
-    session.add(doc)
-    await session.commit()
-    await session.refresh(doc)
-    
-    return {"status": "uploaded", "document_id": doc.id, "xai_doc_id": xai_doc_id}
 
-@app.post("/chat", response_model=ChatResponse)
+def _batch_result(filename: str, error: str | None = None) -> dict:
+    return {
+        "filename": filename,
+        "status": "failed" if error else "pending",
+        "job_id": None,
+        "error": error,
+    }
+
+@app.post(
+    "/collections/{collection_id}/upload-batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(profile_request)],
+)
+async def upload_documents_batch(
+    collection_id: int,
+    files: list[UploadFile] = File(...),
+    category: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    version: Optional[str] = Form(None),
+    date: Optional[str] = Form(None),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """여러 파일(또는 zip 압축 파일)을 한 번에 받아 파일마다 업로드 작업을 등록하고, 파일별 job_id를 반환합니다."""
+    if not mgmt_client:
+         raise HTTPException(status_code=500, detail="Management API Key not configured")
+
+    collection = await session.get(Collection, collection_id)
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+    # Applied to every file in the batch
+    metadata = build_metadata(category=category, tags=tags, version=version, date=date)
+    results: list[dict] = []
+    items: list[tuple[int, str, SpooledUpload]] = []  # (index into results, filename, spooled)
+    total_bytes = 0
+
+    def add_item(filename: str, spooled: SpooledUpload) -> None:
+        nonlocal total_bytes
+        total_bytes += spooled.size
+        items.append((len(results), filename, spooled))
+        results.append(_batch_result(filename))
+
+    try:
+        # Spooled into INGEST_SPOOL_DIR: each file becomes an ingest job that
+        # outlives this request, as on the single-file path
+        for file in files:
+            filename = os.path.basename(file.filename or "")
+            file_ext = os.path.splitext(filename.lower())[1]
+            if not filename:
+                results.append(_batch_result("", "Filename is required"))
+            elif len(items) >= UPLOAD_BATCH_MAX_FILES:
+                results.append(_batch_result(filename, f"Too many files (max {UPLOAD_BATCH_MAX_FILES})"))
+            elif file_ext == ".zip":
+                try:
+                    archive = await spool_upload(file, UPLOAD_BATCH_MAX_BYTES - total_bytes, spool_dir=INGEST_SPOOL_DIR)
+                except HTTPException as e:
+                    results.append(_batch_result(filename, e.detail))
+                    continue
+                try:
+                    members = await asyncio.to_thread(
+                        unpack_zip,
+                        archive.path,
+                        ALLOWED_EXTENSIONS,
+                        MAX_FILE_SIZE,
+                        UPLOAD_BATCH_MAX_BYTES - total_bytes,
+                        UPLOAD_BATCH_MAX_FILES - len(items),
+                        INGEST_SPOOL_DIR,
+                    )
+                except zipfile.BadZipFile:
+                    results.append(_batch_result(filename, "Invalid zip archive"))
+                    continue
+                finally:
+                    archive.cleanup()
+                for member in members:
+                    if member.spooled is None:
+                        results.append(_batch_result(member.filename, member.error))
+                    else:
+                        add_item(member.filename, member.spooled)
+            elif file_ext not in ALLOWED_EXTENSIONS:
+                results.append(_batch_result(filename, "File type not allowed"))
+            else:
+                try:
+                    spooled = await spool_upload(
+                        file, min(MAX_FILE_SIZE, UPLOAD_BATCH_MAX_BYTES - total_bytes), spool_dir=INGEST_SPOOL_DIR
+                    )
+                except HTTPException as e:
+                    results.append(_batch_result(filename, e.detail))
+                    continue
+                add_item(filename, spooled)
+
+    except BaseException:
+        for _, _, spooled in items:
+            spooled.cleanup()
+        raise
+
+    # The queue workers do extraction and the xAI upload, committing each
+    # document as soon as it is uploaded
+    for index, filename, spooled in items:
+        try:
+            job = await ingest_queue.enqueue(session, collection.id, filename, spooled, metadata)
+        except Exception as e:
+            await session.rollback()
+            spooled.cleanup()
+            results[index].update(status="failed", error=f"Database Error: {e}")
+            continue
+        results[index].update(status="queued", job_id=job.id)
+
+    queued = sum(1 for r in results if r["status"] == "queued")
+    return {
+        "collection_id": collection.id,
+        "queued": queued,
+        "failed": len(results) - queued,
+        "results": results,
+    }
+
+NO_DOCUMENTS_ANSWER = "업로드된 문서가 없습니다. 먼저 문서를 업로드해 주세요."
+INDEXING_ANSWER = (
+    "문서가 아직 인덱싱 중입니다. 잠시 후 다시 시도해 주세요.\n\n"
+    "1) 인덱싱 대기 (가장 흔함)\n"
+    "- 보통 몇 초~10분, 큰 파일은 30분까지 걸릴 수 있습니다.\n"
+    "- 5~10분 뒤 다시 검색해 주세요.\n\n"
+    "2) 문서 상태 확인 (추천)\n"
+    "- xAI 콘솔에서 해당 컬렉션 문서 상태가 processed인지 확인하세요.\n"
+    "- processing이면 기다리면 됩니다.\n"
+    "- failed면 파일을 다시 업로드해 주세요.\n\n"
+    "3) 빠른 점검\n"
+    "- 작은 텍스트(.txt) 1개로 업로드/검색이 되는지 테스트해 보세요.\n"
+    "- 된다면 원본 파일이 크거나 복잡해 처리 지연일 가능성이 큽니다."
+)
+
+
+NO_MATCHING_DOCUMENTS_ANSWER = "선택한 필터 조건에 맞는 문서가 없습니다. 필터를 변경해 다시 시도해 주세요."
+
+
+def _precheck_answer(db_collection: Collection) -> str | None:
+    """Canned answer when the collection cannot be searched yet, else None."""
+    # In-memory snapshot maintained by the reconciler (no upstream calls here)
+    doc_state = reconciler.snapshot(db_collection.id)
+    if not doc_state.total:
+        return NO_DOCUMENTS_ANSWER
+    if mgmt_client and not doc_state.has_processed:
+        return INDEXING_ANSWER
+    return None
+
+
+def _usage_event(
+    endpoint: str,
+    collection_id: int | None,
+    result: dict,
+    latency_ms: int | None,
+    coalesced: bool = False,
+    cached: bool = False,
+) -> UsageEvent:
+    # Coalesced requests and cache hits record the call they saved: no tokens, no cost
+    prompt_tokens = completion_tokens = total_tokens = None
+    cost = 0.0
+    if not (coalesced or cached):
+        usage = result.get("usage") if isinstance(result, dict) else None
+        prompt_tokens = usage.get("prompt_tokens") if usage else None
+        completion_tokens = usage.get("completion_tokens") if usage else None
+        total_tokens = usage.get("total_tokens") if usage else None
+        if prompt_tokens is not None and completion_tokens is not None:
+            cost = (prompt_tokens / 1_000_000) * COST_PER_1M_INPUT + (completion_tokens / 1_000_000) * COST_PER_1M_OUTPUT
+    return UsageEvent(
+        endpoint=endpoint,
+        model=XAI_MODEL,
+        collection_id=collection_id,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        cost_usd=cost,
+        latency_ms=latency_ms,
+        cached=cached,
+        coalesced=coalesced,
+    )
+
+
+async def _cache_lookup(xai_id: str, query: str, filters: dict | None, version: int) -> dict | None:
+    cached = await cache_get_async(xai_id, XAI_MODEL, query, filters, version=version)
+    CACHE_LOOKUPS.labels(cache="answer", result="hit" if cached else "miss").inc()
+    return cached
+
+
+def _semantic_lookup(xai_id: str, query: str, filters: dict | None, version: int):
+    hit = semantic_get(xai_id, XAI_MODEL, query, filters, version=version)
+    CACHE_LOOKUPS.labels(cache="semantic", result="hit" if hit else "miss").inc()
+    return hit
+
+
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(profile_request)])
 async def chat(
     req: ChatRequest, 
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     # Determine Collection ID (required)
-    db_collection = await session.get(Collection, req.collection_id)
+    with timed("collection_lookup"):
+        db_collection = await session.get(Collection, req.collection_id)
     if not db_collection:
         raise HTTPException(status_code=404, detail="지정한 컬렉션을 찾을 수 없습니다.")
     target_xai_id = db_collection.xai_id
@@ -799,112 +1272,96 @@ async def chat(
     request_id = str(uuid.uuid4())
     t0 = time.time()
 
-    if db_collection:
-        result = await session.exec(
-            select(Document).where(Document.collection_id == db_collection.id)
+    with timed("status_check"):
+        canned = _precheck_answer(db_collection)
+    if canned:
+        latency_ms = int((time.time() - t0) * 1000)
+        return ChatResponse(
+            request_id=request_id,
+            answer=canned,
+            citations=[],
+            cached=False,
+            latency_ms=latency_ms,
         )
-        docs = result.all()
-        if not docs:
-            latency_ms = int((time.time() - t0) * 1000)
-            return ChatResponse(
-                request_id=request_id,
-                answer="업로드된 문서가 없습니다. 먼저 문서를 업로드해 주세요.",
-                citations=[],
-                cached=False,
-                latency_ms=latency_ms,
-            )
-        if mgmt_client:
-            updated = False
-            for doc in docs:
-                if doc.status == "processed":
-                    continue
-                try:
-                    status_resp = await mgmt_client.collections.get_document(
-                        doc.xai_doc_id,
-                        db_collection.xai_id,
-                    )
-                    status = getattr(status_resp, "status", None)
-                    if _status_is_processed(status):
-                        doc.status = "processed"
-                        updated = True
-                    elif _status_is_failed(status):
-                        doc.status = "failed"
-                        updated = True
-                except Exception as e:
-                    print(f"Warning: status check failed for {doc.xai_doc_id}: {e}")
-            if updated:
-                await session.commit()
-
-            if not any(d.status == "processed" for d in docs):
-                latency_ms = int((time.time() - t0) * 1000)
-                return ChatResponse(
-                    request_id=request_id,
-                    answer=(
-                        "문서가 아직 인덱싱 중입니다. 잠시 후 다시 시도해 주세요.\n\n"
-                        "1) 인덱싱 대기 (가장 흔함)\n"
-                        "- 보통 몇 초~10분, 큰 파일은 30분까지 걸릴 수 있습니다.\n"
-                        "- 5~10분 뒤 다시 검색해 주세요.\n\n"
-                        "2) 문서 상태 확인 (추천)\n"
-                        "- xAI 콘솔에서 해당 컬렉션 문서 상태가 processed인지 확인하세요.\n"
-                        "- processing이면 기다리면 됩니다.\n"
-                        "- failed면 파일을 다시 업로드해 주세요.\n\n"
-                        "3) 빠른 점검\n"
-                        "- 작은 텍스트(.txt) 1개로 업로드/검색이 되는지 테스트해 보세요.\n"
-                        "- 된다면 원본 파일이 크거나 복잡해 처리 지연일 가능성이 큽니다."
-                    ),
-                    citations=[],
-                    cached=False,
-                    latency_ms=latency_ms,
-                )
 
     filters_dict = req.filters.model_dump(exclude_none=True) if req.filters else None
+    content_version = db_collection.content_version
 
-    # Cache key now needs to include collection
-    cached = cache_get(target_xai_id, XAI_MODEL, req.query, filters_dict)
+    # Cache key includes the collection and its content version
+    with timed("cache_lookup"):
+        cached = await _cache_lookup(target_xai_id, req.query, filters_dict, content_version)
     if cached:
         latency_ms = int((time.time() - t0) * 1000)
+        with timed("usage_write"):
+            usage_recorder.record(_usage_event("/chat", db_collection.id, cached, latency_ms, cached=True))
         return ChatResponse(
             request_id=request_id,
             answer=cached["answer"],
             citations=cached.get("citations", []),
             cached=True,
+            cache_tier=cached.get("cache_tier"),
             latency_ms=latency_ms,
         )
 
-    result = await run_rag(
-        client=chat_client,
-        collection_id=target_xai_id,
-        query=req.query,
-        filters=filters_dict,
-    )
-
-    # Track usage when not cached
-    usage = result.get("usage") if isinstance(result, dict) else None
-    prompt_tokens = usage.get("prompt_tokens") if usage else None
-    completion_tokens = usage.get("completion_tokens") if usage else None
-    total_tokens = usage.get("total_tokens") if usage else None
-    cost = 0.0
-    if prompt_tokens is not None and completion_tokens is not None:
-        cost = (prompt_tokens / 1_000_000) * COST_PER_1M_INPUT + (completion_tokens / 1_000_000) * COST_PER_1M_OUTPUT
+    # Near-duplicate phrasing of an already answered question
+    with timed("cache_lookup"):
+        semantic_hit = _semantic_lookup(target_xai_id, req.query, filters_dict, content_version)
+    if semantic_hit:
+        hit_value, hit_score, _ = semantic_hit
+        latency_ms = int((time.time() - t0) * 1000)
+        with timed("usage_write"):
+            usage_recorder.record(_usage_event("/chat", db_collection.id, hit_value, latency_ms, cached=True))
+        return ChatResponse(
+            request_id=request_id,
+            answer=hit_value["answer"],
+            citations=hit_value.get("citations", []),
+            cached=True,
+            cache_tier="semantic",
+            semantic_score=round(hit_score, 4),
+            latency_ms=latency_ms,
+        )
 
-    try:
-        usage_event = UsageEvent(
-            endpoint="/chat",
-            model=XAI_MODEL,
-            collection_id=db_collection.id if db_collection else None,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-            cost_usd=cost,
-            latency_ms=result.get("latency_ms"),
+    # Filters resolved against the local metadata tables: nothing to search, no LLM call
+    with timed("prefilter"):
+        matched = await prefilter_documents(session, db_collection.id, filters_dict)
+    if matched is not None and not matched:
+        latency_ms = int((time.time() - t0) * 1000)
+        return ChatResponse(
+            request_id=request_id,
+            answer=NO_MATCHING_DOCUMENTS_ANSWER,
+            citations=[],
             cached=False,
+            latency_ms=latency_ms,
         )
-        session.add(usage_event)
-        await session.commit()
-    except Exception as e:
-        print(f"Warning: failed to record usage: {e}")
+    matched_names = [d.name for d in matched] if matched else None
+
+    semantic_evictions = 0
+
+    async def _rag_and_cache():
+        nonlocal semantic_evictions
+        rag_result = await run_rag(
+            client=chat_client,
+            collection_id=target_xai_id,
+            query=req.query,
+            filters=filters_dict,
+            documents=matched_names,
+        )
+        await cache_set_async(target_xai_id, XAI_MODEL, req.query, filters_dict, rag_result, version=content_version)
+        semantic_evictions = semantic_set(
+            target_xai_id, XAI_MODEL, req.query, filters_dict, rag_result, version=content_version
+        )
+        return rag_result
 
-    cache_set(target_xai_id, XAI_MODEL, req.query, filters_dict, result)
+    # Identical concurrent questions share one upstream call
+    with timed("upstream"):
+        result, coalesced = await single_flight(
+            target_xai_id, XAI_MODEL, req.query, filters_dict, _rag_and_cache, version=content_version
+        )
+
+    # Track usage when not cached
+    latency = int((time.time() - t0) * 1000) if coalesced else result.get("latency_ms")
+    with timed("usage_write"):
+        usage_recorder.record(_usage_event("/chat", db_collection.id, result, latency, coalesced))
 
     latency_ms = int((time.time() - t0) * 1000)
     return ChatResponse(
@@ -912,5 +1369,127 @@ async def chat(
         answer=result["answer"],
         citations=result.get("citations", []),
         cached=False,
+        coalesced=coalesced,
+        semantic_evictions=semantic_evictions,
         latency_ms=latency_ms,
     )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    req: ChatRequest,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-Sent Events variant of /chat. Events: meta, token, citation,
+    done (with ttft_ms and latency_ms) and error.
+    """
+    with timed("collection_lookup"):
+        db_collection = await session.get(Collection, req.collection_id)
+    if not db_collection:
+        raise HTTPException(status_code=404, detail="지정한 컬렉션을 찾을 수 없습니다.")
+    target_xai_id = db_collection.xai_id
+    db_collection_id = db_collection.id
+    content_version = db_collection.content_version
+    filters_dict = req.filters.model_dump(exclude_none=True) if req.filters else None
+
+    request_id = str(uuid.uuid4())
+    t0 = time.time()
+
+    def _ms() -> int:
+        return int((time.time() - t0) * 1000)
+
+    def _replay(answer: str, citations: list[dict], **done_extra):
+        # Whole answers (canned or cached) go out as a single token event
+        yield _sse("token", {"text": answer})
+        for c in citations:
+            yield _sse("citation", c)
+        latency_ms = _ms()
+        yield _sse("done", {"ttft_ms": latency_ms, "latency_ms": latency_ms, **done_extra})
+
+    async def events():
+        yield _sse("meta", {"request_id": request_id})
+
+        with timed("status_check"):
+            canned = _precheck_answer(db_collection)
+        if canned:
+            for e in _replay(canned, [], cached=False):
+                yield e
+            return
+
+        with timed("cache_lookup"):
+            cached = await _cache_lookup(target_xai_id, req.query, filters_dict, content_version)
+        if cached:
+            for e in _replay(cached["answer"], cached.get("citations", []), cached=True,
+                             cache_tier=cached.get("cache_tier")):
+                yield e
+            with timed("usage_write"):
+                usage_recorder.record(_usage_event("/chat/stream", db_collection_id, cached, _ms(), cached=True))
+            return
+
+        with timed("cache_lookup"):
+            semantic_hit = _semantic_lookup(target_xai_id, req.query, filters_dict, content_version)
+        if semantic_hit:
+            hit_value, hit_score, _ = semantic_hit
+            for e in _replay(hit_value["answer"], hit_value.get("citations", []), cached=True,
+                             cache_tier="semantic", semantic_score=round(hit_score, 4)):
+                yield e
+            with timed("usage_write"):
+                usage_recorder.record(_usage_event("/chat/stream", db_collection_id, hit_value, _ms(), cached=True))
+            return
+
+        # The request-scoped session may already be closed once streaming starts
+        with timed("prefilter"):
+            async for prefilter_session in get_session():
+                matched = await prefilter_documents(prefilter_session, db_collection_id, filters_dict)
+                break
+        if matched is not None and not matched:
+            for e in _replay(NO_MATCHING_DOCUMENTS_ANSWER, [], cached=False):
+                yield e
+            return
+        matched_names = [d.name for d in matched] if matched else None
+
+        ttft_ms = None
+        try:
+            # Includes time spent sending tokens to a slow client
+            with timed("upstream"):
+                async for event in stream_rag(chat_client, target_xai_id, req.query, filters_dict, matched_names):
+                    if event["type"] == "token":
+                        if ttft_ms is None:
+                            ttft_ms = _ms()
+                        yield _sse("token", {"text": event["text"]})
+                    elif event["type"] == "citation":
+                        yield _sse("citation", event["citation"])
+                    elif event["type"] == "done":
+                        result = event["result"]
+        except Exception as e:
+            yield _sse("error", {"detail": f"xAI Error: {str(e)}"})
+            return
+
+        result.pop("ttft_ms", None)
+        await cache_set_async(target_xai_id, XAI_MODEL, req.query, filters_dict, result, version=content_version)
+        semantic_evictions = semantic_set(
+            target_xai_id, XAI_MODEL, req.query, filters_dict, result, version=content_version
+        )
+        latency_ms = _ms()
+        yield _sse("done", {
+            "cached": False,
+            "ttft_ms": ttft_ms,
+            "latency_ms": latency_ms,
+            "usage": result.get("usage"),
+            "semantic_evictions": semantic_evictions,
+        })
+
+        with timed("usage_write"):
+            usage_recorder.record(_usage_event("/chat/stream", db_collection_id, result, latency_ms))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
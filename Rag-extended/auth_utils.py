@@ -1,9 +1,24 @@
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 import bcrypt
+from cachetools import TTLCache
+from sqlalchemy import event, inspect
 from typing import Optional
 
+from config import (
+    ADMIN_EMAILS,
+    AUTH_CACHE_MAXSIZE,
+    AUTH_CACHE_TTL_SEC,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_WORKERS,
+)
+from models import User
+
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change-me-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
@@ -15,10 +30,62 @@ def verify_password(plain_password, hashed_password):
         hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password, hashed_password)
 
+def is_admin(user: User) -> bool:
+    return user.email.lower() in ADMIN_EMAILS
+
 def get_password_hash(password):
     if isinstance(password, str):
         password = password.encode('utf-8')
-    return bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is taken; the caller should answer 429."""
+
+
+class PasswordHasher:
+    """
+    bcrypt off the event loop: a small dedicated thread pool (bcrypt releases
+    the GIL) with at most max_pending hashes queued or running. Beyond that,
+    calls fail fast with PasswordHasherBusy instead of queueing a login storm.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight = 0
+
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_pending
+
+    async def _submit(self, fn, *args):
+        if self.saturated():
+            raise PasswordHasherBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "in_flight": self._in_flight, "max_pending": self.max_pending}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,3 +96,62 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Verified claims of a bearer token; raises JWTError when invalid or expired."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of bearer token -> the user's column values, so an
+    authenticated request costs a dict lookup instead of a JWT decode and a
+    User query. Entries never outlive the token's own exp, and any ORM
+    update/delete of a User drops that user's entries (see below).
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_MAXSIZE, ttl_sec: float = AUTH_CACHE_TTL_SEC):
+        self.enabled = maxsize > 0 and ttl_sec > 0
+        self._entries: TTLCache = TTLCache(maxsize=max(1, maxsize), ttl=max(ttl_sec, 1e-3))
+
+    def get(self, token: str) -> User | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at is not None and time.time() >= expires_at:
+            self._entries.pop(token, None)
+            return None
+        # A fresh detached instance per request; the cached values stay untouched
+        return User(**principal)
+
+    def put(self, token: str, claims: dict, user: User) -> None:
+        if self.enabled:
+            self._entries[token] = (claims.get("exp"), user.model_dump())
+
+    def invalidate(self, email: str | None = None) -> None:
+        """Drop one user's entries, or everything when email is None."""
+        if email is None:
+            self._entries.clear()
+            return
+        for token, (_, principal) in list(self._entries.items()):
+            if principal.get("email") == email:
+                self._entries.pop(token, None)
+
+
+principal_cache = PrincipalCache()
+
+
+def _invalidate_user(mapper, connection, target: User) -> None:
+    principal_cache.invalidate(target.email)
+    # An email change leaves tokens issued for the old address
+    history = inspect(target).attrs.email.history
+    for old_email in history.deleted or ():
+        principal_cache.invalidate(old_email)
+
+
+event.listen(User, "after_update", _invalidate_user)
+event.listen(User, "after_delete", _invalidate_user)
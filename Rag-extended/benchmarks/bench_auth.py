@@ -0,0 +1,74 @@
+"""
+Per-request cost of get_current_user: the old path (jose/auth_utils imports
+inside the function, jwt.decode, SELECT user) vs the principal cache hit.
+
+    python benchmarks/bench_auth.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import database
+from app import get_current_user
+from auth_utils import create_access_token, principal_cache
+from models import User
+
+
+async def _old_get_current_user(token: str, session: AsyncSession) -> User:
+    from jose import jwt
+    from auth_utils import SECRET_KEY, ALGORITHM
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    result = await session.exec(select(User).where(User.email == payload.get("sub")))
+    return result.first()
+
+
+async def _time(factory, fn, token: str, requests: int) -> float:
+    # One session per request, as FastAPI's get_session dependency does
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        async with factory() as session:
+            await fn(token, session)
+    return (time.perf_counter() - t0) / requests * 1e6
+
+
+async def run(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.make_engine(f"sqlite+aiosqlite:///{tmp}/bench.db", echo=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            session.add(User(email="bench@example.com", hashed_password="x"))
+            await session.commit()
+        token = create_access_token({"sub": "bench@example.com"}, timedelta(minutes=30))
+
+        old_us = await _time(factory, _old_get_current_user, token, requests)
+        principal_cache.invalidate()
+        new_us = await _time(factory, get_current_user, token, requests)
+        await engine.dispose()
+
+    print(f"old (decode + query): {old_us:8.1f} us/request")
+    print(f"new (cache hit):      {new_us:8.1f} us/request")
+    print(f"saved:                {old_us - new_us:8.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Requests/sec through the app under concurrent load, old DB layer vs new.
+
+old: echo=True, a new sessionmaker per request, rollback-journal SQLite
+new: database.make_engine (echo off, WAL + synchronous=NORMAL + mmap, sized
+     pool) and the module-level session factory
+
+Readers hit GET /users/me and GET /collections/{id} over ASGI while writer
+tasks commit UsageEvents, as /chat does for every uncached answer.
+
+    python benchmarks/bench_db_load.py --seconds 5 --readers 32 --writers 4
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import database
+from app import app
+from auth_utils import create_access_token
+from models import Collection, Document, UsageEvent, User
+
+
+def _old_engine(url: str):
+    # echo=True binds its log handler to the current stdout; keep it off the terminal
+    # (the file stays open for the life of the process, as stdout would)
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        return create_async_engine(url, echo=True, future=True)
+
+
+def _old_get_session(engine):
+    async def get_session():
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            yield session
+    return get_session
+
+
+def _new_get_session(factory):
+    async def get_session():
+        async with factory() as session:
+            yield session
+    return get_session
+
+
+async def _seed(factory, docs: int) -> int:
+    async with factory() as session:
+        session.add(User(email="bench@example.com", hashed_password="x"))
+        coll = Collection(name="bench", xai_id="x-bench")
+        session.add(coll)
+        await session.flush()
+        session.add_all(
+            Document(name=f"d{i}.txt", xai_doc_id=f"x{i}", collection_id=coll.id, status="processed")
+            for i in range(docs)
+        )
+        await session.commit()
+        return coll.id
+
+
+async def _run(label: str, engine, get_session, seconds: float, readers: int, writers: int, docs: int) -> dict:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    coll_id = await _seed(factory, docs)
+
+    app.dependency_overrides[database.get_session] = get_session
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def reader(client: httpx.AsyncClient, i: int) -> None:
+        paths = ("/users/me", f"/collections/{coll_id}")
+        while time.perf_counter() < deadline:
+            r = await client.get(paths[i % 2], headers=headers)
+            counts["reads" if r.status_code == 200 else "errors"] += 1
+            i += 1
+
+    async def writer() -> None:
+        while time.perf_counter() < deadline:
+            try:
+                async for session in get_session():
+                    session.add(UsageEvent(endpoint="/chat", model="bench", collection_id=coll_id))
+                    await session.commit()
+                    break
+                counts["writes"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(reader(client, i) for i in range(readers)), *(writer() for _ in range(writers)))
+        elapsed = time.perf_counter() - t0
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return {
+        "label": label,
+        "reads_per_sec": counts["reads"] / elapsed,
+        "writes_per_sec": counts["writes"] / elapsed,
+        "errors": counts["errors"],
+    }
+
+
+async def main_async(args) -> None:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        old_url = f"sqlite+aiosqlite:///{tmp}/old.db"
+        old_engine = _old_engine(old_url)
+        results.append(await _run("old", old_engine, _old_get_session(old_engine),
+                                  args.seconds, args.readers, args.writers, args.docs))
+
+        new_engine = database.make_engine(f"sqlite+aiosqlite:///{tmp}/new.db", echo=False)
+        new_factory = async_sessionmaker(new_engine, class_=AsyncSession, expire_on_commit=False)
+        results.append(await _run("new", new_engine, _new_get_session(new_factory),
+                                  args.seconds, args.readers, args.writers, args.docs))
+
+    print(f"{'':>4} {'reads/s':>10} {'writes/s':>10} {'errors':>7}")
+    for r in results:
+        print(f"{r['label']:>4} {r['reads_per_sec']:>10.1f} {r['writes_per_sec']:>10.1f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--docs", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
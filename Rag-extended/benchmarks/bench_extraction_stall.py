@@ -0,0 +1,104 @@
+"""
+Event-loop stall during concurrent uploads: inline extract_text (old) vs
+ExtractionPool (new). A ticker coroutine sleeps 5 ms in a loop and records
+how late it wakes up; that lateness is the time the loop was blocked.
+
+    python benchmarks/bench_extraction_stall.py --uploads 8 --pages 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import ExtractionPool, extract_text
+
+TICK_SEC = 0.005
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Minimal text PDF (Helvetica, one content stream per page)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = b"".join(
+            b"(Policy page %d line %d: annual leave, remote work, bonus schedule.) Tj T* " % (p, i)
+            for i in range(lines_per_page)
+        )
+        stream = b"BT /F1 10 Tf 12 TL 40 800 Td " + lines + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+async def _measure(workload) -> tuple[float, float, float]:
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(TICK_SEC)
+            lags.append(max(0.0, time.perf_counter() - t - TICK_SEC))
+
+    tick = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await workload()
+    wall = time.perf_counter() - t0
+    done.set()
+    await tick
+    return wall * 1000, max(lags, default=0) * 1000, sum(lags) * 1000
+
+
+async def run(uploads: int, pages: int, workers: int) -> None:
+    pdf = make_pdf(pages)
+    print(f"{uploads} concurrent uploads of a {pages}-page PDF ({len(pdf) / 1024:.0f} KiB), {workers} workers")
+
+    async def inline_upload():
+        extract_text(pdf, "doc.pdf")
+
+    async def inline():
+        await asyncio.gather(*(inline_upload() for _ in range(uploads)))
+
+    pool = ExtractionPool(max_workers=workers, parallel_min_pages=max(1, pages // 2))
+    await pool.extract(b"warm", "warm.txt")  # spawn workers outside the measurement
+
+    async def pooled():
+        await asyncio.gather(*(pool.extract(pdf, "doc.pdf") for _ in range(uploads)))
+
+    print(f"{'mode':>8} {'wall ms':>10} {'max stall ms':>13} {'total stall ms':>15}")
+    for name, workload in (("inline", inline), ("pool", pooled)):
+        wall, max_stall, total_stall = await _measure(workload)
+        print(f"{name:>8} {wall:>10.0f} {max_stall:>13.1f} {total_stall:>15.0f}")
+    pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.uploads, args.pages, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+ingest_folder upload/indexing overlap against a simulated xAI: each upload
+takes --upload-ms and each document becomes processed --index-sec after
+upload. Compares the old shape (a semaphore slot held through a per-file
+poll loop) with the split upload stage + single IndexingPoller.
+
+    python benchmarks/bench_ingest_pipeline.py --files 200 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest_folder import IndexingPoller, POLL_INTERVAL_SEC
+
+
+class SimulatedXai:
+    def __init__(self, upload_sec: float, index_sec: float):
+        self.collections = self
+        self.upload_sec = upload_sec
+        self.index_sec = index_sec
+        self.ready_at: dict[str, float] = {}
+        self.status_calls = 0
+
+    async def upload(self, name: str) -> str:
+        await asyncio.sleep(self.upload_sec)
+        self.ready_at[name] = time.monotonic() + self.index_sec
+        return name
+
+    def _status(self, doc_id: str) -> str:
+        done = time.monotonic() >= self.ready_at[doc_id]
+        return "DOCUMENT_STATUS_PROCESSED" if done else "DOCUMENT_STATUS_PROCESSING"
+
+    async def get_document(self, doc_id, collection_id):
+        self.status_calls += 1
+        return SimpleNamespace(status=self._status(doc_id))
+
+    async def batch_get_documents(self, collection_id, file_ids):
+        self.status_calls += 1
+        return SimpleNamespace(documents=[
+            SimpleNamespace(file_metadata=SimpleNamespace(file_id=d), status=self._status(d)) for d in file_ids
+        ])
+
+
+async def per_file(xai: SimulatedXai, files: int, concurrency: int, poll_sec: float) -> None:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            doc_id = await xai.upload(f"f{i}")
+            while (await xai.get_document(doc_id, "c")).status != "DOCUMENT_STATUS_PROCESSED":
+                await asyncio.sleep(poll_sec)
+
+    await asyncio.gather(*(one(i) for i in range(files)))
+
+
+async def pipelined(xai: SimulatedXai, files: int, concurrency: int, poll_sec: float) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    poller = IndexingPoller(xai, "c", min_interval=poll_sec, max_interval=poll_sec * 15)
+
+    async def one(i):
+        async with sem:
+            doc_id = await xai.upload(f"f{i}")
+        await poller.wait(doc_id, doc_id)
+
+    await asyncio.gather(*(one(i) for i in range(files)))
+    await poller.close()
+
+
+async def run(files: int, concurrency: int, upload_ms: float, index_sec: float, poll_sec: float) -> None:
+    print(f"{files} files, concurrency {concurrency}, upload {upload_ms:.0f} ms, indexing {index_sec}s")
+    print(f"{'mode':>10} {'wall s':>8} {'files/s':>8} {'status calls':>13}")
+    for name, fn in (("per-file", per_file), ("pipelined", pipelined)):
+        xai = SimulatedXai(upload_ms / 1000, index_sec)
+        t0 = time.perf_counter()
+        await fn(xai, files, concurrency, poll_sec)
+        wall = time.perf_counter() - t0
+        print(f"{name:>10} {wall:>8.1f} {files / wall:>8.1f} {xai.status_calls:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--upload-ms", type=float, default=100)
+    parser.add_argument("--index-sec", type=float, default=3)
+    parser.add_argument("--poll-sec", type=float, default=POLL_INTERVAL_SEC)
+    args = parser.parse_args()
+    asyncio.run(run(args.files, args.concurrency, args.upload_ms, args.index_sec, args.poll_sec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency of GET /collections' DB work: per-collection count queries (old)
+vs. the single grouped aggregate in app._list_collection_rows (new).
+
+    python benchmarks/bench_list_collections.py --sizes 10,1000,10000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import _list_collection_rows
+from models import Collection, Document
+
+STATUSES = ("processed", "processed", "processing", "failed")
+
+
+async def _old_list(session: AsyncSession) -> int:
+    collections = (await session.exec(select(Collection))).all()
+    for c in collections:
+        for cond in (
+            Document.collection_id == c.id,
+            (Document.collection_id == c.id) & (Document.status == "processing"),
+            (Document.collection_id == c.id) & (Document.status == "failed"),
+        ):
+            (await session.exec(select(func.count(Document.id)).where(cond))).one()
+    return len(collections)
+
+
+async def _seed(factory, n_collections: int, docs_per_collection: int) -> None:
+    async with factory() as session:
+        session.add_all(Collection(name=f"c{i}", xai_id=f"x{i}") for i in range(n_collections))
+        await session.commit()
+        ids = (await session.exec(select(Collection.id))).all()
+        session.add_all(
+            Document(name=f"d{j}", xai_doc_id=f"{cid}-{j}", collection_id=cid, status=STATUSES[j % len(STATUSES)])
+            for cid in ids
+            for j in range(docs_per_collection)
+        )
+        await session.commit()
+
+
+async def _time(factory, fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        async with factory() as session:
+            t0 = time.perf_counter()
+            await fn(session)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+async def run(sizes: list[int], docs_per_collection: int, repeat: int) -> None:
+    print(f"{'collections':>12} {'old ms':>10} {'new ms':>10} {'page(100) ms':>13}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+            async with engine.begin() as conn:
+                await conn.run_sync(SQLModel.metadata.create_all)
+            factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            await _seed(factory, n, docs_per_collection)
+
+            old_ms = await _time(factory, _old_list, repeat)
+            new_ms = await _time(factory, _list_collection_rows, repeat)
+            page_ms = await _time(factory, lambda s: _list_collection_rows(s, after_id=n // 2, limit=100), repeat)
+            print(f"{n:>12} {old_ms:>10.1f} {new_ms:>10.1f} {page_ms:>13.1f}")
+            await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--docs-per-collection", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    asyncio.run(run(sizes, args.docs_per_collection, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+/chat latency while other clients log in, with bcrypt inline on the event
+loop (old) vs on the bounded PasswordHasher pool (new). The RAG call is
+simulated (--rag-ms) so only the event loop's responsiveness is measured.
+
+    python benchmarks/bench_login_storm.py --logins 8 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import app as app_mod
+import database
+from auth_utils import PasswordHasher, create_access_token, get_password_hash, verify_password
+from models import Collection, User
+
+
+class InlineHasher:
+    """The old behaviour: bcrypt runs synchronously inside the handler."""
+
+    def saturated(self) -> bool:
+        return False
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return verify_password(plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return get_password_hash(password)
+
+
+def _p(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _run(label: str, hasher, factory, coll_id: int, args) -> None:
+    app_mod.password_hasher = hasher
+    token = create_access_token({"sub": "bench@example.com"}, timedelta(minutes=30))
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.perf_counter() + args.seconds
+    chat_ms: list[float] = []
+    logins = {"ok": 0, "429": 0}
+
+    async def chatter(client: httpx.AsyncClient, n: int) -> None:
+        i = 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            r = await client.post("/chat", headers=headers, json={"query": f"{label}-{n}-{i}", "collection_id": coll_id})
+            r.raise_for_status()
+            chat_ms.append((time.perf_counter() - t0) * 1000)
+            i += 1
+
+    async def login(client: httpx.AsyncClient) -> None:
+        while time.perf_counter() < deadline:
+            r = await client.post("/token", data={"username": "bench@example.com", "password": "pw"})
+            logins["ok" if r.status_code == 200 else str(r.status_code)] += 1
+            if r.status_code == 429:
+                await asyncio.sleep(0.05)
+
+    transport = httpx.ASGITransport(app=app_mod.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(
+            *(chatter(client, n) for n in range(args.chatters)),
+            *(login(client) for _ in range(args.logins)),
+        )
+    print(f"{label:>4} {len(chat_ms):>6} {statistics.median(chat_ms):>8.1f} {_p(chat_ms, 0.99):>8.1f} "
+          f"{max(chat_ms):>8.1f} {logins['ok']:>7} {logins['429']:>5}")
+
+
+async def main_async(args) -> None:
+    async def fake_rag(client, collection_id, query, filters=None, documents=None):
+        await asyncio.sleep(args.rag_ms / 1000)
+        return {"answer": "ok", "citations": [], "latency_ms": args.rag_ms, "usage": None}
+
+    app_mod.run_rag = fake_rag
+    app_mod._precheck_answer = lambda db_collection: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.make_engine(f"sqlite+aiosqlite:///{tmp}/bench.db", echo=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            session.add(User(email="bench@example.com", hashed_password=get_password_hash("pw")))
+            coll = Collection(name="bench", xai_id="x-bench")
+            session.add(coll)
+            await session.commit()
+            coll_id = coll.id
+
+        async def get_session():
+            async with factory() as session:
+                yield session
+
+        app_mod.app.dependency_overrides[database.get_session] = get_session
+        print(f"{'':>4} {'chats':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'logins':>7} {'429s':>5}")
+        await _run("old", InlineHasher(), factory, coll_id, args)
+        hasher = PasswordHasher()
+        await _run("new", hasher, factory, coll_id, args)
+        hasher.shutdown()
+        app_mod.app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--chatters", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--rag-ms", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,229 @@
+import asyncio
 import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
 from cachetools import TTLCache
 
-from config import CACHE_MAXSIZE, CACHE_TTL_SEC
+from config import CACHE_MAXSIZE, CACHE_TTL_SEC, CACHE_L2_PATH, CACHE_L2_MAX_BYTES, CACHE_L2_TTL_SEC
 
+# L1: per-process, L2: SQLite file shared by every worker on the host
 _cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL_SEC)
 
-def _key(collection_id: str, model: str, query: str, filters: dict | None) -> str:
-    raw = f"{collection_id}|{model}|{query}|{filters or {}}"
+# In-flight upstream calls by cache key (single-flight, per process)
+_inflight: dict[str, asyncio.Task] = {}
+
+# Check the L2 size budget every N writes rather than on each one
+_EVICT_EVERY = 32
+# LRU order only needs to be approximate: a hit rewrites accessed_at at most this often
+_TOUCH_EVERY_SEC = 60
+
+
+def _encode(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class DiskCache:
+    """WAL-mode SQLite key/value store with TTL and LRU eviction by total bytes."""
+
+    def __init__(self, path: str, max_bytes: int, ttl_sec: int, table: str = "answer_cache"):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross a fork (uvicorn --workers)
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_accessed ON {self.table} (accessed_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                f"SELECT value, accessed_at FROM {self.table} WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= _TOUCH_EVERY_SEC:
+                conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        return _decode(row[0])
+
+    def set(self, key: str, value) -> None:
+        blob = _encode(value)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now + self.ttl_sec, now),
+            )
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until we are back under budget
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+
+
+# Opened by init_l2() at app startup, so importing this module touches no files
+_l2: DiskCache | None = None
+
+
+def init_l2(path: str = CACHE_L2_PATH) -> None:
+    global _l2
+    _l2 = DiskCache(path, CACHE_L2_MAX_BYTES, CACHE_L2_TTL_SEC) if path else None
+
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Case, width, whitespace and punctuation folded away: Korean spacing is
+    irregular, so "연차는 몇 일인가요?" and "연차는 몇일인가요" share a key.
+    """
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", query).lower())
+
+
+def _key(collection_id: str, model: str, query: str, filters: dict | None, version: int = 0) -> str:
+    # version is the collection's content_version; bumping it orphans old answers
+    raw = f"{collection_id}@{version}|{model}|{normalize_query(query)}|{filters or {}}"
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-def cache_get(collection_id: str, model: str, query: str, filters: dict | None):
-    return _cache.get(_key(collection_id, model, query, filters))
 
-def cache_set(collection_id: str, model: str, query: str, filters: dict | None, value):
-    _cache[_key(collection_id, model, query, filters)] = value
+def _tagged(value, tier: str):
+    # The serving tier is reported on a copy so cached objects stay untouched
+    if isinstance(value, dict):
+        return {**value, "cache_tier": tier}
+    return value
+
+
+def _l2_get(key: str):
+    try:
+        return _l2.get(key)
+    except sqlite3.Error as e:
+        print(f"Warning: L2 cache read failed: {e}")
+        return None
+
+
+def _l2_set(key: str, value) -> None:
+    try:
+        _l2.set(key, value)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"Warning: L2 cache write failed: {e}")
+
+
+def _promote(key: str, value):
+    if value is None:
+        return None
+    _cache[key] = value
+    return _tagged(value, "l2")
+
+
+def cache_get(collection_id: str, model: str, query: str, filters: dict | None, version: int = 0):
+    """Blocking on an L1 miss (reads the L2 file); from async code use cache_get_async."""
+    key = _key(collection_id, model, query, filters, version)
+    value = _cache.get(key)
+    if value is not None:
+        return _tagged(value, "l1")
+    if _l2 is None:
+        return None
+    return _promote(key, _l2_get(key))
+
+
+def cache_set(collection_id: str, model: str, query: str, filters: dict | None, value, version: int = 0):
+    """Blocking (writes the L2 file); from async code use cache_set_async."""
+    key = _key(collection_id, model, query, filters, version)
+    _cache[key] = value
+    if _l2 is not None:
+        _l2_set(key, value)
+
+
+async def cache_get_async(collection_id: str, model: str, query: str, filters: dict | None, version: int = 0):
+    key = _key(collection_id, model, query, filters, version)
+    value = _cache.get(key)
+    if value is not None:
+        return _tagged(value, "l1")
+    if _l2 is None:
+        return None
+    # sqlite3 can block on the busy timeout; keep it off the event loop
+    return _promote(key, await asyncio.to_thread(_l2_get, key))
+
+
+async def cache_set_async(collection_id: str, model: str, query: str, filters: dict | None, value, version: int = 0):
+    key = _key(collection_id, model, query, filters, version)
+    _cache[key] = value
+    if _l2 is not None:
+        await asyncio.to_thread(_l2_set, key, value)
+
+
+def _release(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Mark the exception retrieved even if every waiter went away
+    if not task.cancelled():
+        task.exception()
+
+
+async def single_flight(collection_id: str, model: str, query: str, filters: dict | None, fn, version: int = 0):
+    """
+    Run fn() once for concurrent callers sharing a cache key.
+    Returns (result, coalesced) where coalesced is True for callers that
+    awaited another caller's call. The call runs as its own task, so a
+    disconnecting first caller does not cancel it for the others.
+    """
+    key = _key(collection_id, model, query, filters, version)
+    task = _inflight.get(key)
+    if task is not None:
+        return await asyncio.shield(task), True
+    task = asyncio.ensure_future(fn())
+    _inflight[key] = task
+    task.add_done_callback(lambda t: _release(key, t))
+    return await asyncio.shield(task), False
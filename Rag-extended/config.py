@@ -10,12 +10,116 @@ XAI_MODEL = os.getenv("XAI_MODEL", "grok-4-1-fast")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "my_rag_collection")
 COLLECTION_ID = os.getenv("COLLECTION_ID", "")
 
+# Database (SQLite by default; postgresql+asyncpg://... for Postgres)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./rag.db")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")  # log every SQL statement
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+DB_POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
 # Search params
 TOP_K = int(os.getenv("TOP_K", "5"))
 
 # Cache
-CACHE_TTL_SEC = int(os.getenv("CACHE_TTL_SEC", "300"))
+# Answers are keyed on the collection's content_version, so a long TTL is safe
+CACHE_TTL_SEC = int(os.getenv("CACHE_TTL_SEC", "21600"))
 CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "2048"))
+# Shared on-disk L2 tier (empty path disables it)
+CACHE_L2_PATH = os.getenv("CACHE_L2_PATH", "./cache.db")
+CACHE_L2_MAX_BYTES = int(os.getenv("CACHE_L2_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_L2_TTL_SEC = int(os.getenv("CACHE_L2_TTL_SEC", str(CACHE_TTL_SEC)))
+
+# Semantic (near-duplicate query) cache, off by default
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))  # per collection/model/filters
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "2048"))
+# Local sentence-transformers model (e.g. jhgan/ko-sroberta-multitask) for paraphrase
+# matching; empty uses hashed n-grams. Retune SEMANTIC_CACHE_THRESHOLD for the model
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "")
+
+# Background document status reconciler
+RECONCILE_INTERVAL_SEC = float(os.getenv("RECONCILE_INTERVAL_SEC", "5"))
+RECONCILE_MAX_BACKOFF_SEC = float(os.getenv("RECONCILE_MAX_BACKOFF_SEC", "120"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "8"))
+
+# Text extraction process pool
+EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_TIMEOUT_SEC = float(os.getenv("EXTRACT_TIMEOUT_SEC", "120"))  # per worker job; a timeout recycles the pool
+EXTRACT_PDF_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PDF_PARALLEL_MIN_PAGES", "50"))
+
+# Extracted text / analysis cache keyed by file SHA-256 (empty path disables it)
+CONTENT_CACHE_PATH = os.getenv("CONTENT_CACHE_PATH", "./content_cache.db")
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+CONTENT_CACHE_TTL_SEC = int(os.getenv("CONTENT_CACHE_TTL_SEC", str(30 * 24 * 3600)))
+# Extracted text larger than this is not cached (it is streamed to disk instead)
+CONTENT_CACHE_MAX_ITEM_BYTES = int(os.getenv("CONTENT_CACHE_MAX_ITEM_BYTES", str(16 * 1024 * 1024)))
+
+# Uploads are spooled to disk in chunks instead of being read into memory
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "")
+# POST /collections/{id}/upload-batch (files or zip archives)
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "1000"))
+UPLOAD_BATCH_MAX_BYTES = int(os.getenv("UPLOAD_BATCH_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Background ingestion jobs (upload -> extract -> xAI upload)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+INGEST_RETRY_BASE_SEC = float(os.getenv("INGEST_RETRY_BASE_SEC", "5"))
+INGEST_RETRY_MAX_SEC = float(os.getenv("INGEST_RETRY_MAX_SEC", "300"))
+INGEST_POLL_INTERVAL_SEC = float(os.getenv("INGEST_POLL_INTERVAL_SEC", "2"))
+# A running job's owner refreshes updated_at every LEASE/3; other processes
+# re-queue it only once it has gone unrefreshed for the whole lease
+INGEST_LEASE_SEC = float(os.getenv("INGEST_LEASE_SEC", "90"))
+# Queued uploads wait here until a worker picks them up (must survive restarts)
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "./ingest_spool")
+# ingest_folder.py sync state (path -> sha256 -> xai_doc_id)
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "./ingest_manifest.db")
+
+# Shared outbound HTTP client (xAI REST and external sources)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SEC = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SEC", "60"))
+HTTP_ROUTE_TIMEOUTS = {
+    "default": float(os.getenv("HTTP_TIMEOUT_DEFAULT_SEC", "30")),
+    "analyze": float(os.getenv("HTTP_TIMEOUT_ANALYZE_SEC", "60")),
+    "analyze_collection": float(os.getenv("HTTP_TIMEOUT_ANALYZE_COLLECTION_SEC", "60")),
+    "rest": float(os.getenv("HTTP_TIMEOUT_REST_SEC", "5")),
+}
+
+# Decoded bearer token -> user principal (skips the per-request User query)
+AUTH_CACHE_TTL_SEC = float(os.getenv("AUTH_CACHE_TTL_SEC", "60"))
+AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+
+# bcrypt runs on a dedicated thread pool; logins beyond the pending limit get 429
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+
+# Write-behind UsageEvent recorder: flushed every N events or T ms
+USAGE_FLUSH_BATCH = int(os.getenv("USAGE_FLUSH_BATCH", "200"))
+USAGE_FLUSH_INTERVAL_MS = int(os.getenv("USAGE_FLUSH_INTERVAL_MS", "500"))
+USAGE_BUFFER_MAX = int(os.getenv("USAGE_BUFFER_MAX", "10000"))  # oldest events dropped beyond this
+# Usage rollups: fine-grained buckets are pruned after these windows
+USAGE_ROLLUP_MINUTE_RETENTION_HOURS = int(os.getenv("USAGE_ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+USAGE_ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("USAGE_ROLLUP_HOUR_RETENTION_DAYS", "90"))
+
+# Comma-separated emails allowed to use admin endpoints and request profiling.
+# Empty by default: nobody is an admin until this is set (never the seeded default account)
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# Request profiling: admins opt in per request (X-Profile: 1 or ?profile=1);
+# PROFILE_SAMPLE_EVERY_N > 0 also profiles every Nth request automatically
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_SAMPLE_EVERY_N = int(os.getenv("PROFILE_SAMPLE_EVERY_N", "0"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(100 * 1024 * 1024)))
 
 # Cost tracking (USD per 1M tokens)
 COST_PER_1M_INPUT = float(os.getenv("COST_PER_1M_INPUT", "0.20"))
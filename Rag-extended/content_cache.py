@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+
+from cache import DiskCache
+from config import (
+    CONTENT_CACHE_MAX_BYTES,
+    CONTENT_CACHE_MAX_ITEM_BYTES,
+    CONTENT_CACHE_PATH,
+    CONTENT_CACHE_TTL_SEC,
+)
+from extraction import Source, extraction_pool
+
+# Keyed by SHA-256 of the uploaded bytes, so re-analyzing or uploading an
+# identical file skips both parsing and the LLM call.
+_store = (
+    DiskCache(CONTENT_CACHE_PATH, CONTENT_CACHE_MAX_BYTES, CONTENT_CACHE_TTL_SEC, table="content_cache")
+    if CONTENT_CACHE_PATH
+    else None
+)
+
+
+def _sha256(source: Source) -> str:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    with open(source, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def content_sha256(source: Source) -> str:
+    # hashlib releases the GIL for large buffers, so a thread keeps the loop free
+    return await asyncio.to_thread(_sha256, source)
+
+
+async def _get(key: str):
+    if _store is None:
+        return None
+    try:
+        return await asyncio.to_thread(_store.get, key)
+    except sqlite3.Error as e:
+        print(f"Warning: content cache read failed: {e}")
+        return None
+
+
+async def _set(key: str, value) -> None:
+    if _store is None:
+        return
+    try:
+        await asyncio.to_thread(_store.set, key, value)
+    except sqlite3.Error as e:
+        print(f"Warning: content cache write failed: {e}")
+
+
+def _text_key(sha: str, filename: str) -> str:
+    # Extraction depends on the extension (.txt decode vs. PDF parse)
+    return f"text:{os.path.splitext(filename.lower())[1]}:{sha}"
+
+
+async def cached_extract(source: Source, filename: str, sha: str | None = None) -> str:
+    """
+    extraction_pool.extract with a content-hash cache in front. Failures and
+    timeouts raise ExtractionError and are never cached.
+    """
+    sha = sha or await content_sha256(source)
+    key = _text_key(sha, filename)
+    text = await _get(key)
+    if text is not None:
+        return text
+    text = await extraction_pool.extract(source, filename)
+    await _set(key, text)
+    return text
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read_text_capped(path: str, cap: int) -> str | None:
+    if os.path.getsize(path) > cap:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+async def cached_extract_to_file(source: Source, filename: str, sha: str, out_path: str) -> None:
+    """
+    cached_extract for large uploads: the text lands in out_path without
+    passing through this process's memory; only texts up to
+    CONTENT_CACHE_MAX_ITEM_BYTES are read back for the cache.
+    """
+    key = _text_key(sha, filename)
+    text = await _get(key)
+    if text is not None:
+        await asyncio.to_thread(_write_text, out_path, text)
+        return
+    await extraction_pool.extract_to_file(source, filename, out_path)
+    if _store is None:
+        return
+    text = await asyncio.to_thread(_read_text_capped, out_path, CONTENT_CACHE_MAX_ITEM_BYTES)
+    if text is not None:
+        await _set(key, text)
+
+
+async def get_analysis(sha: str, model: str) -> dict | None:
+    return await _get(f"analysis:{model}:{sha}")
+
+
+async def set_analysis(sha: str, model: str, analysis: dict) -> None:
+    await _set(f"analysis:{model}:{sha}", analysis)
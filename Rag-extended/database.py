@@ -1,20 +1,174 @@
-from sqlmodel import SQLModel, create_engine
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlmodel import SQLModel
+from sqlalchemy import event, inspect, literal, select, text, update
+from sqlalchemy.engine import make_url
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from config import (
+    DATABASE_URL,
+    DB_ECHO,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE_SEC,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_SEC,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_BYTES,
+)
+from models import Collection, UsageEvent
+
+
+def _async_url(url: str) -> str:
+    # Plain postgres:// URLs (as most hosts hand them out) get the asyncpg driver
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets readers run alongside the single writer; NORMAL only fsyncs at checkpoints
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    cursor.close()
+
+
+def make_engine(url: str = DATABASE_URL, echo: bool = DB_ECHO) -> AsyncEngine:
+    url = _async_url(url)
+    if url.startswith("sqlite"):
+        if make_url(url).database in (None, "", ":memory:"):
+            # In-memory databases live on one connection (StaticPool)
+            engine = create_async_engine(url, echo=echo)
+        else:
+            engine = create_async_engine(
+                url,
+                echo=echo,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT_SEC,
+            )
+            event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+        return engine
+    return create_async_engine(
+        url,
+        echo=echo,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_SEC,
+        pool_recycle=DB_POOL_RECYCLE_SEC,
+        pool_pre_ping=True,
+    )
+
 
-DATABASE_URL = "sqlite+aiosqlite:///./rag.db"
+engine = make_engine()
+# One factory for the whole process; sessions are cheap, the factory is not
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+def _add_column_ddl(table, column, dialect) -> str:
+    quote = dialect.identifier_preparer.quote
+    ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect)}"
+    if column.default is not None and column.default.is_scalar:
+        # Rendered by the dialect: booleans are 1/0 on SQLite but true/false on Postgres
+        default = literal(column.default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        ddl += f" DEFAULT {default}"
+    return ddl
+
+def _add_missing_columns(conn) -> None:
+    """create_all never alters existing tables; add new model columns in place."""
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(_add_column_ddl(table, column, conn.dialect)))
+
+def _create_missing_indexes(conn) -> None:
+    """Likewise for indexes declared on tables that already exist."""
+    inspector = inspect(conn)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+# One-off upgrade steps that the column/index sync cannot express (data
+# fixes, renames, ...). Append only: each runs once per database, in order,
+# and is recorded in schema_migrations.
+def _backfill_usage_rollups(conn) -> None:
+    from usage_rollup import rollup_statements
+
+    columns = (
+        UsageEvent.id, UsageEvent.collection_id, UsageEvent.model, UsageEvent.prompt_tokens,
+        UsageEvent.completion_tokens, UsageEvent.total_tokens, UsageEvent.cost_usd,
+        UsageEvent.latency_ms, UsageEvent.cached, UsageEvent.coalesced, UsageEvent.created_at,
+    )
+    # Pages by id rather than yield_per: asyncpg cannot stream a server-side
+    # cursor through run_sync. Upserts add up, so each page is folded in on its own.
+    last_id = 0
+    while True:
+        events = conn.execute(
+            select(*columns).where(UsageEvent.id > last_id).order_by(UsageEvent.id).limit(5000)
+        ).all()
+        if not events:
+            break
+        for statement in rollup_statements(conn.dialect.name, events):
+            conn.execute(statement)
+        last_id = events[-1].id
+
+MIGRATIONS: list[tuple[int, str, Callable]] = [
+    (1, "refresh planner statistics for the new indexes", lambda conn: conn.execute(text("ANALYZE"))),
+    (2, "build usage rollups from existing usage events", _backfill_usage_rollups),
+]
+
+def _run_migrations(conn) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at VARCHAR(32) NOT NULL)"
+    ))
+    applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        step(conn)
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+            {"v": version, "d": description, "t": datetime.now(timezone.utc).isoformat()},
+        )
+        print(f"Applied migration {version}: {description}")
+
+def migrate(conn) -> None:
+    """Bring an existing (or empty) database up to the current models."""
+    SQLModel.metadata.create_all(conn)
+    _add_missing_columns(conn)
+    _create_missing_indexes(conn)
+    _run_migrations(conn)
 
 async def init_db():
     async with engine.begin() as conn:
         # await conn.run_sync(SQLModel.metadata.drop_all)
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(migrate)
+
+async def bump_content_version(session: AsyncSession, *collection_ids: int) -> None:
+    """Invalidate cached answers for these collections (caller commits)."""
+    ids = [cid for cid in collection_ids if cid is not None]
+    if ids:
+        await session.exec(
+            update(Collection)
+            .where(Collection.id.in_(ids))
+            .values(content_version=Collection.content_version + 1)
+        )
 
 async def get_session() -> AsyncSession:
-    async_session = sessionmaker(
-        engine, class_=AsyncSession, expire_on_commit=False
-    )
     async with async_session() as session:
         yield session
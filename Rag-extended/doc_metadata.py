@@ -0,0 +1,91 @@
+from typing import Any
+
+from sqlalchemy import delete, distinct, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from filters import _normalize_tags
+from models import Document, DocumentMetadata, DocumentTag
+
+
+def add_document_metadata(session: AsyncSession, document: Document, metadata: dict | None) -> None:
+    """
+    Stage the metadata and tag rows for a flushed Document (caller commits).
+    A row is written even without metadata so the prefilter knows the
+    document has none, as opposed to one uploaded before this table existed.
+    """
+    metadata = metadata or {}
+    related = metadata.get("related_docs")
+    session.add(DocumentMetadata(
+        document_id=document.id,
+        collection_id=document.collection_id,
+        category=metadata.get("category"),
+        version=metadata.get("version"),
+        date=metadata.get("date"),
+        related_docs=",".join(related) if isinstance(related, list) else related,
+        relationship_note=metadata.get("relationship_note"),
+        policy_note=metadata.get("policy_note"),
+    ))
+    for tag in dict.fromkeys(_normalize_tags(metadata.get("tags")) or []):
+        session.add(DocumentTag(document_id=document.id, tag=tag, collection_id=document.collection_id))
+
+
+async def delete_document_metadata(session: AsyncSession, document_ids: Any) -> None:
+    """document_ids: a list of ids or a select() of them (caller commits)."""
+    await session.exec(delete(DocumentTag).where(DocumentTag.document_id.in_(document_ids)))
+    await session.exec(delete(DocumentMetadata).where(DocumentMetadata.document_id.in_(document_ids)))
+
+
+async def prefilter_documents(
+    session: AsyncSession,
+    collection_id: int,
+    filters: dict | None,
+) -> list[Document] | None:
+    """
+    Resolve chat Filters to the collection's matching documents using the
+    local metadata tables. Returns None when there is nothing to filter on or
+    the answer cannot be decided locally (documents without a metadata row);
+    an empty list means no document can match.
+    """
+    if not filters:
+        return None
+    category = filters.get("category")
+    version = filters.get("version")
+    tags = _normalize_tags(filters.get("tags"))
+    date_from = filters.get("date_from")
+    date_to = filters.get("date_to")
+    if not (category or version or tags or date_from or date_to):
+        return None
+
+    unknown = (await session.exec(
+        select(func.count())
+        .select_from(Document)
+        .outerjoin(DocumentMetadata, DocumentMetadata.document_id == Document.id)
+        .where(Document.collection_id == collection_id, DocumentMetadata.document_id.is_(None))
+    )).one()
+    if unknown:
+        return None
+
+    statement = (
+        select(Document)
+        .join(DocumentMetadata, DocumentMetadata.document_id == Document.id)
+        .where(DocumentMetadata.collection_id == collection_id, Document.status != "failed")
+    )
+    if category:
+        statement = statement.where(DocumentMetadata.category == category)
+    if version:
+        statement = statement.where(DocumentMetadata.version == version)
+    if date_from:
+        statement = statement.where(DocumentMetadata.date >= date_from)
+    if date_to:
+        statement = statement.where(DocumentMetadata.date <= date_to)
+    if tags:
+        # Every requested tag must be present ($all)
+        tagged = (
+            select(DocumentTag.document_id)
+            .where(DocumentTag.collection_id == collection_id, DocumentTag.tag.in_(tags))
+            .group_by(DocumentTag.document_id)
+            .having(func.count(distinct(DocumentTag.tag)) == len(set(tags)))
+        )
+        statement = statement.where(Document.id.in_(tagged))
+    return list((await session.exec(statement)).all())
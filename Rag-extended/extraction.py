@@ -0,0 +1,266 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import EXTRACT_MAX_WORKERS, EXTRACT_TIMEOUT_SEC, EXTRACT_PDF_PARALLEL_MIN_PAGES
+from metrics import EXTRACTION_JOBS, EXTRACTION_QUEUE_DEPTH, EXTRACTION_RECYCLES
+
+# A source is either the raw bytes or a path to a spooled file on disk;
+# paths keep large uploads out of memory and out of inter-process pickles.
+Source = bytes | str
+
+
+class ExtractionError(Exception):
+    """No usable text was extracted; callers fall back to the original file."""
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+def _stream(source: Source):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _read_bytes(source: Source) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def extract_text(source: Source, filename: str) -> str:
+    """
+    Extract text from file content for AI analysis. Raises ExtractionError
+    when a PDF/Word file cannot be parsed; images and unknown types get a
+    fixed placeholder.
+    """
+    ext = os.path.splitext(filename.lower())[1]
+    if ext in ('.txt', '.md'):
+        return _read_bytes(source).decode('utf-8', errors='replace')
+    if ext in ('.docx', '.doc'):
+        try:
+            import docx
+            doc = docx.Document(_stream(source))
+            return "\n".join(para.text for para in doc.paragraphs if para.text.strip())
+        except Exception as e:
+            raise ExtractionError(f"{filename}: {e}") from None
+    if ext == '.pdf':
+        try:
+            return _pdf_pages_text(source, 0, None)
+        except Exception as e:
+            raise ExtractionError(f"{filename}: {e}") from None
+    if ext in ('.jpg', '.jpeg', '.png', '.gif'):
+        return f"[이미지 파일: {filename}]"
+    return f"[파일: {filename}]"
+
+
+def extract_text_to_file(source: Source, filename: str, out_path: str) -> None:
+    """Worker-side extraction that hands back nothing but the output file."""
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(extract_text(source, filename))
+
+
+def _pdf_pages_text(source: Source, start: int, stop: int | None) -> str:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(_stream(source))
+    return "\n".join(page.extract_text() or "" for page in reader.pages[start:stop])
+
+
+def _pdf_pages_to_file(source: Source, start: int, stop: int, out_path: str) -> None:
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(_pdf_pages_text(source, start, stop))
+
+
+def _pdf_page_count(source: Source) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(_stream(source)).pages)
+
+
+def _concat_files(parts: list[str], out_path: str) -> None:
+    with open(out_path, "wb") as out:
+        for i, part in enumerate(parts):
+            if i:
+                out.write(b"\n")
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+async def _gather(coros) -> list:
+    """asyncio.gather that cancels the other page ranges once one fails."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class ExtractionPool:
+    """
+    Bounded process pool for CPU-bound text extraction so parsing never runs
+    on the event loop. Large PDFs are split into page ranges across workers.
+    Each worker job gets timeout_sec; one that times out recycles the pool so
+    a stuck parse cannot hold a worker slot.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = EXTRACT_MAX_WORKERS,
+        timeout_sec: float = EXTRACT_TIMEOUT_SEC,
+        parallel_min_pages: int = EXTRACT_PDF_PARALLEL_MIN_PAGES,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.timeout_sec = timeout_sec
+        self.parallel_min_pages = parallel_min_pages
+        self._executor: ProcessPoolExecutor | None = None
+        # Jobs submitted but not finished (queued + running)
+        self.queue_depth = 0
+        self.completed = 0
+        self.failed = 0  # raised in the worker or lost to a broken pool (timeouts are counted apart)
+        self.timeouts = 0
+        self.recycles = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _recycle(self) -> None:
+        """Kill every worker (the stuck one cannot be singled out) and start afresh on next use."""
+        old, self._executor = self._executor, None
+        if old is None:
+            return
+        self.recycles += 1
+        EXTRACTION_RECYCLES.inc()
+        for proc in list((old._processes or {}).values()):
+            proc.terminate()
+        # Jobs still on the old pool fail with BrokenProcessPool and are resubmitted by _submit
+        old.shutdown(wait=False)
+
+    async def _submit(self, filename: str, fn, *args):
+        self.queue_depth += 1
+        EXTRACTION_QUEUE_DEPTH.inc()
+        try:
+            result = await self._run(filename, fn, args)
+        except ExtractionTimeout:
+            raise
+        except Exception:
+            self.failed += 1
+            EXTRACTION_JOBS.labels(result="failed").inc()
+            raise
+        finally:
+            self.queue_depth -= 1
+            EXTRACTION_QUEUE_DEPTH.dec()
+        self.completed += 1
+        EXTRACTION_JOBS.labels(result="completed").inc()
+        return result
+
+    async def _run(self, filename: str, fn, args):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool()
+            try:
+                # The deadline is per attempt: a job resubmitted because another
+                # call's timeout recycled the pool starts over rather than
+                # inheriting the time it already spent
+                return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout=self.timeout_sec)
+            except asyncio.TimeoutError:
+                raise self._timed_out(filename) from None
+            except BrokenProcessPool:
+                if pool is self._executor:
+                    # Broke on its own (e.g. a worker crashed): replace it for later calls
+                    self._executor = None
+                    raise
+                if attempt:
+                    raise
+
+    def _timed_out(self, filename: str) -> ExtractionTimeout:
+        self.timeouts += 1
+        EXTRACTION_JOBS.labels(result="timeout").inc()
+        self._recycle()
+        print(f"Warning: text extraction timed out after {self.timeout_sec}s: {filename}")
+        return ExtractionTimeout(filename)
+
+    async def extract(self, source: Source, filename: str) -> str:
+        """Extracted text; raises ExtractionError (ExtractionTimeout when a job runs past timeout_sec)."""
+        try:
+            return await self._extract(source, filename)
+        except ExtractionError:
+            raise
+        except Exception as e:
+            raise ExtractionError(f"{filename}: {e}") from e
+
+    async def extract_to_file(self, source: Source, filename: str, out_path: str) -> None:
+        """Like extract, but the text goes straight from the worker(s) to out_path."""
+        try:
+            await self._extract_to_file(source, filename, out_path)
+        except ExtractionError:
+            raise
+        except Exception as e:
+            raise ExtractionError(f"{filename}: {e}") from e
+
+    async def _page_ranges(self, source: Source, filename: str) -> list[tuple[int, int]] | None:
+        """Page ranges for a parallel PDF split, or None to extract in one job."""
+        if os.path.splitext(filename.lower())[1] != ".pdf" or self.max_workers == 1:
+            return None
+        try:
+            pages = await self._submit(filename, _pdf_page_count, source)
+        except ExtractionTimeout:
+            raise
+        except Exception:
+            return None
+        if pages < self.parallel_min_pages:
+            return None
+        step = -(-pages // self.max_workers)
+        return [(start, min(start + step, pages)) for start in range(0, pages, step)]
+
+    async def _extract(self, source: Source, filename: str) -> str:
+        ranges = await self._page_ranges(source, filename)
+        if ranges is None:
+            return await self._submit(filename, extract_text, source, filename)
+        parts = await _gather(self._submit(filename, _pdf_pages_text, source, a, b) for a, b in ranges)
+        return "\n".join(parts)
+
+    async def _extract_to_file(self, source: Source, filename: str, out_path: str) -> None:
+        ranges = await self._page_ranges(source, filename)
+        if ranges is None:
+            await self._submit(filename, extract_text_to_file, source, filename, out_path)
+            return
+        part_paths = [f"{out_path}.part{i}" for i in range(len(ranges))]
+        try:
+            await _gather(
+                self._submit(filename, _pdf_pages_to_file, source, a, b, part)
+                for (a, b), part in zip(ranges, part_paths)
+            )
+            await asyncio.to_thread(_concat_files, part_paths, out_path)
+        finally:
+            for part in part_paths:
+                if os.path.exists(part):
+                    os.remove(part)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "recycles": self.recycles,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_pool = ExtractionPool()
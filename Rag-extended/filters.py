@@ -42,6 +42,16 @@ def build_metadata(
     return metadata or None
 
 
+def metadata_fields(metadata: dict | None) -> dict[str, str] | None:
+    """Flatten build_metadata() output into the string fields xAI documents accept."""
+    if not metadata:
+        return None
+    return {
+        key: ",".join(value) if isinstance(value, list) else str(value)
+        for key, value in metadata.items()
+    }
+
+
 def build_search_filters(filters: dict | None) -> dict | None:
     if not filters:
         return None
@@ -0,0 +1,100 @@
+import httpx
+
+from config import (
+    HTTP_KEEPALIVE_EXPIRY_SEC,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_ROUTE_TIMEOUTS,
+)
+from metrics import HTTP_CONNECTIONS_NEW, HTTP_POOL_IN_USE, HTTP_POOL_MAX, HTTP_REQUESTS
+
+# One application-scoped client (created in lifespan) so every outbound call
+# reuses pooled keep-alive / HTTP/2 connections instead of a fresh TLS handshake.
+_client: httpx.AsyncClient | None = None
+_stats = {"requests": 0, "new_connections": 0, "in_use": 0}
+HTTP_POOL_MAX.set(HTTP_MAX_CONNECTIONS)
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    # httpcore trace events ("<module>.<step>.<phase>"), all from the public
+    # trace extension: pool state is counted here, not read off the transport
+    step, _, phase = event_name.partition(".")[2].rpartition(".")
+    if step == "connect_tcp" and phase == "complete":
+        _stats["new_connections"] += 1
+        HTTP_CONNECTIONS_NEW.inc()
+    elif step == "send_request_headers" and phase == "started":
+        _stats["in_use"] += 1
+        HTTP_POOL_IN_USE.inc()
+    elif step == "response_closed" and phase in ("complete", "failed"):
+        # Also emitted when the request fails after it got a connection
+        _stats["in_use"] -= 1
+        HTTP_POOL_IN_USE.dec()
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["requests"] += 1
+    HTTP_REQUESTS.inc()
+    request.extensions["trace"] = _trace
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _create() -> httpx.AsyncClient:
+    http2 = _http2_available()
+    if not http2:
+        print("Warning: 'h2' not installed; outbound HTTP falls back to HTTP/1.1 keep-alive.")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SEC,
+        ),
+        timeout=route_timeout("default"),
+        event_hooks={"request": [_on_request]},
+    )
+
+
+async def start_http_client() -> None:
+    global _client
+    if _client is None:
+        _client = _create()
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client; created lazily for scripts that don't run the app lifespan."""
+    global _client
+    if _client is None:
+        _client = _create()
+    return _client
+
+
+def route_timeout(route: str) -> httpx.Timeout:
+    seconds = HTTP_ROUTE_TIMEOUTS.get(route, HTTP_ROUTE_TIMEOUTS["default"])
+    return httpx.Timeout(seconds, connect=min(seconds, 10.0))
+
+
+def http_stats() -> dict:
+    """This process's pool counters (the same values are exported on /metrics)."""
+    requests = _stats["requests"]
+    reused = max(0, requests - _stats["new_connections"])
+    return {
+        "requests": requests,
+        "new_connections": _stats["new_connections"],
+        "connection_reuse_ratio": round(reused / requests, 4) if requests else None,
+        "pool_in_use": _stats["in_use"],
+        "pool_utilization": round(_stats["in_use"] / HTTP_MAX_CONNECTIONS, 4),
+    }
@@ -1,27 +1,43 @@
 import argparse
 import asyncio
+import json
+import math
 import os
+import sys
+import time
+import uuid
+from collections import Counter
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
 
 from xai_sdk import AsyncClient
+from sqlalchemy import delete
 from sqlmodel import select
 
-from database import init_db, get_session
+from config import INGEST_MANIFEST_PATH
+from database import init_db, get_session, bump_content_version
+from doc_metadata import add_document_metadata, delete_document_metadata
 from models import Collection, Document
-from filters import build_metadata
-from xai_helpers import extract_document_id
-from xai_sdk.proto import collections_pb2
-
-STATUS_PROCESSED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_PROCESSED
-STATUS_FAILED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_FAILED
+from filters import build_metadata, metadata_fields
+from ingest_manifest import IngestManifest, file_sha256
+from xai_helpers import (
+    delete_collection_document,
+    extract_document_id,
+    status_is_failed,
+    status_is_processed,
+    upload_document_file,
+)
 
 
 # We need to copy guess_content_type here or keep it.
 # Ideally we import from a common util, but since I am editing keeping it here is fine.
 
 POLL_INTERVAL_SEC = 2
+POLL_MAX_INTERVAL_SEC = 30
+POLL_BATCH_SIZE = 100
 MAX_CONCURRENCY = 4
+# Uploaded documents allowed to wait on indexing at once (bounds memory on huge trees)
+MAX_PENDING_INDEX = 1000
 
 SUPPORTED_EXT = {".pdf", ".txt", ".md", ".jpg", ".jpeg", ".png"}
 
@@ -69,68 +85,384 @@ async def ensure_collection(client: AsyncClient, collection_name: str) -> Collec
     raise RuntimeError("Failed to get session")
 
 
-async def upload_one(
+class IndexingPoller:
+    """
+    One polling loop for every document a run is waiting on, instead of a
+    get_document loop per file. Statuses are fetched in batches; the interval
+    grows while nothing finishes and snaps back when something does.
+    """
+
+    def __init__(
+        self,
+        client: AsyncClient,
+        collection_id: str,
+        min_interval: float = POLL_INTERVAL_SEC,
+        max_interval: float = POLL_MAX_INTERVAL_SEC,
+        batch_size: int = POLL_BATCH_SIZE,
+    ):
+        self.client = client
+        self.collection_id = collection_id
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self.polls = 0
+        self._pending: dict[str, tuple[asyncio.Future, float, str]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def wait(self, document_id: str, name: str) -> float:
+        """Wait until the document is processed; returns seconds spent indexing."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[document_id] = (future, time.monotonic(), name)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for future, _, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    async def _statuses(self, document_ids: list[str]) -> dict[str, object]:
+        if hasattr(self.client.collections, "batch_get_documents"):
+            resp = await self.client.collections.batch_get_documents(self.collection_id, document_ids)
+            return {extract_document_id(doc): doc.status for doc in resp.documents}
+        docs = await asyncio.gather(
+            *(self.client.collections.get_document(doc_id, self.collection_id) for doc_id in document_ids)
+        )
+        return {doc_id: getattr(doc, "status", None) for doc_id, doc in zip(document_ids, docs)}
+
+    async def _run(self) -> None:
+        interval = self.min_interval
+        while self._pending:
+            await asyncio.sleep(interval)
+            ids = list(self._pending)
+            finished = 0
+            for i in range(0, len(ids), self.batch_size):
+                try:
+                    statuses = await self._statuses(ids[i:i + self.batch_size])
+                except Exception as e:
+                    print(f"Warning: indexing status poll failed: {e}")
+                    continue
+                self.polls += 1
+                now = time.monotonic()
+                for doc_id, status in statuses.items():
+                    if doc_id not in self._pending:
+                        continue
+                    if status_is_processed(status):
+                        future, started, _ = self._pending.pop(doc_id)
+                        future.set_result(now - started)
+                        finished += 1
+                    elif status_is_failed(status):
+                        future, _, name = self._pending.pop(doc_id)
+                        future.set_exception(RuntimeError(f"Document processing failed: {name} ({doc_id})"))
+                        finished += 1
+            interval = self.min_interval if finished else min(interval * 1.5, self.max_interval)
+        self._task = None
+
+
+async def _delete_remote(client: AsyncClient, collection_id: str, document_id: str) -> None:
+    try:
+        await delete_collection_document(client, collection_id, document_id)
+    except Exception as e:
+        print(f"Warning: failed to delete {document_id} from xAI: {e}")
+
+
+async def _register(
+    db_collection_id: int,
+    name: str,
+    document_id: str,
+    replaces: str | None,
+    metadata: dict | None = None,
+) -> None:
+    async for session in get_session():
+        if replaces:
+            replaced = select(Document.id).where(
+                Document.collection_id == db_collection_id, Document.xai_doc_id == replaces
+            )
+            await delete_document_metadata(session, replaced)
+            await session.exec(delete(Document).where(
+                Document.collection_id == db_collection_id, Document.xai_doc_id == replaces
+            ))
+        doc = Document(
+            name=name,
+            xai_doc_id=document_id,
+            collection_id=db_collection_id,
+            status="processed"
+        )
+        session.add(doc)
+        await session.flush()
+        add_document_metadata(session, doc, metadata)
+        await bump_content_version(session, db_collection_id)
+        await session.commit()
+        break
+
+
+def _doc_metadata(meta: Optional[DocMeta]) -> dict | None:
+    if meta is None:
+        return None
+    return build_metadata(category=meta.category, tags=meta.tags, version=meta.version, date=meta.date)
+
+
+async def upload_file(
     client: AsyncClient,
-    sem: asyncio.Semaphore,
+    manifest: IngestManifest,
     collection_id: str, # xAI ID
-    db_collection_id: int, # DB ID
     doc_path: str,
     meta: Optional[DocMeta],
-):
-    async with sem:
-        name = os.path.basename(doc_path)
-        with open(doc_path, "rb") as f:
-            data = f.read()
-
-        metadata = build_metadata(
-            category=meta.category if meta else None,
-            tags=meta.tags if meta else None,
-            version=meta.version if meta else None,
-            date=meta.date if meta else None,
-        )
-        upload_kwargs = {
-            "collection_id": collection_id,
-            "name": name,
-            "data": data,
-            "content_type": guess_content_type(doc_path),
-        }
-        if metadata:
-            upload_kwargs["metadata"] = metadata
-        upload_resp = await client.collections.upload_document(**upload_kwargs)
-        document_id = extract_document_id(upload_resp)
-        if not document_id:
-            raise RuntimeError(f"Upload response missing document_id for: {name}")
-
-        while True:
-            status_resp = await client.collections.get_document(document_id, collection_id)
-            status = getattr(status_resp, "status", None)
-            if status in ("DOCUMENT_STATUS_PROCESSED", STATUS_PROCESSED):
+) -> dict:
+    """Upload stage: returns a final 'skipped' result or a 'pending' one to finish."""
+    name = os.path.basename(doc_path)
+    st = os.stat(doc_path)
+    entry = manifest.get(doc_path)
+    if entry and entry.status == "done" and (entry.size, entry.mtime_ns) == (st.st_size, st.st_mtime_ns):
+        return {"name": name, "action": "skipped", "document_id": entry.xai_doc_id}
+
+    sha = await asyncio.to_thread(file_sha256, doc_path)
+    if entry and entry.sha256 == sha and entry.status == "done":
+        manifest.touch(doc_path, st.st_size, st.st_mtime_ns)
+        return {"name": name, "action": "skipped", "document_id": entry.xai_doc_id}
+
+    if entry and entry.sha256 == sha and entry.status == "uploaded":
+        # Interrupted after the upload: resume with the indexing wait
+        return {"name": name, "action": "pending", "path": doc_path, "document_id": entry.xai_doc_id, "bytes": 0}
+
+    if entry and entry.xai_doc_id and entry.status != "done":
+        # Upload of an older revision (or a failed one) that never finished
+        await _delete_remote(client, collection_id, entry.xai_doc_id)
+    manifest.mark_uploading(doc_path, st.st_size, st.st_mtime_ns, sha)
+    metadata = _doc_metadata(meta)
+    # Streams from disk in chunks; the file is never read whole
+    document_id = await upload_document_file(
+        client, collection_id, doc_path, name, fields=metadata_fields(metadata)
+    )
+    if not document_id:
+        raise RuntimeError(f"Upload response missing document_id for: {name}")
+    manifest.mark_uploaded(doc_path, document_id)
+    return {"name": name, "action": "pending", "path": doc_path, "document_id": document_id, "bytes": st.st_size}
+
+
+async def finish_file(
+    client: AsyncClient,
+    poller: IndexingPoller,
+    manifest: IngestManifest,
+    collection_id: str, # xAI ID
+    db_collection_id: int, # DB ID
+    pending: dict,
+    meta: Optional[DocMeta] = None,
+) -> dict:
+    """Indexing stage: wait for xAI, register in the DB, retire the old revision."""
+    doc_path, name, document_id = pending["path"], pending["name"], pending["document_id"]
+    try:
+        indexing_sec = await poller.wait(document_id, name)
+    except RuntimeError:
+        manifest.mark_failed(doc_path)
+        raise
+
+    replaces = manifest.get(doc_path).previous_doc_id
+    await _register(db_collection_id, name, document_id, replaces, _doc_metadata(meta))
+    if replaces:
+        await _delete_remote(client, collection_id, replaces)
+    manifest.mark_done(doc_path)
+    return {
+        "name": name,
+        "action": "replaced" if replaces else "uploaded",
+        "document_id": document_id,
+        "bytes": pending["bytes"],
+        "indexing_sec": indexing_sec,
+    }
+
+
+async def prune_deleted(
+    client: AsyncClient,
+    manifest: IngestManifest,
+    collection_id: str,
+    db_collection_id: int,
+    folder: str,
+    run_id: str,
+) -> list[dict]:
+    """Remove documents whose source file was not seen by this run."""
+    removed = []
+    for entry in manifest.unseen_under(folder, run_id):
+        doc_ids = [d for d in (entry.xai_doc_id, entry.previous_doc_id) if d]
+        for doc_id in doc_ids:
+            await _delete_remote(client, collection_id, doc_id)
+        if doc_ids:
+            async for session in get_session():
+                await delete_document_metadata(session, select(Document.id).where(
+                    Document.collection_id == db_collection_id, Document.xai_doc_id.in_(doc_ids)
+                ))
+                await session.exec(delete(Document).where(
+                    Document.collection_id == db_collection_id, Document.xai_doc_id.in_(doc_ids)
+                ))
+                await bump_content_version(session, db_collection_id)
+                await session.commit()
                 break
-            if status in ("DOCUMENT_STATUS_FAILED", STATUS_FAILED):
-                raise RuntimeError(f"Document processing failed: {name} ({document_id})")
-            await asyncio.sleep(POLL_INTERVAL_SEC)
-            
-        # Register in DB
-        async for session in get_session():
-            doc = Document(
-                name=name,
-                xai_doc_id=document_id,
-                collection_id=db_collection_id,
-                status="processed"
-            )
-            session.add(doc)
-            await session.commit()
-            break
+        manifest.remove(entry.path)
+        removed.append({"name": os.path.basename(entry.path), "action": "deleted", "document_id": entry.xai_doc_id})
+    return removed
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
 
-        return {"name": name, "document_id": document_id}
 
+class RunStats:
+    """Running totals for the throughput report; per-file results are not kept."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts: Counter = Counter()
+        self.bytes = 0
+        self.indexing: list[float] = []
+
+    def add(self, result: dict) -> None:
+        self.counts[result["action"]] += 1
+        if result["action"] in ("uploaded", "replaced"):
+            self.bytes += result.get("bytes", 0)
+            if result.get("indexing_sec") is not None:
+                self.indexing.append(result["indexing_sec"])
+
+    def report(self, wall_sec: float | None = None) -> dict:
+        """files/s and MB/s over the whole run, plus the indexing-time distribution."""
+        if wall_sec is None:
+            wall_sec = time.perf_counter() - self.started
+        files = self.counts["uploaded"] + self.counts["replaced"]
+        mb = self.bytes / (1024 * 1024)
+        indexing = sorted(self.indexing)
+        wall = max(wall_sec, 1e-9)
+        return {
+            "counts": dict(self.counts),
+            "files": files,
+            "megabytes": round(mb, 2),
+            "wall_sec": round(wall_sec, 2),
+            "files_per_sec": round(files / wall, 2),
+            "mb_per_sec": round(mb / wall, 2),
+            "indexing_p50_sec": _percentile(indexing, 0.50),
+            "indexing_p95_sec": _percentile(indexing, 0.95),
+        }
+
+
+async def sync_folder(
+    client: AsyncClient,
+    db_collection: Collection,
+    folder: str,
+    manifest: IngestManifest,
+    meta: Optional[DocMeta] = None,
+    prune: bool = True,
+    concurrency: int = MAX_CONCURRENCY,
+    max_pending: int = MAX_PENDING_INDEX,
+    on_result: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Bounded pipeline: a lazy directory walk feeds a small queue, a fixed pool
+    of workers uploads, and at most max_pending documents wait on the shared
+    poller. Each result goes to on_result as soon as it is final; only the
+    running totals are kept. Returns the throughput report.
+    """
+    folder = os.path.abspath(folder)
+    run_id = uuid.uuid4().hex
+    stats = RunStats()
+    poller = IndexingPoller(client, db_collection.xai_id, POLL_INTERVAL_SEC, POLL_MAX_INTERVAL_SEC)
+    # Small queue: the walker blocks as soon as the workers fall behind
+    queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=concurrency * 2)
+    indexing_slots = asyncio.Semaphore(max_pending)
+    seen = 0
+    scan_errors: list[tuple[str, OSError]] = []
 
-def iter_files(folder: str):
-    for root, _, files in os.walk(folder):
-        for fn in files:
-            ext = os.path.splitext(fn.lower())[1]
-            if ext in SUPPORTED_EXT:
-                yield os.path.join(root, fn)
+    def emit(result: dict) -> None:
+        stats.add(result)
+        if on_result is not None:
+            on_result(result)
+
+    def emit_error(path: str, error: Exception) -> None:
+        # Left in the manifest as uploading/uploaded/failed; the next run resumes it
+        emit({"name": os.path.basename(path), "action": "error", "error": str(error)})
+
+    async def produce() -> None:
+        for path in iter_files(folder, scan_errors):
+            await queue.put(path)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def finish(pending: dict) -> None:
+        try:
+            emit(await finish_file(client, poller, manifest, db_collection.xai_id, db_collection.id, pending, meta))
+        except Exception as e:
+            emit_error(pending["path"], e)
+        finally:
+            indexing_slots.release()
+
+    async def work(tg: asyncio.TaskGroup) -> None:
+        nonlocal seen
+        while (path := await queue.get()) is not None:
+            seen += 1
+            # Blocks while max_pending documents are still indexing
+            await indexing_slots.acquire()
+            try:
+                result = await upload_file(client, manifest, db_collection.xai_id, path, meta)
+            except Exception as e:
+                indexing_slots.release()
+                emit_error(path, e)
+                continue
+            finally:
+                # After the upload stage, so a file new to the manifest has a row to mark
+                manifest.mark_seen(path, run_id)
+            if result["action"] == "pending":
+                tg.create_task(finish(result))
+            else:
+                indexing_slots.release()
+                emit(result)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            for _ in range(concurrency):
+                tg.create_task(work(tg))
+    finally:
+        await poller.close()
+
+    for directory, error in scan_errors:
+        emit({"name": directory, "action": "error", "error": f"cannot scan: {error}"})
+    if prune and not seen:
+        # An empty or unmounted folder must not wipe the collection
+        print(f"Warning: no files found under {folder}; skipping deletion of missing files.")
+    elif prune and scan_errors:
+        # Files under an unreadable directory were not seen, not deleted
+        print(f"Warning: {len(scan_errors)} director(ies) could not be scanned; skipping deletion of missing files.")
+    elif prune:
+        for result in await prune_deleted(client, manifest, db_collection.xai_id, db_collection.id, folder, run_id):
+            emit(result)
+    return stats.report()
+
+
+def iter_files(folder: str, errors: Optional[list] = None):
+    """
+    Lazy depth-first os.scandir walk: memory grows with tree depth, not file
+    count. Directories that cannot be read are skipped and, if errors is
+    given, appended to it as (directory, OSError).
+    """
+    stack = [folder]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name.lower())[1] in SUPPORTED_EXT:
+                        yield entry.path
+        except OSError as e:
+            print(f"Warning: cannot scan {directory}: {e}")
+            if errors is not None:
+                errors.append((directory, e))
 
 
 async def main():
@@ -141,6 +473,11 @@ async def main():
     parser.add_argument("--tags", default=None, help="comma-separated")
     parser.add_argument("--version", default=None)
     parser.add_argument("--date", default=None)
+    parser.add_argument("--manifest", default=INGEST_MANIFEST_PATH, help="SQLite sync manifest")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="parallel uploads")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING_INDEX, help="documents waiting on indexing at once")
+    parser.add_argument("--report", default=None, help="append one JSON line per file to this path")
+    parser.add_argument("--keep-deleted", action="store_true", help="don't remove documents whose file is gone")
     args = parser.parse_args()
 
     api_key = os.getenv("XAI_API_KEY")
@@ -165,15 +502,42 @@ async def main():
         date=args.date,
     )
 
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    tasks = []
-    for path in iter_files(args.folder):
-        tasks.append(upload_one(client, sem, collection_id, db_collection.id, path, meta))
+    report_file = open(args.report, "a", encoding="utf-8") if args.report else None
+
+    def on_result(r: dict) -> None:
+        if report_file is not None:
+            report_file.write(json.dumps(r, ensure_ascii=False) + "\n")
+            report_file.flush()
+        if r["action"] == "error":
+            print(f"- {r['name']}: ERROR {r['error']}", flush=True)
+        elif r["action"] != "skipped":
+            print(f"- {r['name']}: {r['action']} {r['document_id']}", flush=True)
+
+    manifest = IngestManifest(args.manifest, collection_id)
+    try:
+        report = await sync_folder(
+            client, db_collection, args.folder, manifest, meta,
+            prune=not args.keep_deleted, concurrency=args.concurrency,
+            max_pending=args.max_pending, on_result=on_result,
+        )
+    finally:
+        manifest.close()
+        if report_file is not None:
+            report_file.close()
 
-    results = await asyncio.gather(*tasks)
-    print(f"uploaded={len(results)}")
-    for r in results:
-        print(f"- {r['name']}: {r['document_id']}")
+    counts = report["counts"]
+    print(" ".join(f"{action}={counts.get(action, 0)}" for action in ("uploaded", "replaced", "skipped", "deleted", "error")))
+
+    def fmt(sec):
+        return "-" if sec is None else f"{sec:.1f}s"
+
+    print(
+        f"throughput: {report['files']} files, {report['megabytes']} MB in {report['wall_sec']}s "
+        f"({report['files_per_sec']} files/s, {report['mb_per_sec']} MB/s); "
+        f"indexing p50={fmt(report['indexing_p50_sec'])} p95={fmt(report['indexing_p95_sec'])}"
+    )
+    if counts.get("error"):
+        sys.exit(1)
 
 if __name__ == "__main__":
     asyncio.run(main())
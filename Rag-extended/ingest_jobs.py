@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import (
+    INGEST_CONCURRENCY,
+    INGEST_LEASE_SEC,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_POLL_INTERVAL_SEC,
+    INGEST_RETRY_BASE_SEC,
+    INGEST_RETRY_MAX_SEC,
+)
+from content_cache import cached_extract_to_file
+from extraction import ExtractionError
+from database import bump_content_version, get_session
+from doc_metadata import add_document_metadata
+from filters import metadata_fields
+from models import Collection, Document, IngestJob
+from uploads import SpooledUpload, file_has_text
+from xai_helpers import upload_document_file
+
+# Formats converted to plain text before indexing
+TEXT_CONVERT_EXTENSIONS = ('.docx', '.doc', '.pdf')
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def prepare_upload(filename: str, spooled: SpooledUpload) -> tuple[str, str]:
+    """(path, name) to send to xAI: extracted plain text for pdf/docx, else the original."""
+    if os.path.splitext(filename.lower())[1] in TEXT_CONVERT_EXTENSIONS:
+        try:
+            await cached_extract_to_file(spooled.path, filename, spooled.sha256, spooled.text_path)
+        except ExtractionError:
+            # xAI parses the original itself; better than indexing nothing
+            return spooled.path, filename
+        if await asyncio.to_thread(file_has_text, spooled.text_path):
+            return spooled.text_path, os.path.splitext(filename)[0] + '.txt'
+    return spooled.path, filename
+
+
+class PermanentJobError(Exception):
+    """Failure that retrying cannot fix (e.g. the collection was deleted)."""
+
+
+class IngestJobQueue:
+    """
+    Durable upload pipeline: handlers spool the file and insert an IngestJob;
+    worker tasks claim jobs from the DB, extract, upload to xAI and create the
+    Document, retrying with exponential backoff. A claimed job is leased to
+    this process and kept alive by a heartbeat; jobs whose lease ran out
+    (their process crashed) are re-queued by whichever process sees them.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        reconciler: Any = None,
+        concurrency: int = INGEST_CONCURRENCY,
+        max_attempts: int = INGEST_MAX_ATTEMPTS,
+        retry_base_sec: float = INGEST_RETRY_BASE_SEC,
+        retry_max_sec: float = INGEST_RETRY_MAX_SEC,
+        poll_interval_sec: float = INGEST_POLL_INTERVAL_SEC,
+        lease_sec: float = INGEST_LEASE_SEC,
+    ):
+        self.client = client
+        self.reconciler = reconciler
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_sec = retry_base_sec
+        self.retry_max_sec = retry_max_sec
+        self.poll_interval_sec = poll_interval_sec
+        self.lease_sec = lease_sec
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._last_sweep = 0.0
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        # job id -> bytes sent to xAI so far (in memory only; reported by GET /jobs)
+        self._uploaded_bytes: dict[int, int] = {}
+
+    async def start(self) -> None:
+        async for session in get_session():
+            await self._requeue_expired(session)
+            break
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        collection_id: int,
+        filename: str,
+        spooled: SpooledUpload,
+        metadata: dict | None = None,
+    ) -> IngestJob:
+        job = IngestJob(
+            collection_id=collection_id,
+            filename=filename,
+            spool_path=spooled.path,
+            sha256=spooled.sha256,
+            size=spooled.size,
+            metadata_json=json.dumps(metadata, ensure_ascii=False) if metadata else None,
+            max_attempts=self.max_attempts,
+        )
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+        self._wake.set()
+        return job
+
+    def uploaded_bytes(self, job_id: int) -> int | None:
+        return self._uploaded_bytes.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            # Clear before claiming so an enqueue racing with the claim is never lost
+            self._wake.clear()
+            try:
+                ran = await self.run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: ingest worker failed: {e}")
+                ran = False
+            if ran:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_next(self) -> bool:
+        """Claim and run one due job. Returns False when nothing was due."""
+        async for session in get_session():
+            job = await self._claim(session)
+            if job is None:
+                return False
+            await self._run(session, job)
+            return True
+        return False
+
+    async def _requeue_expired(self, session: AsyncSession) -> None:
+        """Hand back running jobs whose owner stopped renewing the lease."""
+        self._last_sweep = time.monotonic()
+        cutoff = _utcnow() - timedelta(seconds=self.lease_sec)
+        result = await session.exec(
+            update(IngestJob)
+            .where(IngestJob.status == "running", IngestJob.updated_at < cutoff)
+            .values(status="queued", owner=None)
+        )
+        await session.commit()
+        if result.rowcount:
+            print(f"Warning: re-queued {result.rowcount} ingest job(s) with an expired lease")
+
+    async def _claim(self, session: AsyncSession) -> IngestJob | None:
+        if time.monotonic() - self._last_sweep >= self.lease_sec / 3:
+            await self._requeue_expired(session)
+        now = _utcnow()
+        candidates = (await session.exec(
+            select(IngestJob.id)
+            .where(IngestJob.status == "queued", IngestJob.next_run_at <= now)
+            .order_by(IngestJob.next_run_at, IngestJob.id)
+            .limit(self.concurrency)
+        )).all()
+        for job_id in candidates:
+            # Conditional update: only one worker (or process) wins each job
+            result = await session.exec(
+                update(IngestJob)
+                .where(IngestJob.id == job_id, IngestJob.status == "queued")
+                .values(status="running", owner=self.owner, attempts=IngestJob.attempts + 1, updated_at=now)
+            )
+            await session.commit()
+            if result.rowcount == 1:
+                return await session.get(IngestJob, job_id)
+        return None
+
+    async def _set_stage(self, session: AsyncSession, job: IngestJob, stage: str) -> None:
+        job.stage = stage
+        job.updated_at = _utcnow()
+        session.add(job)
+        await session.commit()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        # Own session: the job's session may be mid-transaction
+        while True:
+            await asyncio.sleep(self.lease_sec / 3)
+            try:
+                async for session in get_session():
+                    result = await session.exec(
+                        update(IngestJob)
+                        .where(IngestJob.id == job_id, IngestJob.status == "running", IngestJob.owner == self.owner)
+                        .values(updated_at=_utcnow())
+                    )
+                    await session.commit()
+                    break
+            except Exception as e:
+                print(f"Warning: ingest job {job_id} heartbeat failed: {e}")
+                continue
+            if result.rowcount == 0:
+                print(f"Warning: ingest job {job_id} lost its lease")
+                return
+
+    async def _run(self, session: AsyncSession, job: IngestJob) -> None:
+        job_id = job.id
+        spooled = SpooledUpload(path=job.spool_path, size=job.size, sha256=job.sha256)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await self._process(session, job, spooled)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await session.rollback()
+            await self._fail(session, job_id, e, spooled)
+            return
+        finally:
+            heartbeat.cancel()
+            self._uploaded_bytes.pop(job_id, None)
+        spooled.cleanup()
+
+    async def _process(self, session: AsyncSession, job: IngestJob, spooled: SpooledUpload) -> None:
+        collection = await session.get(Collection, job.collection_id)
+        if collection is None:
+            raise PermanentJobError("Collection not found")
+        if not os.path.exists(spooled.path):
+            raise PermanentJobError("Spooled upload is missing")
+        metadata = json.loads(job.metadata_json) if job.metadata_json else None
+
+        if not job.xai_doc_id:
+            # Convert non-text formats to plain text for xAI indexing
+            await self._set_stage(session, job, "extracting")
+            upload_path, upload_name = await prepare_upload(job.filename, spooled)
+
+            await self._set_stage(session, job, "uploading")
+            self._uploaded_bytes[job.id] = 0
+
+            def on_progress(sent: int, total: int) -> None:
+                self._uploaded_bytes[job.id] = sent
+
+            xai_doc_id = await upload_document_file(
+                self.client, collection.xai_id, upload_path, upload_name,
+                fields=metadata_fields(metadata), on_progress=on_progress,
+            )
+            if not xai_doc_id:
+                raise Exception("Could not find document_id in upload response")
+            # Persist before the DB insert so a retry never uploads twice
+            job.xai_doc_id = xai_doc_id
+            await self._set_stage(session, job, "saving")
+
+        doc = Document(
+            name=job.filename,
+            xai_doc_id=job.xai_doc_id,
+            collection_id=collection.id,
+            status="processing",
+        )
+        session.add(doc)
+        await session.flush()
+        add_document_metadata(session, doc, metadata)
+        job.document_id = doc.id
+        job.status = "succeeded"
+        job.stage = None
+        job.last_error = None
+        job.updated_at = _utcnow()
+        session.add(job)
+        await bump_content_version(session, collection.id)
+        await session.commit()
+        if self.reconciler is not None:
+            await self.reconciler.refresh_snapshot(session)
+            self.reconciler.kick()
+
+    async def _fail(self, session: AsyncSession, job_id: int, error: Exception, spooled: SpooledUpload) -> None:
+        job = await session.get(IngestJob, job_id, populate_existing=True)
+        job.last_error = str(error)[:1000]
+        job.updated_at = _utcnow()
+        if isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = "failed"
+            print(f"Warning: ingest job {job.id} failed after {job.attempts} attempt(s): {error}")
+        else:
+            delay = min(self.retry_base_sec * 2 ** (job.attempts - 1), self.retry_max_sec)
+            job.status = "queued"
+            job.owner = None
+            job.next_run_at = _utcnow() + timedelta(seconds=delay)
+        session.add(job)
+        await session.commit()
+        if job.status == "failed":
+            spooled.cleanup()
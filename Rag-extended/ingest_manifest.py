@@ -0,0 +1,117 @@
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+
+# Per-file states: uploading -> uploaded (xAI has it, not yet confirmed) -> done.
+# 'failed' means xAI rejected the document; the next run uploads it again.
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    xai_doc_id: str | None
+    previous_doc_id: str | None  # document being replaced, deleted once the new one is done
+    status: str
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class IngestManifest:
+    """
+    Local SQLite record of what ingest_folder has synced into one collection:
+    path -> size/mtime/sha256 -> xai_doc_id. Every state change is committed
+    immediately, so a crashed run resumes from the last finished step.
+    """
+
+    def __init__(self, path: str, collection_id: str):
+        self.collection_id = collection_id
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_manifest ("
+            "collection_id TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL, xai_doc_id TEXT, "
+            "previous_doc_id TEXT, status TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "seen_run TEXT, PRIMARY KEY (collection_id, path))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingest_manifest)")}
+        if "seen_run" not in columns:
+            self._conn.execute("ALTER TABLE ingest_manifest ADD COLUMN seen_run TEXT")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, path: str) -> ManifestEntry | None:
+        row = self._conn.execute(
+            "SELECT path, size, mtime_ns, sha256, xai_doc_id, previous_doc_id, status "
+            "FROM ingest_manifest WHERE collection_id = ? AND path = ?",
+            (self.collection_id, path),
+        ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def mark_seen(self, path: str, run_id: str) -> None:
+        # Rows a finished walk never marked are files that were deleted
+        self._conn.execute(
+            "UPDATE ingest_manifest SET seen_run = ? WHERE collection_id = ? AND path = ?",
+            (run_id, self.collection_id, path),
+        )
+
+    def unseen_under(self, root: str, run_id: str) -> list[ManifestEntry]:
+        prefix = os.path.join(root, "")
+        rows = self._conn.execute(
+            "SELECT path, size, mtime_ns, sha256, xai_doc_id, previous_doc_id, status "
+            "FROM ingest_manifest WHERE collection_id = ? AND substr(path, 1, ?) = ? "
+            "AND (seen_run IS NULL OR seen_run != ?)",
+            (self.collection_id, len(prefix), prefix, run_id),
+        ).fetchall()
+        return [ManifestEntry(*row) for row in rows]
+
+    def mark_uploading(self, path: str, size: int, mtime_ns: int, sha256: str) -> None:
+        # A finished document becomes the one to replace; an unfinished one
+        # keeps whatever it was already replacing
+        self._conn.execute(
+            "INSERT INTO ingest_manifest "
+            "(collection_id, path, size, mtime_ns, sha256, xai_doc_id, previous_doc_id, status, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, NULL, NULL, 'uploading', ?) "
+            "ON CONFLICT (collection_id, path) DO UPDATE SET "
+            "size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256, "
+            "previous_doc_id = CASE WHEN status = 'done' THEN xai_doc_id ELSE previous_doc_id END, "
+            "xai_doc_id = NULL, status = 'uploading', updated_at = excluded.updated_at",
+            (self.collection_id, path, size, mtime_ns, sha256, time.time()),
+        )
+
+    def _set(self, path: str, **values) -> None:
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in values)
+        self._conn.execute(
+            f"UPDATE ingest_manifest SET {assignments} WHERE collection_id = ? AND path = ?",
+            (*values.values(), self.collection_id, path),
+        )
+
+    def mark_uploaded(self, path: str, xai_doc_id: str) -> None:
+        self._set(path, xai_doc_id=xai_doc_id, status="uploaded")
+
+    def mark_done(self, path: str) -> None:
+        self._set(path, previous_doc_id=None, status="done")
+
+    def mark_failed(self, path: str) -> None:
+        self._set(path, status="failed")
+
+    def touch(self, path: str, size: int, mtime_ns: int) -> None:
+        """Same content, new stat (e.g. copied or touched): just refresh size/mtime."""
+        self._set(path, size=size, mtime_ns=mtime_ns)
+
+    def remove(self, path: str) -> None:
+        self._conn.execute(
+            "DELETE FROM ingest_manifest WHERE collection_id = ? AND path = ?",
+            (self.collection_id, path),
+        )
@@ -0,0 +1,165 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With several workers (uvicorn --workers N, gunicorn), point
+# PROMETHEUS_MULTIPROC_DIR at an empty directory, cleared before each start:
+# every worker writes its samples there and /metrics sums them. It must be
+# set before this module is imported.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each request stage", ("endpoint", "stage"), buckets=SECONDS_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "Total request time, including streamed bodies", ("endpoint", "method", "status"),
+    buckets=SECONDS_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "rag_cache_lookups_total", "Answer cache lookups by cache and result", ("cache", "result")
+)
+# livesum: summed over the workers that are still alive
+HTTP_IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum"
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "rag_upstream_calls_in_flight", "Grok calls currently running", ("call",), multiprocess_mode="livesum"
+)
+# Text extraction process pool (extraction.py)
+EXTRACTION_QUEUE_DEPTH = Gauge(
+    "rag_extraction_queue_depth", "Extraction jobs submitted and not finished", multiprocess_mode="livesum"
+)
+EXTRACTION_JOBS = Counter(
+    "rag_extraction_jobs_total", "Finished extraction jobs by result (completed, failed, timeout)", ("result",)
+)
+EXTRACTION_RECYCLES = Counter(
+    "rag_extraction_pool_recycles_total", "Extraction pools torn down after a timeout"
+)
+# Shared outbound httpx pool (http_client.py); reuse ratio = 1 - new connections / requests
+HTTP_REQUESTS = Counter("rag_http_requests_total", "Outbound HTTP requests sent through the shared pool")
+HTTP_CONNECTIONS_NEW = Counter("rag_http_connections_new_total", "New TCP connections opened by the shared pool")
+HTTP_POOL_IN_USE = Gauge(
+    "rag_http_pool_connections_in_use", "Pooled connections (HTTP/2: streams) serving a request",
+    multiprocess_mode="livesum",
+)
+HTTP_POOL_MAX = Gauge(
+    "rag_http_pool_max_connections", "Connection limit of the shared pool", multiprocess_mode="max"
+)
+
+
+def render_metrics() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the shared directory on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class StageTimer:
+    """Per-request list of (stage, seconds), shared through a context variable."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages.append((stage, seconds))
+
+    def totals(self) -> dict[str, float]:
+        # A stage entered twice (e.g. two cache tiers) is reported once, summed
+        out: dict[str, float] = {}
+        for stage, seconds in self.stages:
+            out[stage] = out.get(stage, 0.0) + seconds
+        return out
+
+    def server_timing(self) -> str:
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.totals().items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_timer: contextvars.ContextVar[StageTimer | None] = contextvars.ContextVar("stage_timer", default=None)
+
+
+def current_timer() -> StageTimer | None:
+    return _current_timer.get()
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as a stage of the current request (no-op outside one)."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(stage, time.perf_counter() - t0)
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware: gives each HTTP request a StageTimer, sends the
+    stages recorded before the response starts as a Server-Timing header,
+    and feeds every stage (including ones after a streamed response started)
+    into the histograms once the request is done.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _current_timer.reset(token)
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded; unmatched paths are not recorded
+            endpoint = getattr(route, "path", None)
+            if endpoint is not None:
+                for stage, seconds in timer.stages:
+                    STAGE_SECONDS.labels(endpoint=endpoint, stage=stage).observe(seconds)
+                REQUEST_SECONDS.labels(
+                    endpoint=endpoint, method=scope["method"], status=str(status_code),
+                ).observe(time.perf_counter() - timer.started)
@@ -1,11 +1,35 @@
 from datetime import datetime, timezone
 from typing import Optional, List
+from sqlalchemy import DateTime, Index, TypeDecorator
 from sqlmodel import SQLModel, Field, Relationship
 
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+class UTCDateTime(TypeDecorator):
+    """
+    TIMESTAMP WITH TIME ZONE. asyncpg refuses aware datetimes in a plain
+    TIMESTAMP column, and SQLite drops the offset, so values are written and
+    read back as aware UTC on every backend (naive input is taken as UTC).
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return _as_utc(value)
+
+    def process_result_value(self, value, dialect):
+        return _as_utc(value)
+
 class Collection(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True, unique=True)
@@ -13,36 +37,120 @@ class Collection(SQLModel, table=True):
     description: Optional[str] = Field(default=None)
     category: Optional[str] = Field(default=None)
     tags: Optional[str] = Field(default=None)  # comma-separated
-    created_at: datetime = Field(default_factory=_utcnow)
+    # Bumped whenever the indexed documents change; part of the answer cache key
+    content_version: int = Field(default=0)
+    created_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
 
     documents: List["Document"] = Relationship(back_populates="collection")
 
 class Document(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    xai_doc_id: str
+    xai_doc_id: str = Field(index=True)
     collection_id: Optional[int] = Field(default=None, foreign_key="collection.id")
-    status: str = Field(default="pending")
-    created_at: datetime = Field(default_factory=_utcnow)
+    status: str = Field(default="pending", index=True)
+    created_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
     
     collection: Optional[Collection] = Relationship(back_populates="documents")
 
+    # Also serves lookups on collection_id alone (leftmost column)
+    __table_args__ = (
+        Index("ix_document_collection_status", "collection_id", "status"),
+    )
+
+class DocumentMetadata(SQLModel, table=True):
+    # build_metadata() of the upload, one row per document (empty row = no metadata)
+    document_id: int = Field(foreign_key="document.id", primary_key=True)
+    collection_id: int = Field(foreign_key="collection.id")
+    category: Optional[str] = None
+    version: Optional[str] = None
+    date: Optional[str] = None  # YYYY-MM-DD, compared as text
+    related_docs: Optional[str] = None  # comma-separated
+    relationship_note: Optional[str] = None
+    policy_note: Optional[str] = None
+
+    __table_args__ = (
+        Index("ix_documentmetadata_collection_category", "collection_id", "category"),
+        Index("ix_documentmetadata_collection_version", "collection_id", "version"),
+        Index("ix_documentmetadata_collection_date", "collection_id", "date"),
+    )
+
+class DocumentTag(SQLModel, table=True):
+    document_id: int = Field(foreign_key="document.id", primary_key=True)
+    tag: str = Field(primary_key=True)
+    collection_id: int = Field(foreign_key="collection.id")
+
+    __table_args__ = (
+        Index("ix_documenttag_collection_tag", "collection_id", "tag"),
+    )
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(index=True, unique=True)
     hashed_password: str
     full_name: Optional[str] = None
-    created_at: datetime = Field(default_factory=_utcnow)
+    created_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
 
 class UsageEvent(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     endpoint: str = Field(index=True)
     model: str
-    collection_id: Optional[int] = None
+    collection_id: Optional[int] = Field(default=None, index=True)
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
     cost_usd: float = 0.0
     latency_ms: Optional[int] = None
     cached: bool = False
-    created_at: datetime = Field(default_factory=_utcnow)
+    coalesced: bool = False  # answered by awaiting an identical in-flight request
+    created_at: datetime = Field(default_factory=_utcnow, index=True, sa_type=UTCDateTime)
+
+    __table_args__ = (
+        Index("ix_usageevent_collection_created", "collection_id", "created_at"),
+    )
+
+class UsageRollup(SQLModel, table=True):
+    # UsageEvent totals per time bucket, maintained by the usage recorder.
+    # granularity: minute, hour, day, or total (one all-time row per key)
+    granularity: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True, sa_type=UTCDateTime)  # UTC, truncated to the granularity
+    collection_id: int = Field(default=0, primary_key=True)  # 0 = no collection
+    model: str = Field(primary_key=True)
+    requests: int = 0
+    cached: int = 0
+    coalesced: int = 0
+    latency_count: int = 0  # events with a latency
+    latency_sum_ms: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+
+class UsageLatencyBin(SQLModel, table=True):
+    # Latency histogram for the same keys as UsageRollup (for p50/p95)
+    granularity: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True, sa_type=UTCDateTime)
+    collection_id: int = Field(default=0, primary_key=True)
+    model: str = Field(primary_key=True)
+    le_ms: int = Field(primary_key=True)  # upper bound of the bin
+    count: int = 0
+
+class IngestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    collection_id: int = Field(foreign_key="collection.id", index=True)
+    filename: str
+    spool_path: str  # uploaded bytes on local disk until the job finishes
+    sha256: str
+    size: int
+    metadata_json: Optional[str] = None  # build_metadata() of the upload form
+    status: str = Field(default="queued", index=True)  # queued, running, succeeded, failed
+    stage: Optional[str] = None  # extracting, uploading, saving
+    owner: Optional[str] = None  # host:pid:nonce of the process holding the lease while running
+    attempts: int = 0
+    max_attempts: int = 5
+    next_run_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
+    last_error: Optional[str] = None
+    xai_doc_id: Optional[str] = None  # set right after the xAI upload so retries never re-upload
+    document_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
+    updated_at: datetime = Field(default_factory=_utcnow, sa_type=UTCDateTime)
@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from config import (
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_BYTES,
+    PROFILE_MAX_CONCURRENT,
+    PROFILE_MAX_FILES,
+    PROFILE_MAX_SECONDS,
+    PROFILE_SAMPLE_EVERY_N,
+)
+
+_ID_RE = re.compile(r"[0-9a-f]{32}")
+# Leaf frames of worker threads parked with nothing to do; dropped from profiles
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(code) -> str:
+    path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    name = getattr(code, "co_qualname", code.co_name)
+    # ';' separates frames in the collapsed format
+    return f"{name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of every thread from a background thread.
+    Stacks are rooted at the thread name; the event loop thread (the one that
+    started the profiler) keeps its idle samples, which show time spent
+    awaiting I/O. Everything the loop runs meanwhile is included, so
+    concurrent requests show up too; work in the extraction process pool
+    appears only as the loop waiting on it.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval_sec = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+        self.duration_ms = 0
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        t0 = time.perf_counter()
+        deadline = t0 + self.max_seconds
+        while not self._stop.wait(self.interval_sec) and time.perf_counter() < deadline:
+            self.sample(exclude=own)
+        self.duration_ms = int((time.perf_counter() - t0) * 1000)
+
+    def sample(self, exclude: int | None = None) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, "thread")
+            if ident == exclude or name.startswith("profiler"):
+                continue
+            code = frame.f_code
+            leaf = (os.path.basename(code.co_filename), code.co_name)
+            if ident != self._loop_thread and leaf in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(name.replace(";", ":"))
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+
+def to_collapsed(stacks: dict[str, int]) -> str:
+    """Brendan Gregg's collapsed-stack format (flamegraph.pl, speedscope, inferno)."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def to_speedscope(profile: dict) -> dict:
+    """A stored profile as a speedscope "sampled" profile (weights in ms)."""
+    frames: list[dict] = []
+    index: dict[str, int] = {}
+    samples, weights = [], []
+    interval_ms = profile["interval_ms"]
+    for stack, count in profile["stacks"].items():
+        ids = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            ids.append(index[label])
+        samples.append(ids)
+        weights.append(count * interval_ms)
+    name = f"{profile['endpoint']} {profile['created_at']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "rag-extended",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class ProfileStore:
+    """One JSON file per profile; oldest files are pruned past the count/byte limits."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                 max_bytes: int = PROFILE_MAX_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def _path(self, profile_id: str) -> str | None:
+        if not _ID_RE.fullmatch(profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile["id"])
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        os.replace(tmp, path)
+        self.prune()
+
+    def load(self, profile_id: str) -> dict | None:
+        path = self._path(profile_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _files(self) -> list[os.DirEntry]:
+        if not os.path.isdir(self.directory):
+            return []
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        return sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True)
+
+    def list(self) -> list[dict]:
+        """Metadata of stored profiles, newest first."""
+        out = []
+        for entry in self._files():
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            profile.pop("stacks", None)
+            out.append(profile)
+        return out
+
+    def prune(self) -> None:
+        total = 0
+        for n, entry in enumerate(self._files()):
+            total += entry.stat().st_size
+            if n >= self.max_files or total > self.max_bytes:
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    print(f"Warning: could not prune profile {entry.name}: {e}")
+
+
+class ProfileRun:
+    def __init__(self, endpoint: str, user: str | None, reason: str, profiler: SamplingProfiler):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.user = user
+        self.reason = reason
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.profiler = profiler
+
+
+class RequestProfiler:
+    """Decides which requests get profiled and stores the results."""
+
+    def __init__(self, store: ProfileStore, every_n: int = PROFILE_SAMPLE_EVERY_N,
+                 max_concurrent: int = PROFILE_MAX_CONCURRENT, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.store = store
+        self.every_n = every_n
+        self.max_concurrent = max_concurrent
+        self.interval_ms = interval_ms
+        self.active = 0
+        self.skipped = 0  # wanted a profile but max_concurrent were already running
+        self._counter = itertools.count(1)
+
+    def begin(self, endpoint: str, user: str | None, requested: bool) -> ProfileRun | None:
+        sampled = self.every_n > 0 and next(self._counter) % self.every_n == 0
+        if not (requested or sampled):
+            return None
+        if self.active >= self.max_concurrent:
+            self.skipped += 1
+            return None
+        self.active += 1
+        profiler = SamplingProfiler(self.interval_ms)
+        profiler.start()
+        return ProfileRun(endpoint, user, "requested" if requested else "sampled", profiler)
+
+    async def finish(self, run: ProfileRun, error: str | None = None) -> None:
+        run.profiler.stop()
+        self.active -= 1
+        profile = {
+            "id": run.id,
+            "endpoint": run.endpoint,
+            "user": run.user,
+            "reason": run.reason,
+            "created_at": run.created_at,
+            "error": error,
+            "duration_ms": run.profiler.duration_ms,
+            "interval_ms": self.interval_ms,
+            "samples": run.profiler.samples,
+            "stacks": run.profiler.stacks,
+        }
+        try:
+            await asyncio.to_thread(self.store.save, profile)
+        except OSError as e:
+            print(f"Warning: could not save profile {run.id}: {e}")
+
+    def stats(self) -> dict:
+        return {"active": self.active, "skipped": self.skipped, "every_n": self.every_n}
@@ -1,5 +1,5 @@
 import time
-from typing import Any
+from typing import Any, AsyncIterator
 from xai_sdk import AsyncClient
 from xai_sdk.chat import system, user
 from xai_sdk.tools import collections_search
@@ -7,6 +7,7 @@ from xai_sdk.tools import collections_search
 from config import XAI_MODEL, TOP_K, SYSTEM_GUARDRAIL
 from citations import normalize_citations, citations_to_bullets
 from filters import build_search_filters
+from metrics import UPSTREAM_IN_FLIGHT, timed
 
 def _first_text(*vals: Any) -> str | None:
     for v in vals:
@@ -34,25 +35,33 @@ def _extract_text_from_output(output: Any) -> str | None:
         getattr(output, "output_text", None),
     )
 
-def build_filter_instructions(filters: dict | None) -> str:
+# Longest prefiltered document list spelled out in the instructions
+MAX_LISTED_DOCUMENTS = 20
+
+def build_filter_instructions(filters: dict | None, documents: list[str] | None = None) -> str:
     if not filters:
         return ""
     parts = []
     for k, v in filters.items():
         parts.append(f"{k}={v}")
-    return "다음 필터 조건을 만족하는 문서 컨텍스트만 우선 사용하라: " + ", ".join(parts)
+    inst = "다음 필터 조건을 만족하는 문서 컨텍스트만 우선 사용하라: " + ", ".join(parts)
+    if documents and len(documents) <= MAX_LISTED_DOCUMENTS:
+        # Resolved locally from the metadata tables
+        inst += "\n조건에 맞는 문서: " + ", ".join(documents)
+    return inst
 
-async def run_rag(
+NO_ANSWER = "제공된 문서 근거로는 확인할 수 없습니다."
+
+def _create_chat(
     client: AsyncClient,
     collection_id: str,
     query: str,
-    filters: dict | None = None,
-) -> dict:
-    t0 = time.time()
-
+    filters: dict | None,
+    documents: list[str] | None = None,
+):
     # System instruction with optional filters
     sys_content = SYSTEM_GUARDRAIL
-    filter_inst = build_filter_instructions(filters)
+    filter_inst = build_filter_instructions(filters, documents)
     if filter_inst:
         sys_content = sys_content + "\n" + filter_inst
     
@@ -74,7 +83,7 @@ async def run_rag(
 
     tool = collections_search(**tool_kwargs)
 
-    chat_session = client.chat.create(
+    return client.chat.create(
         model=XAI_MODEL,
         messages=messages,
         tools=[tool],
@@ -82,10 +91,10 @@ async def run_rag(
         max_tokens=800,
     )
 
-    response = await chat_session.sample()
+def _result_from_response(response: Any, t0: float) -> dict:
     answer = (response.content or "").strip()
     if not answer:
-        answer = "제공된 문서 근거로는 확인할 수 없습니다."
+        answer = NO_ANSWER
     citations = [{"text": c} for c in getattr(response, "citations", [])]
 
     usage = getattr(response, "usage", None)
@@ -94,7 +103,7 @@ async def run_rag(
         "completion_tokens": getattr(usage, "completion_tokens", None),
         "total_tokens": getattr(usage, "total_tokens", None),
     }
-    
+
     latency_ms = int((time.time() - t0) * 1000)
     return {
         "answer": answer,
@@ -102,3 +111,56 @@ async def run_rag(
         "latency_ms": latency_ms,
         "usage": usage_data,
     }
+
+async def run_rag(
+    client: AsyncClient,
+    collection_id: str,
+    query: str,
+    filters: dict | None = None,
+    documents: list[str] | None = None,
+) -> dict:
+    t0 = time.time()
+    chat_session = _create_chat(client, collection_id, query, filters, documents)
+    with UPSTREAM_IN_FLIGHT.labels(call="sample").track_inprogress(), timed("grok_sample"):
+        response = await chat_session.sample()
+    return _result_from_response(response, t0)
+
+async def stream_rag(
+    client: AsyncClient,
+    collection_id: str,
+    query: str,
+    filters: dict | None = None,
+    documents: list[str] | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of run_rag. Yields events:
+      {"type": "token", "text": ...}
+      {"type": "citation", "citation": {"text": ...}}   (as they arrive, deduplicated)
+      {"type": "done", "result": <run_rag-shaped dict plus ttft_ms>}
+    """
+    t0 = time.time()
+    ttft_ms = None
+    seen_citations: set[str] = set()
+    response = None
+
+    chat_session = _create_chat(client, collection_id, query, filters, documents)
+    with UPSTREAM_IN_FLIGHT.labels(call="stream").track_inprogress():
+        async for response, chunk in chat_session.stream():
+            for choice in getattr(chunk, "choices", []):
+                text = _extract_text_from_output(choice)
+                if text:
+                    if ttft_ms is None:
+                        ttft_ms = int((time.time() - t0) * 1000)
+                    yield {"type": "token", "text": text}
+            for c in getattr(chunk, "citations", []) or []:
+                if c not in seen_citations:
+                    seen_citations.add(c)
+                    yield {"type": "citation", "citation": {"text": c}}
+
+    if response is None:
+        result = {"answer": NO_ANSWER, "citations": [], "latency_ms": int((time.time() - t0) * 1000),
+                  "usage": {"prompt_tokens": None, "completion_tokens": None, "total_tokens": None}}
+    else:
+        result = _result_from_response(response, t0)
+    result["ttft_ms"] = ttft_ms
+    yield {"type": "done", "result": result}
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import case, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import RECONCILE_CONCURRENCY, RECONCILE_INTERVAL_SEC, RECONCILE_MAX_BACKOFF_SEC
+from database import bump_content_version, get_session
+from models import Collection, Document
+from xai_helpers import status_is_failed, status_is_processed
+
+PENDING_STATUSES = ("pending", "processing")
+
+
+@dataclass
+class CollectionState:
+    total: int = 0
+    processed: int = 0
+
+    @property
+    def has_processed(self) -> bool:
+        return self.processed > 0
+
+
+@dataclass
+class _Backoff:
+    collection_id: int
+    next_check: float
+    delay: float
+
+
+class DocumentStatusReconciler:
+    """
+    Polls xAI for documents that are still indexing and writes status changes
+    to the DB, so request handlers only ever read the in-memory snapshot.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        interval_sec: float = RECONCILE_INTERVAL_SEC,
+        max_backoff_sec: float = RECONCILE_MAX_BACKOFF_SEC,
+        concurrency: int = RECONCILE_CONCURRENCY,
+    ):
+        self.client = client
+        self.interval_sec = interval_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.concurrency = max(1, concurrency)
+        self._states: dict[int, CollectionState] = {}
+        self._backoff: dict[int, _Backoff] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def snapshot(self, collection_id: int) -> CollectionState:
+        return self._states.get(collection_id) or CollectionState()
+
+    def kick(self, collection_id: int | None = None) -> None:
+        """Reset backoff (optionally for one collection) and wake the loop."""
+        for entry in self._backoff.values():
+            if collection_id is None or entry.collection_id == collection_id:
+                entry.next_check = 0.0
+                entry.delay = self.interval_sec
+        self._wake.set()
+
+    async def start(self) -> None:
+        async for session in get_session():
+            await self.refresh_snapshot(session)
+            break
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def refresh_snapshot(self, session: AsyncSession) -> None:
+        statement = select(
+            Document.collection_id,
+            func.count(Document.id),
+            func.sum(case((Document.status == "processed", 1), else_=0)),
+        ).group_by(Document.collection_id)
+        rows = (await session.exec(statement)).all()
+        self._states = {
+            cid: CollectionState(total=total, processed=processed or 0)
+            for cid, total, processed in rows
+            if cid is not None
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: document status reconcile failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    async def reconcile_once(self) -> int:
+        """Run one reconcile pass. Returns the number of documents updated."""
+        updated = 0
+        async for session in get_session():
+            if self.client is not None:
+                updated = await self._poll_pending(session)
+            await self.refresh_snapshot(session)
+            break
+        return updated
+
+    async def _poll_pending(self, session: AsyncSession) -> int:
+        statement = (
+            select(Document, Collection.xai_id)
+            .join(Collection, Document.collection_id == Collection.id)
+            .where(Document.status.in_(PENDING_STATUSES))
+        )
+        rows = (await session.exec(statement)).all()
+
+        now = time.monotonic()
+        live_ids = {doc.id for doc, _ in rows}
+        for doc_id in list(self._backoff):
+            if doc_id not in live_ids:
+                del self._backoff[doc_id]
+
+        due = []
+        for doc, xai_collection_id in rows:
+            entry = self._backoff.get(doc.id)
+            if entry is None:
+                entry = self._backoff[doc.id] = _Backoff(doc.collection_id, 0.0, self.interval_sec)
+            if entry.next_check <= now:
+                due.append((doc, xai_collection_id))
+        if not due:
+            return 0
+
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def check(doc: Document, xai_collection_id: str) -> str | None:
+            async with sem:
+                try:
+                    resp = await self.client.collections.get_document(doc.xai_doc_id, xai_collection_id)
+                except Exception as e:
+                    print(f"Warning: status check failed for {doc.xai_doc_id}: {e}")
+                    return None
+            status = getattr(resp, "status", None)
+            if status_is_processed(status):
+                return "processed"
+            if status_is_failed(status):
+                return "failed"
+            return None
+
+        results = await asyncio.gather(*(check(doc, xid) for doc, xid in due))
+
+        updated = 0
+        newly_processed: set[int] = set()
+        now = time.monotonic()
+        for (doc, _), new_status in zip(due, results):
+            if new_status is None:
+                entry = self._backoff[doc.id]
+                entry.next_check = now + entry.delay
+                entry.delay = min(entry.delay * 2, self.max_backoff_sec)
+                continue
+            doc.status = new_status
+            session.add(doc)
+            self._backoff.pop(doc.id, None)
+            updated += 1
+            if new_status == "processed":
+                newly_processed.add(doc.collection_id)
+        if updated:
+            # Newly searchable content invalidates cached answers
+            await bump_content_version(session, *newly_processed)
+            await session.commit()
+        return updated
@@ -1,9 +1,10 @@
 import os
-import httpx
 from typing import List, Dict, Any, Optional
+from sqlalchemy import text
 from .filters import build_metadata
 from .app import mgmt_client, chat_client, XAI_MODEL
 from .database import get_session
+from .http_client import get_http_client, route_timeout
 from sqlmodel import select
 from .models import Document, Collection
 
@@ -27,14 +28,13 @@ async def retrieve_from_xai(collection: Collection, query: str, filters: Optiona
 
 # ---------- External source examples ----------
 async def retrieve_from_db(session, sql: str) -> RetrievalResult:
-    rows = await session.exec(select(*).from_statement(sql)).all()
+    rows = (await session.execute(text(sql))).all()
     docs = [{"content": str(r), "source": "db"} for r in rows]
     return RetrievalResult(docs=docs)
 
 async def retrieve_from_rest(endpoint: str, params: dict) -> RetrievalResult:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(endpoint, params=params, timeout=5.0)
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await get_http_client().get(endpoint, params=params, timeout=route_timeout("rest"))
+    resp.raise_for_status()
+    data = resp.json()
     docs = [{"content": d.get("text", ""), "source": endpoint} for d in data.get("items", [])]
     return RetrievalResult(docs=docs)
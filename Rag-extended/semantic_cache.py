@@ -0,0 +1,192 @@
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+
+from cache import normalize_query
+from config import (
+    CACHE_TTL_SEC,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MODEL,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+
+
+def ngram_vector(text: str, dim: int = SEMANTIC_CACHE_DIM, ns: tuple[int, ...] = (1, 2, 3)) -> np.ndarray:
+    """
+    Hashed character n-gram embedding (CPU only, no model download). Only
+    near-identical wording scores above the default threshold; rephrasings
+    such as "연차 며칠이야?" need a model (SEMANTIC_CACHE_MODEL).
+    """
+    norm = normalize_query(text)
+    vec = np.zeros(dim, dtype=np.float32)
+    for n in ns:
+        for i in range(len(norm) - n + 1):
+            # crc32 keeps buckets stable across processes (unlike hash())
+            vec[zlib.crc32(norm[i:i + n].encode("utf-8")) % dim] += 1.0
+    norm_len = np.linalg.norm(vec)
+    if norm_len:
+        vec /= norm_len
+    return vec
+
+
+def model_embedder(name: str) -> Callable[[str], np.ndarray]:
+    """
+    Sentence-embedding model run locally on CPU (optional dependency:
+    pip install sentence-transformers). Loaded once, at startup.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name, device="cpu")
+
+    def embed(text: str) -> np.ndarray:
+        return np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+    return embed
+
+
+def _default_embed() -> Callable[[str], np.ndarray]:
+    if not SEMANTIC_CACHE_MODEL:
+        return ngram_vector
+    try:
+        return model_embedder(SEMANTIC_CACHE_MODEL)
+    except (ImportError, OSError) as e:
+        print(f"Warning: semantic cache model {SEMANTIC_CACHE_MODEL} unavailable, using n-gram vectors: {e}")
+        return ngram_vector
+
+
+@dataclass
+class _Entry:
+    query: str
+    value: Any
+    expires_at: float
+    last_used: float
+
+
+class _Scope:
+    """Row-normalized query vectors for one collection/model/filters scope."""
+
+    def __init__(self, dim: int, capacity: int, version: int):
+        self.version = version
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.entries: list[_Entry | None] = [None] * capacity
+
+    def free_slot(self, max_entries: int, now: float) -> tuple[int, int]:
+        """Return (slot, evicted) reusing expired slots, growing, or evicting LRU."""
+        evicted = 0
+        for i, e in enumerate(self.entries):
+            if e is not None and e.expires_at <= now:
+                self.entries[i] = None
+                evicted += 1
+        for i, e in enumerate(self.entries):
+            if e is None:
+                return i, evicted
+        size = len(self.entries)
+        if size < max_entries:
+            new_size = min(size * 2, max_entries)
+            grown = np.zeros((new_size, self.vectors.shape[1]), dtype=np.float32)
+            grown[:size] = self.vectors
+            self.vectors = grown
+            self.entries.extend([None] * (new_size - size))
+            return size, evicted
+        lru = min(range(size), key=lambda i: self.entries[i].last_used)
+        return lru, evicted + 1
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_sec: int = CACHE_TTL_SEC,
+        embed: Callable[[str], np.ndarray] = ngram_vector,
+    ):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self.embed = embed
+        self._scopes: dict[str, _Scope] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope_key(collection_id: str, model: str, filters: dict | None) -> str:
+        return f"{collection_id}|{model}|{filters or {}}"
+
+    def get(self, collection_id: str, model: str, query: str, filters: dict | None, version: int = 0):
+        """Return (value, score, matched_query) for the closest cached query above threshold, else None."""
+        key = self._scope_key(collection_id, model, filters)
+        q = self.embed(query)
+        now = time.time()
+        with self._lock:
+            scope = self._scopes.get(key)
+            if scope is None:
+                return None
+            if version < scope.version:
+                # A request that read content_version before a bump; the newer
+                # answers stay for current requests
+                return None
+            if version > scope.version:
+                # Collection content changed since these answers were cached
+                del self._scopes[key]
+                return None
+            scores = scope.vectors @ q
+            for i, e in enumerate(scope.entries):
+                if e is None or e.expires_at <= now:
+                    scores[i] = -1.0
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                return None
+            entry = scope.entries[best]
+            entry.last_used = now
+            return entry.value, score, entry.query
+
+    def set(self, collection_id: str, model: str, query: str, filters: dict | None, value, version: int = 0) -> int:
+        """Store an answer; returns how many entries were evicted to make room."""
+        key = self._scope_key(collection_id, model, filters)
+        vec = self.embed(query)
+        now = time.time()
+        with self._lock:
+            scope = self._scopes.get(key)
+            if scope is not None and scope.version > version:
+                return 0  # a newer content version is already cached
+            if scope is None or scope.version != version:
+                scope = self._scopes[key] = _Scope(vec.shape[0], min(16, self.max_entries), version)
+            slot, evicted = scope.free_slot(self.max_entries, now)
+            scope.vectors[slot] = vec
+            scope.entries[slot] = _Entry(query, value, now + self.ttl_sec, now)
+        return evicted
+
+    def clear(self, collection_id: str | None = None) -> None:
+        with self._lock:
+            if collection_id is None:
+                self._scopes.clear()
+                return
+            prefix = f"{collection_id}|"
+            for key in [k for k in self._scopes if k.startswith(prefix)]:
+                del self._scopes[key]
+
+
+_semantic = SemanticCache(embed=_default_embed()) if SEMANTIC_CACHE_ENABLED else None
+
+
+def semantic_get(collection_id: str, model: str, query: str, filters: dict | None, version: int = 0):
+    if _semantic is None:
+        return None
+    return _semantic.get(collection_id, model, query, filters, version)
+
+
+def semantic_set(collection_id: str, model: str, query: str, filters: dict | None, value, version: int = 0) -> int:
+    if _semantic is None:
+        return 0
+    return _semantic.set(collection_id, model, query, filters, value, version)
+
+
+def semantic_clear(collection_id: str | None = None) -> None:
+    if _semantic is not None:
+        _semantic.clear(collection_id)
@@ -1,6 +1,51 @@
+import asyncio
+import importlib
 import os
 import sys
 
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+# Modules that open their own sessions through database.get_session
+_SESSION_USERS = ("app", "ingest_folder", "ingest_jobs", "reconciler", "usage_recorder")
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """
+    Session factory over a fresh SQLite file with all tables created. It is
+    also wired in as get_session for the modules above and as the FastAPI
+    dependency override, so app routes and background workers share it.
+    """
+    import database
+
+    modules = [importlib.import_module(name) for name in _SESSION_USERS]
+    # NullPool: tests drive each scenario with its own asyncio.run, and a
+    # pooled aiosqlite connection must not outlive the loop that opened it
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rag.db'}", poolclass=NullPool)
+
+    async def create_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    asyncio.run(create_all())
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_session():
+        async with factory() as session:
+            yield session
+
+    for module in modules:
+        monkeypatch.setattr(module, "get_session", get_session)
+    app = modules[0].app
+    app.dependency_overrides[database.get_session] = get_session
+    yield factory
+    app.dependency_overrides.pop(database.get_session, None)
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import get_current_user
+from auth_utils import PrincipalCache, create_access_token, principal_cache
+from models import User
+
+
+class CountingSession(AsyncSession):
+    queries = 0
+
+    async def exec(self, statement, *args, **kwargs):
+        CountingSession.queries += 1
+        return await super().exec(statement, *args, **kwargs)
+
+
+def test_current_user_is_cached_and_invalidated_on_update(session_factory):
+    factory = sessionmaker(session_factory.kw["bind"], class_=CountingSession, expire_on_commit=False)
+
+    async def scenario():
+        async with factory() as session:
+            session.add(User(email="a@example.com", hashed_password="x", full_name="A"))
+            await session.commit()
+
+        principal_cache.invalidate()
+        token = create_access_token({"sub": "a@example.com"}, timedelta(minutes=5))
+        CountingSession.queries = 0
+        async with factory() as session:
+            first = await get_current_user(token, session)
+            second = await get_current_user(token, session)
+        assert first.email == second.email == "a@example.com"
+        assert CountingSession.queries == 1
+
+        async with factory() as session:
+            user = (await session.exec(select(User))).one()
+            user.full_name = "B"
+            session.add(user)
+            await session.commit()
+            assert (await get_current_user(token, session)).full_name == "B"
+
+            await session.delete(user)
+            await session.commit()
+            with pytest.raises(HTTPException):
+                await get_current_user(token, session)
+
+    asyncio.run(scenario())
+
+
+def test_entries_never_outlive_the_token():
+    cache = PrincipalCache(maxsize=10, ttl_sec=60)
+    user = User(id=1, email="a@example.com", hashed_password="x")
+    cache.put("expired", {"exp": 1}, user)
+    cache.put("valid", {"exp": 2**40}, user)
+    assert cache.get("expired") is None
+    assert cache.get("valid").email == "a@example.com"
+    cache.invalidate("a@example.com")
+    assert cache.get("valid") is None
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import cache
+from cache import DiskCache
+
+
+def test_two_tier_hit_reports_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_l2", None)
+    cache.init_l2(str(tmp_path / "c.db"))
+    value = {"answer": "20일", "citations": [{"text": "규정 3조"}]}
+
+    async def scenario():
+        await cache.cache_set_async("col", "m", "q", None, value)
+        l1 = await cache.cache_get_async("col", "m", "q", None)
+        # Another worker: cold L1, warm L2
+        cache._cache.clear()
+        l2 = await cache.cache_get_async("col", "m", "q", None)
+        again = await cache.cache_get_async("col", "m", "q", None)
+        return l1, l2, again
+
+    l1, l2, again = asyncio.run(scenario())
+    assert l1["cache_tier"] == "l1"
+    assert l1["answer"] == "20일"
+    assert "cache_tier" not in value
+    assert l2["cache_tier"] == "l2"
+    assert l2["citations"] == value["citations"]
+    assert again["cache_tier"] == "l1"
+
+
+def test_disk_cache_ttl(tmp_path):
+    l2 = DiskCache(str(tmp_path / "c.db"), 1 << 20, ttl_sec=0)
+    l2.set("k", {"answer": "x"})
+    time.sleep(0.01)
+    assert l2.get("k") is None
+
+
+def test_disk_cache_evicts_lru_by_size(tmp_path):
+    l2 = DiskCache(str(tmp_path / "c.db"), max_bytes=1, ttl_sec=60)
+    l2.set("old", {"answer": "a" * 100})
+    l2.set("new", {"answer": "b" * 100})
+    l2.max_bytes = len(cache._encode({"answer": "b" * 100}))
+    l2.get("new")
+    l2.evict()
+    assert l2.get("old") is None
+    assert l2.get("new") == {"answer": "b" * 100}
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"answer": "ok"}
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cache.single_flight("col", "m", "same q", None, upstream) for _ in range(5)
+        ))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert [coalesced for _, coalesced in results].count(False) == 1
+    assert all(r == {"answer": "ok"} for r, _ in results)
+    assert cache._inflight == {}
+
+
+def test_content_version_is_part_of_the_key(monkeypatch):
+    monkeypatch.setattr(cache, "_l2", None)
+
+    async def scenario():
+        await cache.cache_set_async("col", "m", "q", None, {"answer": "old"}, version=1)
+        return (
+            await cache.cache_get_async("col", "m", "q", None, version=1),
+            await cache.cache_get_async("col", "m", "q", None, version=2),
+        )
+
+    current, stale = asyncio.run(scenario())
+    assert current["answer"] == "old"
+    assert stale is None
+
+
+def test_sync_api_keeps_its_signature_and_shares_both_tiers(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_l2", None)
+    cache.init_l2(str(tmp_path / "c.db"))
+
+    cache.cache_set("col", "m", "q", None, {"answer": "20일"})
+    assert cache.cache_get("col", "m", "q", None)["cache_tier"] == "l1"
+    cache._cache.clear()
+    assert cache.cache_get("col", "m", "q", None)["cache_tier"] == "l2"
+    # Written by the sync API, read by the async one (and the other way round)
+    assert asyncio.run(cache.cache_get_async("col", "m", "q", None))["answer"] == "20일"
+    asyncio.run(cache.cache_set_async("col", "m", "q2", None, {"answer": "3일"}))
+    cache._cache.clear()
+    assert cache.cache_get("col", "m", "q2", None)["answer"] == "3일"
+
+
+def test_exact_key_ignores_spacing_case_and_punctuation():
+    assert cache._key("c", "m", "연차는 몇 일인가요?", None) == cache._key("c", "m", "연차는 몇일인가요", None)
+    assert cache._key("c", "m", "Leave Policy?", None) == cache._key("c", "m", "leave policy", None)
+    assert cache._key("c", "m", "연차 며칠이야?", None) != cache._key("c", "m", "연차는 몇 일인가요?", None)
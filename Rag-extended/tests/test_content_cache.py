@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import content_cache
+from cache import DiskCache
+from extraction import ExtractionError, ExtractionTimeout
+
+
+def test_cached_extract_parses_each_content_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_cache, "_store", DiskCache(str(tmp_path / "cc.db"), 1 << 20, 60, table="content_cache"))
+    calls = []
+
+    async def fake_extract(content, filename):
+        calls.append(filename)
+        return content.decode("utf-8")
+
+    monkeypatch.setattr(content_cache.extraction_pool, "extract", fake_extract)
+
+    async def scenario():
+        first = await content_cache.cached_extract(b"same bytes", "a.md")
+        second = await content_cache.cached_extract(b"same bytes", "renamed.md")
+        sha = await content_cache.content_sha256(b"same bytes")
+        await content_cache.set_analysis(sha, "m", {"category": "정책"})
+        return first, second, await content_cache.get_analysis(sha, "m"), await content_cache.get_analysis(sha, "other")
+
+    first, second, analysis, other = asyncio.run(scenario())
+    assert first == second == "same bytes"
+    assert calls == ["a.md"]
+    assert analysis == {"category": "정책"}
+    assert other is None
+
+
+def test_failed_extractions_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_cache, "_store", DiskCache(str(tmp_path / "cc.db"), 1 << 20, 60, table="content_cache"))
+    outcomes = [ExtractionTimeout("a.pdf"), ExtractionError("a.pdf: bad xref"), "real text"]
+
+    async def flaky_extract(content, filename):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(content_cache.extraction_pool, "extract", flaky_extract)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ExtractionError):
+                await content_cache.cached_extract(b"pdf bytes", "a.pdf")
+        return await content_cache.cached_extract(b"pdf bytes", "a.pdf")
+
+    assert asyncio.run(scenario()) == "real text"
+    assert outcomes == []
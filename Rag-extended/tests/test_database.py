@@ -0,0 +1,78 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import database
+from models import UsageEvent, User
+
+
+def _old_schema(path):
+    # rag.db as created before the indexes (and the coalesced column) existed
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE collection (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, xai_id VARCHAR NOT NULL, "
+        "description VARCHAR, category VARCHAR, tags VARCHAR, created_at DATETIME NOT NULL);"
+        "CREATE TABLE document (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, xai_doc_id VARCHAR NOT NULL, "
+        "collection_id INTEGER REFERENCES collection (id), status VARCHAR NOT NULL, created_at DATETIME NOT NULL);"
+        "CREATE TABLE usageevent (id INTEGER PRIMARY KEY, endpoint VARCHAR NOT NULL, model VARCHAR NOT NULL, "
+        "collection_id INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER, total_tokens INTEGER, "
+        "cost_usd FLOAT NOT NULL, latency_ms INTEGER, cached BOOLEAN NOT NULL, created_at DATETIME NOT NULL);"
+        "INSERT INTO usageevent (endpoint, model, cost_usd, cached, created_at) "
+        "VALUES ('/chat', 'm', 0.1, 0, '2024-01-01 00:00:00');"
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_migrate_upgrades_existing_database_in_place(tmp_path):
+    path = tmp_path / "rag.db"
+    _old_schema(path)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.run_sync(database.migrate)
+        # Idempotent: a second start changes nothing
+        async with engine.begin() as conn:
+            await conn.run_sync(database.migrate)
+
+        async with engine.connect() as conn:
+            def check(sync_conn):
+                inspector = inspect(sync_conn)
+                doc_indexes = {i["name"] for i in inspector.get_indexes("document")}
+                usage_indexes = {i["name"] for i in inspector.get_indexes("usageevent")}
+                usage_columns = {c["name"] for c in inspector.get_columns("usageevent")}
+                return doc_indexes, usage_indexes, usage_columns
+
+            doc_indexes, usage_indexes, usage_columns = await conn.run_sync(check)
+            versions = (await conn.execute(text("SELECT version FROM schema_migrations"))).scalars().all()
+            events = (await conn.execute(text("SELECT count(*) FROM usageevent"))).scalar()
+            backfilled = (await conn.execute(text(
+                "SELECT requests FROM usagerollup WHERE granularity = 'total'"
+            ))).scalars().all()
+        await engine.dispose()
+        return doc_indexes, usage_indexes, usage_columns, versions, events, backfilled
+
+    doc_indexes, usage_indexes, usage_columns, versions, events, backfilled = asyncio.run(scenario())
+    assert {"ix_document_collection_status", "ix_document_status", "ix_document_xai_doc_id"} <= doc_indexes
+    assert {"ix_usageevent_created_at", "ix_usageevent_collection_id", "ix_usageevent_collection_created"} <= usage_indexes
+    assert "coalesced" in usage_columns
+    assert versions == [m[0] for m in database.MIGRATIONS]
+    assert events == 1
+    assert backfilled == [1]
+
+
+def test_added_columns_render_for_postgres():
+    dialect = postgresql.dialect()
+    usage = UsageEvent.__table__
+    assert database._add_column_ddl(usage, usage.c.coalesced, dialect) == (
+        "ALTER TABLE usageevent ADD COLUMN coalesced BOOLEAN DEFAULT false"
+    )
+    # "user" is reserved on Postgres
+    user = User.__table__
+    assert database._add_column_ddl(user, user.c.full_name, dialect) == (
+        'ALTER TABLE "user" ADD COLUMN full_name VARCHAR'
+    )
@@ -0,0 +1,75 @@
+import asyncio
+
+from sqlmodel import select
+
+from doc_metadata import add_document_metadata, delete_document_metadata, prefilter_documents
+from filters import build_metadata
+from models import Collection, Document, DocumentMetadata, DocumentTag
+from rag import build_filter_instructions
+
+
+async def _add(session, coll_id, name, metadata, status="processed"):
+    doc = Document(name=name, xai_doc_id=f"x-{name}", collection_id=coll_id, status=status)
+    session.add(doc)
+    await session.flush()
+    add_document_metadata(session, doc, metadata)
+    return doc
+
+
+def _names(docs):
+    return sorted(d.name for d in docs)
+
+
+def test_prefilter_matches_category_tags_and_dates(session_factory):
+    async def scenario():
+        async with session_factory() as session:
+            coll = Collection(name="c", xai_id="xc")
+            session.add(coll)
+            await session.flush()
+            await _add(session, coll.id, "hr.txt", build_metadata(
+                category="policy", tags="hr, benefits", version="v1", date="2024-03-01"))
+            await _add(session, coll.id, "it.txt", build_metadata(
+                category="policy", tags=["it"], version="v2", date="2024-09-01"))
+            await _add(session, coll.id, "memo.txt", None)
+            await _add(session, coll.id, "broken.txt", build_metadata(category="policy"), status="failed")
+            await session.commit()
+
+            assert await prefilter_documents(session, coll.id, None) is None
+            assert await prefilter_documents(session, coll.id, {"custom": "x"}) is None
+            assert _names(await prefilter_documents(session, coll.id, {"category": "policy"})) == ["hr.txt", "it.txt"]
+            assert _names(await prefilter_documents(session, coll.id, {"tags": ["hr", "benefits"]})) == ["hr.txt"]
+            assert await prefilter_documents(session, coll.id, {"tags": ["hr", "it"]}) == []
+            assert _names(await prefilter_documents(
+                session, coll.id, {"date_from": "2024-06-01", "date_to": "2024-12-31"})) == ["it.txt"]
+            assert await prefilter_documents(session, coll.id, {"category": "legal"}) == []
+
+            # A document with no metadata row (uploaded before the table existed)
+            session.add(Document(name="old.txt", xai_doc_id="x-old", collection_id=coll.id))
+            await session.commit()
+            assert await prefilter_documents(session, coll.id, {"category": "legal"}) is None
+
+    asyncio.run(scenario())
+
+
+def test_delete_document_metadata_removes_rows(session_factory):
+    async def scenario():
+        async with session_factory() as session:
+            coll = Collection(name="c", xai_id="xc")
+            session.add(coll)
+            await session.flush()
+            doc = await _add(session, coll.id, "a.txt", build_metadata(category="policy", tags=["a", "b"]))
+            await session.commit()
+
+            await delete_document_metadata(session, select(Document.id).where(Document.collection_id == coll.id))
+            await session.commit()
+            assert (await session.exec(select(DocumentMetadata))).all() == []
+            assert (await session.exec(select(DocumentTag).where(DocumentTag.document_id == doc.id))).all() == []
+
+    asyncio.run(scenario())
+
+
+def test_filter_instructions_list_prefiltered_documents():
+    inst = build_filter_instructions({"category": "policy"}, ["hr.txt", "it.txt"])
+    assert "category=policy" in inst
+    assert "hr.txt, it.txt" in inst
+    assert build_filter_instructions(None, ["hr.txt"]) == ""
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from extraction import ExtractionError, ExtractionPool, ExtractionTimeout, extract_text
+
+
+def _stuck(seconds: float) -> str:
+    time.sleep(seconds)
+    return "never"
+
+
+def test_extract_text_plain_placeholders_and_failures():
+    assert extract_text("연차 20일".encode("utf-8"), "a.txt") == "연차 20일"
+    assert extract_text(b"\x89PNG", "a.png") == "[이미지 파일: a.png]"
+    with pytest.raises(ExtractionError):
+        extract_text(b"not a pdf", "a.pdf")
+
+
+def test_pool_extracts_off_loop_and_tracks_queue():
+    pool = ExtractionPool(max_workers=1, timeout_sec=30)
+    try:
+        text = asyncio.run(pool.extract(b"hello", "a.md"))
+    finally:
+        pool.shutdown()
+    assert text == "hello"
+    assert pool.stats()["queue_depth"] == 0
+    assert pool.stats()["completed"] == 1
+
+
+def test_failed_jobs_are_not_counted_as_completed():
+    from prometheus_client import REGISTRY
+
+    before = REGISTRY.get_sample_value("rag_extraction_jobs_total", {"result": "failed"}) or 0
+    pool = ExtractionPool(max_workers=1, timeout_sec=30)
+    try:
+        with pytest.raises(ExtractionError):
+            asyncio.run(pool.extract(b"not a pdf", "a.pdf"))
+    finally:
+        pool.shutdown()
+    assert pool.stats()["completed"] == 0 and pool.stats()["failed"] == 1
+    assert REGISTRY.get_sample_value("rag_extraction_jobs_total", {"result": "failed"}) == before + 1
+
+
+def test_timeout_raises_and_recycles_the_stuck_worker():
+    pool = ExtractionPool(max_workers=1, timeout_sec=1)
+
+    async def stuck_extract(source, filename):
+        return await pool._submit(filename, _stuck, 60)
+
+    async def scenario():
+        pool._extract = stuck_extract
+        stuck_pool = pool._pool()
+        with pytest.raises(ExtractionTimeout):
+            await pool.extract(b"x", "big.pdf")
+        del pool._extract
+        # The only worker was stuck; a fresh pool serves the next call
+        return stuck_pool, await pool.extract(b"hello", "a.md")
+
+    try:
+        stuck_pool, text = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert text == "hello"
+    assert pool.stats()["timeouts"] == 1 and pool.stats()["recycles"] == 1
+    assert pool.stats()["completed"] == 1 and pool.stats()["failed"] == 0
+    assert pool._executor is not stuck_pool
+
+
+def test_job_resubmitted_after_recycle_gets_a_fresh_deadline():
+    pool = ExtractionPool(max_workers=2, timeout_sec=3)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stuck = asyncio.ensure_future(pool._submit("stuck.pdf", _stuck, 60))
+        await asyncio.sleep(1.5)
+        started = loop.time()
+        # Still running when stuck.pdf times out at 3s and recycles the pool;
+        # resubmitted it ends past its original 4.5s deadline but inside the fresh one
+        slow = await pool._submit("slow.pdf", _stuck, 2)
+        with pytest.raises(ExtractionTimeout):
+            await stuck
+        return slow, loop.time() - started
+
+    try:
+        slow, elapsed = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert slow == "never"
+    assert elapsed > 3
+    assert pool.stats()["timeouts"] == 1 and pool.stats()["recycles"] == 1
+    assert pool.stats()["completed"] == 1
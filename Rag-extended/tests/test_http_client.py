@@ -0,0 +1,52 @@
+import asyncio
+
+import http_client
+from metrics import render_metrics
+
+
+async def _keepalive_server():
+    async def handle(reader, writer):
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+
+    async def serve(reader, writer):
+        try:
+            await handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve, "127.0.0.1", 0)
+
+
+def test_pool_stats_come_from_trace_events(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(http_client, "_stats", {"requests": 0, "new_connections": 0, "in_use": 0})
+
+    async def scenario():
+        server = await _keepalive_server()
+        port = server.sockets[0].getsockname()[1]
+        client = http_client.get_http_client()
+        try:
+            for _ in range(3):
+                resp = await client.get(f"http://127.0.0.1:{port}/")
+                assert resp.text == "ok"
+            async with client.stream("GET", f"http://127.0.0.1:{port}/") as resp:
+                during = http_client.http_stats()
+                await resp.aread()
+        finally:
+            await http_client.close_http_client()
+            server.close()
+            await server.wait_closed()
+        return during, http_client.http_stats()
+
+    during, after = asyncio.run(scenario())
+    assert during["pool_in_use"] == 1
+    assert (after["requests"], after["new_connections"], after["pool_in_use"]) == (4, 1, 0)
+    assert after["connection_reuse_ratio"] == 0.75
+
+    text = render_metrics().decode()
+    assert "rag_http_connections_new_total" in text
+    assert "rag_http_pool_connections_in_use" in text
@@ -0,0 +1,189 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+from sqlmodel import select
+
+import ingest_folder
+from ingest_manifest import IngestManifest
+from models import Collection, Document
+
+
+class FakeClient:
+    def __init__(self):
+        self.files = self
+        self.collections = self
+        self.uploaded = []
+        self.deleted = []
+
+    async def upload(self, path, filename=None, on_progress=None):
+        self.uploaded.append(filename)
+        return SimpleNamespace(id=f"doc-{len(self.uploaded)}")
+
+    async def add_existing_document(self, collection_id, file_id, fields=None):
+        pass
+
+    async def get_document(self, doc_id, collection_id):
+        return SimpleNamespace(status="DOCUMENT_STATUS_PROCESSED")
+
+    async def delete_document(self, collection_id, document_id):
+        self.deleted.append(document_id)
+
+
+async def _setup(factory, monkeypatch):
+    monkeypatch.setattr(ingest_folder, "POLL_INTERVAL_SEC", 0.01)
+    async with factory() as session:
+        coll = Collection(name="c", xai_id="xc")
+        session.add(coll)
+        await session.commit()
+        await session.refresh(coll)
+    return coll
+
+
+async def _sync(client, coll, folder, manifest):
+    results = []
+    await ingest_folder.sync_folder(client, coll, str(folder), manifest, on_result=results.append)
+    return results
+
+
+def _actions(results):
+    return sorted((r["name"], r["action"]) for r in results)
+
+
+def test_sync_skips_replaces_and_prunes(monkeypatch, tmp_path, session_factory):
+    async def scenario():
+        coll = await _setup(session_factory, monkeypatch)
+        folder = tmp_path / "share"
+        folder.mkdir()
+        (folder / "a.txt").write_text("연차 20일", encoding="utf-8")
+        (folder / "b.md").write_text("# 보너스", encoding="utf-8")
+        client = FakeClient()
+        manifest = IngestManifest(str(tmp_path / "manifest.db"), coll.xai_id)
+
+        first = await _sync(client, coll, folder, manifest)
+        assert _actions(first) == [("a.txt", "uploaded"), ("b.md", "uploaded")]
+
+        second = await _sync(client, coll, folder, manifest)
+        assert _actions(second) == [("a.txt", "skipped"), ("b.md", "skipped")]
+        assert len(client.uploaded) == 2
+
+        old_a = manifest.get(str(folder / "a.txt")).xai_doc_id
+        (folder / "a.txt").write_text("연차 25일", encoding="utf-8")
+        os.remove(folder / "b.md")
+        third = await _sync(client, coll, folder, manifest)
+        assert _actions(third) == [("a.txt", "replaced"), ("b.md", "deleted")]
+        assert old_a in client.deleted
+
+        async with session_factory() as session:
+            docs = (await session.exec(select(Document))).all()
+        assert [d.xai_doc_id for d in docs] == [manifest.get(str(folder / "a.txt")).xai_doc_id]
+        manifest.close()
+
+    asyncio.run(scenario())
+
+
+def test_sync_resumes_after_upload(monkeypatch, tmp_path, session_factory):
+    async def scenario():
+        coll = await _setup(session_factory, monkeypatch)
+        folder = tmp_path / "share"
+        folder.mkdir()
+        path = folder / "a.txt"
+        path.write_text("연차 20일", encoding="utf-8")
+        manifest = IngestManifest(str(tmp_path / "manifest.db"), coll.xai_id)
+        # Simulate a run that died after the upload but before indexing finished
+        st = path.stat()
+        manifest.mark_uploading(str(path), st.st_size, st.st_mtime_ns, ingest_folder.file_sha256(str(path)))
+        manifest.mark_uploaded(str(path), "doc-earlier")
+
+        client = FakeClient()
+        results = await _sync(client, coll, folder, manifest)
+        assert [(r["action"], r["document_id"], r["bytes"]) for r in results] == [("uploaded", "doc-earlier", 0)]
+        assert client.uploaded == []
+        assert manifest.get(str(path)).status == "done"
+        manifest.close()
+
+    asyncio.run(scenario())
+
+
+class BatchStatusClient:
+    def __init__(self, ready_after):
+        self.collections = self
+        self.ready_after = ready_after  # doc id -> polls until processed
+        self.calls = []
+
+    async def batch_get_documents(self, collection_id, file_ids):
+        self.calls.append(list(file_ids))
+        docs = []
+        for doc_id in file_ids:
+            self.ready_after[doc_id] -= 1
+            status = "DOCUMENT_STATUS_PROCESSED" if self.ready_after[doc_id] <= 0 else "DOCUMENT_STATUS_PROCESSING"
+            docs.append(SimpleNamespace(file_metadata=SimpleNamespace(file_id=doc_id), status=status))
+        return SimpleNamespace(documents=docs)
+
+
+def test_poller_batches_all_pending_documents():
+    async def scenario():
+        client = BatchStatusClient({"d1": 1, "d2": 3, "d3": 2})
+        poller = ingest_folder.IndexingPoller(client, "xc", min_interval=0.001, max_interval=0.01, batch_size=2)
+        waits = await asyncio.gather(*(poller.wait(d, d) for d in ("d1", "d2", "d3")))
+        await poller.close()
+        assert all(w >= 0 for w in waits)
+        # One loop, batched: first pass needs two calls (batch_size=2), later passes shrink
+        assert client.calls[0] == ["d1", "d2"] and client.calls[1] == ["d3"]
+        assert client.calls[2:] == [["d2", "d3"], ["d2"]]
+
+    asyncio.run(scenario())
+
+
+def test_run_stats_report_percentiles():
+    stats = ingest_folder.RunStats()
+    for i in range(1, 21):
+        stats.add({"name": str(i), "action": "uploaded", "document_id": str(i), "bytes": 1024 * 1024, "indexing_sec": float(i)})
+    stats.add({"name": "s", "action": "skipped", "document_id": "s"})
+    report = stats.report(wall_sec=10.0)
+    assert report["counts"] == {"uploaded": 20, "skipped": 1}
+    assert report["files_per_sec"] == 2.0
+    assert report["mb_per_sec"] == 2.0
+    assert report["indexing_p50_sec"] == 10.0
+    assert report["indexing_p95_sec"] == 19.0
+
+
+def test_iter_files_is_lazy_and_filters(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "deep.md").write_text("x")
+    (tmp_path / "top.txt").write_text("x")
+    (tmp_path / "skip.exe").write_text("x")
+    walker = ingest_folder.iter_files(str(tmp_path))
+    assert iter(walker) is walker
+    assert sorted(os.path.basename(p) for p in walker) == ["deep.md", "top.txt"]
+
+
+def test_unreadable_subdirectory_blocks_pruning(monkeypatch, tmp_path, session_factory):
+    async def scenario():
+        coll = await _setup(session_factory, monkeypatch)
+        folder = tmp_path / "share"
+        (folder / "hr").mkdir(parents=True)
+        (folder / "a.txt").write_text("연차 20일", encoding="utf-8")
+        (folder / "hr" / "b.md").write_text("# 보너스", encoding="utf-8")
+        client = FakeClient()
+        manifest = IngestManifest(str(tmp_path / "manifest.db"), coll.xai_id)
+        await _sync(client, coll, folder, manifest)
+
+        # A transient permission/NFS error on hr/ must not look like its files were deleted
+        real_scandir = os.scandir
+
+        def flaky_scandir(path):
+            if os.path.basename(path) == "hr":
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+
+        monkeypatch.setattr(ingest_folder.os, "scandir", flaky_scandir)
+        second = await _sync(client, coll, folder, manifest)
+        assert ("a.txt", "skipped") in _actions(second)
+        assert [r["action"] for r in second if r["name"].endswith("hr")] == ["error"]
+        assert client.deleted == []
+        async with session_factory() as session:
+            assert len((await session.exec(select(Document))).all()) == 2
+        manifest.close()
+
+    asyncio.run(scenario())
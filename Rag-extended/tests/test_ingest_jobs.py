@@ -0,0 +1,146 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+from sqlmodel import select
+
+import ingest_jobs as ingest_mod
+from extraction import ExtractionTimeout
+from models import Collection, Document, IngestJob
+from uploads import SpooledUpload
+
+
+class FakeClient:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.uploads = []
+        self.added = []
+        self.files = self
+        self.collections = self
+
+    async def upload(self, path, filename=None, on_progress=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("upstream 503")
+        self.uploads.append(filename)
+        if on_progress:
+            on_progress(10, 10)
+        return SimpleNamespace(id=f"file-{len(self.uploads)}")
+
+    async def add_existing_document(self, collection_id, file_id, fields=None):
+        self.added.append((collection_id, file_id))
+
+
+async def _setup(factory, tmp_path):
+    async with factory() as session:
+        coll = Collection(name="c", xai_id="xc")
+        session.add(coll)
+        await session.commit()
+        await session.refresh(coll)
+    path = tmp_path / "a.txt"
+    path.write_text("연차 20일", encoding="utf-8")
+    spooled = SpooledUpload(path=str(path), size=path.stat().st_size, sha256="abc")
+    return coll.id, spooled
+
+
+def test_job_uploads_and_creates_document(tmp_path, session_factory):
+    async def scenario():
+        coll_id, spooled = await _setup(session_factory, tmp_path)
+        client = FakeClient()
+        queue = ingest_mod.IngestJobQueue(client)
+        async with session_factory() as session:
+            job = await queue.enqueue(session, coll_id, "a.txt", spooled)
+
+        assert await queue.run_next()
+        assert not await queue.run_next()
+        assert client.added == [("xc", "file-1")]
+
+        async with session_factory() as session:
+            job = await session.get(IngestJob, job.id)
+            assert job.status == "succeeded"
+            doc = (await session.exec(select(Document))).one()
+            assert job.document_id == doc.id
+            assert doc.xai_doc_id == "file-1"
+            assert (await session.get(Collection, coll_id)).content_version == 1
+        assert not (tmp_path / "a.txt").exists()
+
+    asyncio.run(scenario())
+
+
+def test_job_retries_with_backoff_then_fails(tmp_path, session_factory):
+    async def scenario():
+        coll_id, spooled = await _setup(session_factory, tmp_path)
+        queue = ingest_mod.IngestJobQueue(FakeClient(failures=5), max_attempts=2, retry_base_sec=60)
+        async with session_factory() as session:
+            job = await queue.enqueue(session, coll_id, "a.txt", spooled)
+
+        assert await queue.run_next()
+        async with session_factory() as session:
+            job = await session.get(IngestJob, job.id)
+            assert job.status == "queued"
+            assert job.attempts == 1
+            assert "503" in job.last_error
+            # Not due yet: backoff holds it back
+            assert not await queue.run_next()
+            job.next_run_at = ingest_mod._utcnow()
+            session.add(job)
+            await session.commit()
+
+        assert await queue.run_next()
+        async with session_factory() as session:
+            job = await session.get(IngestJob, job.id)
+            assert job.status == "failed"
+            assert job.attempts == 2
+        assert not (tmp_path / "a.txt").exists()
+
+    asyncio.run(scenario())
+
+
+def test_prepare_upload_falls_back_to_original_on_extraction_timeout(monkeypatch, tmp_path):
+    async def timed_out(*args):
+        raise ExtractionTimeout("a.pdf")
+
+    monkeypatch.setattr(ingest_mod, "cached_extract_to_file", timed_out)
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    spooled = SpooledUpload(path=str(path), size=8, sha256="abc")
+    assert asyncio.run(ingest_mod.prepare_upload("a.pdf", spooled)) == (str(path), "a.pdf")
+
+
+def test_only_jobs_with_an_expired_lease_are_requeued(tmp_path, session_factory):
+    async def scenario():
+        coll_id, spooled = await _setup(session_factory, tmp_path)
+        queue = ingest_mod.IngestJobQueue(FakeClient(), lease_sec=60)
+        now = ingest_mod._utcnow()
+        async with session_factory() as session:
+            live = await queue.enqueue(session, coll_id, "live.txt", spooled)
+            dead = await queue.enqueue(session, coll_id, "dead.txt", spooled)
+            live.status, live.owner, live.updated_at = "running", "other-host:1:a", now
+            dead.status, dead.owner, dead.updated_at = "running", "other-host:2:b", now - timedelta(minutes=5)
+            session.add_all([live, dead])
+            await session.commit()
+            live_id, dead_id = live.id, dead.id
+
+            await queue._requeue_expired(session)
+
+        async with session_factory() as session:
+            live = await session.get(IngestJob, live_id)
+            dead = await session.get(IngestJob, dead_id)
+            assert (live.status, live.owner) == ("running", "other-host:1:a")
+            assert (dead.status, dead.owner) == ("queued", None)
+
+        # The heartbeat keeps our own running job's lease fresh
+        queue.lease_sec = 0.15
+        async with session_factory() as session:
+            job = await session.get(IngestJob, dead_id)
+            job.status, job.owner, job.updated_at = "running", queue.owner, now - timedelta(minutes=5)
+            session.add(job)
+            await session.commit()
+        beat = asyncio.create_task(queue._heartbeat(dead_id))
+        await asyncio.sleep(0.2)
+        beat.cancel()
+        async with session_factory() as session:
+            job = await session.get(IngestJob, dead_id)
+            assert job.updated_at > now
+
+    asyncio.run(scenario())
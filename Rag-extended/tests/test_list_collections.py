@@ -0,0 +1,43 @@
+import asyncio
+
+
+from app import _list_collection_rows
+from models import Collection, Document
+
+
+async def _seed(factory):
+    async with factory() as session:
+        session.add_all([Collection(name=f"c{i}", xai_id=f"x{i}") for i in range(3)])
+        await session.commit()
+        session.add_all([
+            Document(name="a", xai_doc_id="1", collection_id=1, status="processed"),
+            Document(name="b", xai_doc_id="2", collection_id=1, status="processing"),
+            Document(name="c", xai_doc_id="3", collection_id=1, status="failed"),
+            Document(name="d", xai_doc_id="4", collection_id=2, status="processed"),
+        ])
+        await session.commit()
+
+
+def test_grouped_counts(session_factory):
+    async def scenario():
+        await _seed(session_factory)
+        async with session_factory() as session:
+            rows = await _list_collection_rows(session)
+        by_id = {r.id: r for r in rows}
+        assert (by_id[1].documents_count, by_id[1].processing_count, by_id[1].failed_count) == (3, 1, 1)
+        assert by_id[1].status == "processing"
+        assert (by_id[2].documents_count, by_id[2].status) == (1, "active")
+        assert (by_id[3].documents_count, by_id[3].failed_count) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_keyset_page_without_counts(session_factory):
+    async def scenario():
+        await _seed(session_factory)
+        async with session_factory() as session:
+            rows = await _list_collection_rows(session, after_id=1, limit=1, with_counts=False)
+        assert [r.id for r in rows] == [2]
+        assert rows[0].documents_count is None
+
+    asyncio.run(scenario())
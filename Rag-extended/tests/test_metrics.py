@@ -0,0 +1,74 @@
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import timedelta
+
+import httpx
+
+import app as app_mod
+import cache
+import semantic_cache
+from auth_utils import create_access_token, principal_cache
+from models import Collection, User
+
+
+def test_chat_reports_stage_timings(monkeypatch, session_factory):
+    monkeypatch.setattr(cache, "_l2", None)
+    semantic_cache.semantic_clear()
+
+    async def fake_rag(client, collection_id, query, filters=None, documents=None):
+        return {"answer": "ok", "citations": [], "latency_ms": 1, "usage": None}
+
+    monkeypatch.setattr(app_mod, "run_rag", fake_rag)
+    monkeypatch.setattr(app_mod, "_precheck_answer", lambda db_collection: None)
+
+    async def scenario():
+        async with session_factory() as session:
+            session.add(User(email="m@example.com", hashed_password="x"))
+            coll = Collection(name="c", xai_id="x-metrics")
+            session.add(coll)
+            await session.commit()
+            coll_id = coll.id
+        principal_cache.invalidate()
+        token = create_access_token({"sub": "m@example.com"}, timedelta(minutes=5))
+        headers = {"Authorization": f"Bearer {token}"}
+        transport = httpx.ASGITransport(app=app_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"query": "metrics stage test", "collection_id": coll_id}
+            miss = await client.post("/chat", headers=headers, json=body)
+            hit = await client.post("/chat", headers=headers, json=body)
+            scrape = await client.get("/metrics")
+        return miss, hit, scrape
+
+    miss, hit, scrape = asyncio.run(scenario())
+    assert miss.status_code == hit.status_code == 200
+    assert hit.json()["cached"] is True
+
+    stages = [part.split(";")[0] for part in miss.headers["server-timing"].split(", ")]
+    assert stages == [
+        "auth", "collection_lookup", "status_check", "cache_lookup",
+        "prefilter", "upstream", "usage_write", "total",
+    ]
+    assert "upstream" not in hit.headers["server-timing"]
+
+    assert scrape.headers["content-type"].startswith("text/plain")
+    text = scrape.text
+    assert 'rag_stage_seconds_count{endpoint="/chat",stage="upstream"} 1.0' in text
+    assert 'rag_stage_seconds_count{endpoint="/chat",stage="auth"} 2.0' in text
+    assert 'rag_request_seconds_count{endpoint="/chat",method="POST",status="200"} 2.0' in text
+    assert 'rag_cache_lookups_total{cache="answer",result="hit"}' in text
+    assert "rag_http_requests_in_flight 1.0" in text  # the scrape itself
+
+
+def test_multiprocess_mode_sums_the_workers(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = "from metrics import CACHE_LOOKUPS; CACHE_LOOKUPS.labels(cache='answer', result='hit').inc()"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=root, env=env, check=True)
+    scrape = "import sys, metrics; sys.stdout.write(metrics.render_metrics().decode())"
+    text = subprocess.run(
+        [sys.executable, "-c", scrape], cwd=root, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'rag_cache_lookups_total{cache="answer",result="hit"} 2.0' in text
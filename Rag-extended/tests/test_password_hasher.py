@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+import pytest
+
+import auth_utils
+from auth_utils import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(auth_utils, "BCRYPT_ROUNDS", 4)
+    threads = []
+    real_verify = auth_utils.verify_password
+
+    def tracking_verify(plain, hashed):
+        threads.append(threading.current_thread().name)
+        return real_verify(plain, hashed)
+
+    monkeypatch.setattr(auth_utils, "verify_password", tracking_verify)
+
+    async def scenario():
+        hasher = PasswordHasher(workers=2, max_pending=4)
+        hashed = await hasher.hash("secret")
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("secret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+    assert threads and all(name.startswith("bcrypt") for name in threads)
+
+
+def test_saturated_hasher_fails_fast(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(auth_utils, "get_password_hash", lambda password: release.wait(5) and "h")
+
+    async def scenario():
+        hasher = PasswordHasher(workers=1, max_pending=2)
+        running = [asyncio.create_task(hasher.hash("p")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert hasher.saturated()
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.hash("p")
+        release.set()
+        assert await asyncio.gather(*running) == ["h", "h"]
+        assert not hasher.saturated()
+        hasher.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+import database
+from models import Collection, Document, IngestJob, UsageEvent, UsageRollup
+from usage_rollup import prune_statements, rollup_statements
+
+# e.g. postgresql://postgres@localhost/rag_test; each run works in its own schema
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+
+
+def test_migrate_and_write_timestamps_on_postgres():
+    pytest.importorskip("asyncpg")
+    schema = f"rag_test_{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        engine = database.make_engine(POSTGRES_URL, echo=False)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"CREATE SCHEMA {schema}"))
+                await conn.execute(text(f"SET LOCAL search_path TO {schema}"))
+                await conn.run_sync(database.migrate)
+                # A second start changes nothing
+                await conn.run_sync(database.migrate)
+
+                collection = {"name": "policies", "xai_id": "col-1", "content_version": 0,
+                              "created_at": datetime.now(timezone.utc)}
+                collection_id = (await conn.execute(
+                    Collection.__table__.insert().values(collection).returning(Collection.__table__.c.id)
+                )).scalar_one()
+                await conn.execute(Document.__table__.insert().values(
+                    name="a.pdf", xai_doc_id="doc-1", collection_id=collection_id, status="ready",
+                    created_at=datetime.now(timezone.utc),
+                ))
+                event = UsageEvent(endpoint="/chat", model="grok", collection_id=collection_id, latency_ms=120)
+                await conn.execute(UsageEvent.__table__.insert().values(event.model_dump(exclude={"id"})))
+                job = IngestJob(collection_id=collection_id, filename="a.pdf", spool_path="/tmp/a", sha256="x", size=1)
+                await conn.execute(IngestJob.__table__.insert().values(job.model_dump(exclude={"id"})))
+                for statement in rollup_statements("postgresql", [event, event]):
+                    await conn.execute(statement)
+                for statement in prune_statements():
+                    await conn.execute(statement)
+
+                due = (await conn.execute(
+                    select(IngestJob.next_run_at).where(IngestJob.next_run_at <= datetime.now(timezone.utc))
+                )).scalars().all()
+                total = (await conn.execute(
+                    select(UsageRollup.requests, UsageRollup.bucket_start).where(UsageRollup.granularity == "minute")
+                )).one()
+                recent = (await conn.execute(
+                    select(UsageEvent.id).where(
+                        UsageEvent.created_at > datetime.now(timezone.utc) - timedelta(minutes=5)
+                    )
+                )).scalars().all()
+            return due, total, recent
+        finally:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            await engine.dispose()
+
+    due, (requests, bucket), recent = asyncio.run(scenario())
+    assert len(due) == 1 and due[0].tzinfo is not None
+    assert requests == 2 and bucket.tzinfo is not None
+    assert len(recent) == 1
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+
+import httpx
+
+import app as app_mod
+import auth_utils
+import cache
+from auth_utils import create_access_token, principal_cache
+from models import Collection, User
+from profiling import ProfileStore, RequestProfiler, SamplingProfiler, to_collapsed, to_speedscope
+
+
+def _busy_worker(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_collects_stacks_and_exports():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_worker, args=(stop,), name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval_ms=1)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    busy = [s for s in profiler.stacks if s.startswith("busy;")]
+    assert busy and all("_busy_worker (tests/test_profiling.py:" in s for s in busy)
+
+    collapsed = to_collapsed(profiler.stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+    doc = to_speedscope({"endpoint": "/x", "created_at": "t", "interval_ms": 1, "stacks": profiler.stacks})
+    frames = doc["shared"]["frames"]
+    sampled = doc["profiles"][0]
+    assert sampled["type"] == "sampled" and len(sampled["samples"]) == len(profiler.stacks)
+    assert all(0 <= i < len(frames) for stack in sampled["samples"] for i in stack)
+
+
+def test_store_is_bounded(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=3, max_bytes=1 << 20)
+    for n in range(5):
+        store.save({"id": f"{n:032x}", "endpoint": "/chat", "stacks": {"a;b": n}})
+        time.sleep(0.01)  # distinct mtimes
+    assert [p["id"] for p in store.list()] == [f"{n:032x}" for n in (4, 3, 2)]
+    assert store.load(f"{0:032x}") is None
+    assert store.load("../../etc/passwd") is None
+
+
+def test_admin_opt_in_profiles_chat(tmp_path, monkeypatch, session_factory):
+    monkeypatch.setattr(cache, "_l2", None)
+    monkeypatch.setattr(auth_utils, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(app_mod, "request_profiler", RequestProfiler(ProfileStore(str(tmp_path / "profiles"))))
+    monkeypatch.setattr(app_mod, "_precheck_answer", lambda db_collection: None)
+
+    async def fake_rag(client, collection_id, query, filters=None, documents=None):
+        await asyncio.sleep(0.02)
+        return {"answer": "ok", "citations": [], "latency_ms": 20, "usage": None}
+
+    monkeypatch.setattr(app_mod, "run_rag", fake_rag)
+
+    async def scenario():
+        async with session_factory() as session:
+            session.add(User(email="admin@example.com", hashed_password="x"))
+            session.add(User(email="user@example.com", hashed_password="x"))
+            coll = Collection(name="c", xai_id="x-profiling")
+            session.add(coll)
+            await session.commit()
+            coll_id = coll.id
+
+        def auth(email):
+            return {"Authorization": f"Bearer {create_access_token({'sub': email}, timedelta(minutes=5))}"}
+
+        principal_cache.invalidate()
+        transport = httpx.ASGITransport(app=app_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            admin = {**auth("admin@example.com"), "X-Profile": "1"}
+            user = {**auth("user@example.com"), "X-Profile": "1"}
+            profiled = await client.post("/chat", headers=admin, json={"query": "q1", "collection_id": coll_id})
+            ignored = await client.post("/chat", headers=user, json={"query": "q2", "collection_id": coll_id})
+            forbidden = await client.get("/admin/profiles", headers=user)
+            listing = await client.get("/admin/profiles", headers=admin)
+            profile_id = profiled.headers["x-profile-id"]
+            speedscope = await client.get(f"/admin/profiles/{profile_id}", headers=admin)
+            collapsed = await client.get(f"/admin/profiles/{profile_id}?format=collapsed", headers=admin)
+        return profiled, ignored, forbidden, listing, speedscope, collapsed
+
+    profiled, ignored, forbidden, listing, speedscope, collapsed = asyncio.run(scenario())
+    assert profiled.status_code == ignored.status_code == 200
+    assert "x-profile-id" not in ignored.headers
+    assert forbidden.status_code == 403
+
+    profiles = listing.json()["profiles"]
+    assert len(profiles) == 1
+    assert profiles[0]["endpoint"] == "/chat" and profiles[0]["reason"] == "requested"
+    assert profiles[0]["user"] == "admin@example.com" and profiles[0]["samples"] > 0
+
+    assert speedscope.json()["profiles"][0]["type"] == "sampled"
+    assert collapsed.text.strip()
+    assert json.loads(speedscope.content)["exporter"] == "rag-extended"
+
+
+def test_profiled_upload_returns_profile_id(tmp_path, monkeypatch, session_factory):
+    monkeypatch.setattr(auth_utils, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(app_mod, "request_profiler", RequestProfiler(ProfileStore(str(tmp_path / "profiles"))))
+    monkeypatch.setattr(app_mod, "mgmt_client", object())
+    monkeypatch.setattr(app_mod, "INGEST_SPOOL_DIR", str(tmp_path / "spool"))
+
+    async def scenario():
+        async with session_factory() as session:
+            session.add(User(email="admin@example.com", hashed_password="x"))
+            coll = Collection(name="c", xai_id="x-profiling-upload")
+            session.add(coll)
+            await session.commit()
+            coll_id = coll.id
+
+        principal_cache.invalidate()
+        token = create_access_token({"sub": "admin@example.com"}, timedelta(minutes=5))
+        transport = httpx.ASGITransport(app=app_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                f"/collections/{coll_id}/upload?profile=1",
+                headers={"Authorization": f"Bearer {token}"},
+                files={"file": ("a.txt", b"alpha")},
+            )
+
+    resp = asyncio.run(scenario())
+    assert resp.status_code == 202
+    assert resp.json()["status"] == "queued"
+    profile_id = resp.headers["x-profile-id"]
+    assert app_mod.request_profiler.store.load(profile_id)["endpoint"] == "/collections/{collection_id}/upload"
+
+
+def test_every_nth_request_is_sampled(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), every_n=3, max_concurrent=1)
+
+    async def scenario():
+        reasons = []
+        for _ in range(6):
+            run = profiler.begin("/chat", None, requested=False)
+            reasons.append(run.reason if run else None)
+            if run:
+                await profiler.finish(run)
+        # Only max_concurrent profiles at a time
+        first = profiler.begin("/chat", None, requested=True)
+        second = profiler.begin("/chat", None, requested=True)
+        await profiler.finish(first)
+        return reasons, second
+
+    reasons, second = asyncio.run(scenario())
+    assert reasons == [None, None, "sampled", None, None, "sampled"]
+    assert second is None and profiler.skipped == 1
+    assert len(profiler.store.list()) == 3
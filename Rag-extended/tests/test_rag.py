@@ -0,0 +1,27 @@
+import asyncio
+from types import SimpleNamespace
+
+from rag import stream_rag
+
+
+class FakeChat:
+    async def stream(self):
+        resp = SimpleNamespace(content="", citations=["a.txt"], usage=None)
+        for part in ["hello ", "world"]:
+            resp.content += part
+            yield resp, SimpleNamespace(choices=[SimpleNamespace(content=part)], citations=["a.txt"])
+
+
+def test_stream_rag_emits_tokens_citations_and_result():
+    client = SimpleNamespace(chat=SimpleNamespace(create=lambda **kw: FakeChat()))
+
+    async def collect():
+        return [e async for e in stream_rag(client, "col", "q")]
+
+    events = asyncio.run(collect())
+    assert [e["text"] for e in events if e["type"] == "token"] == ["hello ", "world"]
+    assert [e["citation"] for e in events if e["type"] == "citation"] == [{"text": "a.txt"}]
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["result"]["answer"] == "hello world"
+    assert done["result"]["ttft_ms"] is not None
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+
+import reconciler as reconciler_mod
+from models import Collection, Document
+
+
+class FakeCollections:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = []
+
+    async def get_document(self, doc_id, collection_id):
+        self.calls.append(doc_id)
+        return SimpleNamespace(status=self.statuses.get(doc_id))
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _setup(factory):
+    async with factory() as session:
+        coll = Collection(name="c", xai_id="xc")
+        session.add(coll)
+        await session.commit()
+        await session.refresh(coll)
+        session.add_all([
+            Document(name="a", xai_doc_id="d1", collection_id=coll.id, status="processing"),
+            Document(name="b", xai_doc_id="d2", collection_id=coll.id, status="processing"),
+        ])
+        await session.commit()
+    return coll.id
+
+
+def test_reconcile_updates_status_and_snapshot(session_factory):
+    async def scenario():
+        coll_id = await _setup(session_factory)
+        fake = FakeCollections({"d1": "DOCUMENT_STATUS_PROCESSED", "d2": "DOCUMENT_STATUS_PROCESSING"})
+        rec = reconciler_mod.DocumentStatusReconciler(SimpleNamespace(collections=fake), interval_sec=60)
+
+        assert await rec.reconcile_once() == 1
+        state = rec.snapshot(coll_id)
+        assert state.total == 2
+        assert state.has_processed
+        async with session_factory() as session:
+            assert (await session.get(Collection, coll_id)).content_version == 1
+
+        # d2 is backed off, so an immediate second pass makes no calls
+        fake.calls.clear()
+        assert await rec.reconcile_once() == 0
+        assert fake.calls == []
+
+        rec.kick(coll_id)
+        await rec.reconcile_once()
+        assert fake.calls == ["d2"]
+
+    _run(scenario())
+
+
+def test_snapshot_unknown_collection_is_empty():
+    rec = reconciler_mod.DocumentStatusReconciler(None)
+    state = rec.snapshot(999)
+    assert state.total == 0
+    assert not state.has_processed
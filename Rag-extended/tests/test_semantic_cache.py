@@ -0,0 +1,75 @@
+import pytest
+
+from config import SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD
+from semantic_cache import SemanticCache, model_embedder, ngram_vector
+
+# The motivating examples: the cached question and how else users ask it
+CACHED = "연차는 몇 일인가요?"
+SPACING = "연차는 몇일인가요"
+DROPPED_PARTICLE = "연차 몇 일인가요?"
+PARAPHRASE = "연차 며칠이야?"
+
+
+def test_ngram_vector_ignores_spacing_and_punctuation():
+    a = ngram_vector("연차는 몇 일인가요?", dim=512)
+    b = ngram_vector("연차는 몇일인가요", dim=512)
+    c = ngram_vector("보너스는 몇 번 주나요?", dim=512)
+    assert float(a @ b) > 0.99
+    assert float(a @ c) < 0.5
+
+
+def test_semantic_hit_is_scoped_by_collection_and_filters():
+    sc = SemanticCache(threshold=0.9, max_entries=4, ttl_sec=60)
+    sc.set("col", "m", "What is the leave policy?", None, {"answer": "20 days"})
+
+    value, score, matched = sc.get("col", "m", "what is the leave policy", None)
+    assert value == {"answer": "20 days"}
+    assert score > 0.9
+    assert matched == "What is the leave policy?"
+    assert sc.get("other", "m", "what is the leave policy", None) is None
+    assert sc.get("col", "m", "what is the leave policy", {"category": "hr"}) is None
+    assert sc.get("col", "m", "bonus schedule", None) is None
+
+
+def test_semantic_cache_evicts_lru_when_full():
+    sc = SemanticCache(threshold=0.99, max_entries=2, ttl_sec=60)
+    assert sc.set("col", "m", "first question", None, {"answer": "1"}) == 0
+    assert sc.set("col", "m", "second question", None, {"answer": "2"}) == 0
+    sc.get("col", "m", "first question", None)
+    assert sc.set("col", "m", "third question", None, {"answer": "3"}) == 1
+    assert sc.get("col", "m", "second question", None) is None
+    assert sc.get("col", "m", "first question", None)[0] == {"answer": "1"}
+
+
+def test_stale_version_get_keeps_newer_entries():
+    sc = SemanticCache(threshold=0.9, max_entries=4, ttl_sec=60)
+    sc.set("col", "m", "leave policy", None, {"answer": "v2"}, version=2)
+    # A request that read content_version before the bump
+    assert sc.get("col", "m", "leave policy", None, version=1) is None
+    sc.set("col", "m", "leave policy", None, {"answer": "v1"}, version=1)
+    assert sc.get("col", "m", "leave policy", None, version=2)[0] == {"answer": "v2"}
+    # A newer version drops the scope
+    assert sc.get("col", "m", "leave policy", None, version=3) is None
+    assert sc.get("col", "m", "leave policy", None, version=2) is None
+
+
+def test_request_examples_with_ngram_vectors():
+    # Default threshold: only spacing/punctuation variants hit (the exact key
+    # already folds those); anything reworded misses
+    sc = SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=4, ttl_sec=60)
+    sc.set("col", "m", CACHED, None, {"answer": "15일"})
+    assert sc.get("col", "m", SPACING, None) is not None
+    assert sc.get("col", "m", DROPPED_PARTICLE, None) is None
+    assert sc.get("col", "m", PARAPHRASE, None) is None
+
+
+def test_request_examples_with_local_model():
+    pytest.importorskip("sentence_transformers")
+    if not SEMANTIC_CACHE_MODEL:
+        pytest.skip("SEMANTIC_CACHE_MODEL is not set")
+    sc = SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=4, ttl_sec=60,
+                       embed=model_embedder(SEMANTIC_CACHE_MODEL))
+    sc.set("col", "m", CACHED, None, {"answer": "15일"})
+    for query in (SPACING, DROPPED_PARTICLE, PARAPHRASE):
+        assert sc.get("col", "m", query, None) is not None, query
+    assert sc.get("col", "m", "보너스는 언제 나오나요?", None) is None
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import httpx
+from sqlmodel import select
+
+import app as app_mod
+from auth_utils import create_access_token, principal_cache
+from ingest_jobs import IngestJobQueue
+from models import Collection, Document, DocumentMetadata, DocumentTag, IngestJob, User
+
+
+class FakeManagementClient:
+    def __init__(self):
+        self.files = self
+        self.collections = self
+        self.fields = []
+
+    async def upload(self, path, filename=None, on_progress=None):
+        return SimpleNamespace(id=f"file-{filename}")
+
+    async def add_existing_document(self, collection_id, file_id, fields=None):
+        self.fields.append(fields)
+
+
+def test_batch_upload_queues_jobs_with_the_ui_metadata_fields(tmp_path, monkeypatch, session_factory):
+    # The Upload page sends category and comma-separated tags with the files
+    client = FakeManagementClient()
+    queue = IngestJobQueue(client)
+    monkeypatch.setattr(app_mod, "mgmt_client", client)
+    monkeypatch.setattr(app_mod, "ingest_queue", queue)
+    monkeypatch.setattr(app_mod, "INGEST_SPOOL_DIR", str(tmp_path / "spool"))
+
+    async def scenario():
+        async with session_factory() as session:
+            session.add(User(email="u@example.com", hashed_password="x"))
+            coll = Collection(name="c", xai_id="x-batch")
+            session.add(coll)
+            await session.commit()
+            coll_id = coll.id
+
+        principal_cache.invalidate()
+        token = create_access_token({"sub": "u@example.com"}, timedelta(minutes=5))
+        transport = httpx.ASGITransport(app=app_mod.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            resp = await http.post(
+                f"/collections/{coll_id}/upload-batch",
+                headers={"Authorization": f"Bearer {token}"},
+                files=[("files", ("a.txt", b"alpha")), ("files", ("b.md", b"beta"))],
+                data={"category": "정책", "tags": "인사,휴가"},
+            )
+        # Nothing reaches xAI inside the request; the queue workers do it
+        assert client.fields == []
+        async with session_factory() as session:
+            jobs = (await session.exec(select(IngestJob))).all()
+            assert (await session.exec(select(Document))).all() == []
+        while await queue.run_next():
+            pass
+        async with session_factory() as session:
+            categories = (await session.exec(select(DocumentMetadata.category))).all()
+            tags = (await session.exec(select(DocumentTag.tag))).all()
+        return resp, jobs, categories, tags
+
+    resp, jobs, categories, tags = asyncio.run(scenario())
+    assert resp.status_code == 202
+    body = resp.json()
+    assert (body["queued"], body["failed"]) == (2, 0)
+    assert sorted(r["job_id"] for r in body["results"]) == sorted(j.id for j in jobs)
+    assert categories == ["정책", "정책"]
+    assert sorted(tags) == ["인사", "인사", "휴가", "휴가"]
+    assert all(f and f.get("category") == "정책" for f in client.fields)
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from extraction import ExtractionPool
+from uploads import spool_upload, unpack_zip
+
+
+def _upload(data: bytes, name: str = "a.txt") -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def test_spool_upload_hashes_in_chunks(tmp_path):
+    data = b"x" * 2500
+    spooled = asyncio.run(spool_upload(_upload(data), max_bytes=10_000, chunk_size=1000))
+    try:
+        assert spooled.size == 2500
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        with open(spooled.path, "rb") as f:
+            assert f.read() == data
+    finally:
+        spooled.cleanup()
+    assert not os.path.exists(spooled.path)
+
+
+def test_spool_upload_rejects_oversize_and_empty():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_upload(_upload(b"x" * 3000), max_bytes=2000, chunk_size=1000))
+    assert "exceeds" in exc.value.detail
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_upload(_upload(b""), max_bytes=2000))
+    assert exc.value.detail == "File is empty"
+
+
+def test_extract_to_file_from_path(tmp_path):
+    src = tmp_path / "in.md"
+    src.write_text("연차 20일", encoding="utf-8")
+    out = tmp_path / "out.txt"
+    pool = ExtractionPool(max_workers=1, timeout_sec=30)
+    try:
+        asyncio.run(pool.extract_to_file(str(src), "in.md", str(out)))
+    finally:
+        pool.shutdown()
+    assert out.read_text(encoding="utf-8") == "연차 20일"
+
+
+class _LegacyZipInfo(zipfile.ZipInfo):
+    def _encodeFilenameFlags(self):
+        return self.filename.encode("cp437"), self.flag_bits
+
+
+def test_unpack_zip_limits_and_korean_names(tmp_path):
+    zip_path = tmp_path / "batch.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("policies/연차규정.txt", "연차 20일")
+        archive.writestr("policies/big.txt", "x" * 5000)
+        archive.writestr("run.exe", "MZ")
+        archive.writestr("__MACOSX/._연차규정.txt", "junk")
+        # Legacy Windows archive: cp949 bytes, no UTF-8 flag
+        info = _LegacyZipInfo("인사.md".encode("cp949").decode("cp437"))
+        archive.writestr(info, "# 인사")
+
+    members = unpack_zip(str(zip_path), {".txt", ".md"}, 1000, 10_000, 10, spool_dir=str(tmp_path))
+    by_name = {m.filename: m for m in members}
+    try:
+        assert set(by_name) == {"연차규정.txt", "big.txt", "run.exe", "인사.md"}
+        assert by_name["연차규정.txt"].spooled.size == len("연차 20일".encode("utf-8"))
+        assert "exceeds" in by_name["big.txt"].error
+        assert by_name["run.exe"].error == "File type not allowed"
+        assert by_name["인사.md"].spooled is not None
+    finally:
+        for m in members:
+            if m.spooled:
+                m.spooled.cleanup()
@@ -0,0 +1,123 @@
+import asyncio
+
+from sqlmodel import select
+
+import usage_recorder as recorder_mod
+from models import UsageEvent, UsageRollup
+from usage_recorder import UsageRecorder
+
+
+def _count_writes(monkeypatch) -> list:
+    writes = []
+    get_session = recorder_mod.get_session
+
+    async def counting_session():
+        writes.append(1)
+        async for session in get_session():
+            yield session
+
+    monkeypatch.setattr(recorder_mod, "get_session", counting_session)
+    return writes
+
+
+async def _count(factory) -> int:
+    async with factory() as session:
+        return len((await session.exec(select(UsageEvent))).all())
+
+
+def _event(i: int, cached: bool = False) -> UsageEvent:
+    return UsageEvent(endpoint="/chat", model="m", collection_id=1, latency_ms=i, cached=cached)
+
+
+def test_flushes_in_batches_and_on_stop(monkeypatch, session_factory):
+    async def scenario():
+        writes = _count_writes(monkeypatch)
+        recorder = UsageRecorder(batch_size=10, interval_ms=60_000)
+        await recorder.start()
+        for i in range(25):
+            recorder.record(_event(i, cached=i % 2 == 0))
+        # A full batch wakes the writer without waiting for the interval;
+        # it drains the buffer in batch_size INSERTs
+        for _ in range(100):
+            if await _count(session_factory) >= 25:
+                break
+            await asyncio.sleep(0.01)
+        assert await _count(session_factory) == 25
+        assert len(writes) == 3
+
+        for i in range(5):
+            recorder.record(_event(i))
+        assert recorder.pending() == 5
+        await recorder.stop()
+        assert await _count(session_factory) == 30
+        assert recorder.pending() == 0
+        async with session_factory() as session:
+            cached = (await session.exec(select(UsageEvent).where(UsageEvent.cached == True))).all()  # noqa: E712
+        assert len(cached) == 13
+        async with session_factory() as session:
+            total = (await session.exec(select(UsageRollup).where(UsageRollup.granularity == "total"))).one()
+        assert (total.requests, total.cached) == (30, 13)
+
+    asyncio.run(scenario())
+
+
+def test_interval_flush_and_bounded_buffer(session_factory):
+    async def scenario():
+        recorder = UsageRecorder(batch_size=100, interval_ms=20, max_buffer=100)
+        await recorder.start()
+        recorder.record(_event(1))
+        await asyncio.sleep(0.2)
+        assert await _count(session_factory) == 1
+
+        await recorder.stop()
+        for i in range(150):
+            recorder.record(_event(i))
+        assert recorder.pending() == 100
+        assert recorder.dropped == 50
+        assert await recorder.flush() == 100
+        async with session_factory() as session:
+            latencies = (await session.exec(select(UsageEvent.latency_ms))).all()
+        # The oldest events were the ones dropped
+        assert min(latencies[1:]) == 50
+
+    asyncio.run(scenario())
+
+
+def test_stop_lets_the_write_in_progress_finish(session_factory):
+    async def scenario():
+        recorder = UsageRecorder(batch_size=5, interval_ms=60_000)
+        write = recorder._write
+        started = asyncio.Event()
+
+        async def slow_write(batch):
+            started.set()
+            await asyncio.sleep(0.05)
+            await write(batch)
+
+        recorder._write = slow_write
+        await recorder.start()
+        for i in range(5):
+            recorder.record(_event(i))
+        await started.wait()
+        await recorder.stop()
+        assert await _count(session_factory) == 5
+        assert recorder.pending() == 0
+
+    asyncio.run(scenario())
+
+
+def test_requeue_into_a_refilled_buffer_drops_the_oldest(capsys):
+    recorder = UsageRecorder(batch_size=4, interval_ms=60_000, max_buffer=6)
+
+    async def failing_write(batch):
+        # Requests keep recording while the write is in flight
+        for i in range(10, 15):
+            recorder.record(_event(i))
+        raise OSError("database is locked")
+
+    recorder._write = failing_write
+    for i in range(4):
+        recorder.record(_event(i))
+    assert asyncio.run(recorder.flush()) == 0
+    assert [e.latency_ms for e in recorder._buffer] == [3, 10, 11, 12, 13, 14]
+    assert "dropped 3 event(s)" in capsys.readouterr().out
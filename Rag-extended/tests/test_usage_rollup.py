@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlmodel import select
+
+from app import get_stats, get_stats_timeseries
+from models import UsageEvent, UsageRollup
+from usage_rollup import aggregate, percentile_from_bins, rollup_statements
+
+T0 = datetime(2024, 5, 1, 9, 15, 30, tzinfo=timezone.utc)
+
+
+def _event(minute: int, latency_ms: int, collection_id=1, cached=False, tokens=10, cost=0.01):
+    return UsageEvent(
+        endpoint="/chat", model="m", collection_id=collection_id,
+        prompt_tokens=tokens, completion_tokens=tokens, total_tokens=2 * tokens,
+        cost_usd=0.0 if cached else cost, latency_ms=latency_ms, cached=cached,
+        created_at=T0.replace(minute=minute),
+    )
+
+
+def test_aggregate_buckets_and_percentiles():
+    rollups, bins = aggregate([_event(15, 80), _event(16, 400), _event(16, 90, cached=True)])
+    by_key = {(r["granularity"], r["bucket_start"]): r for r in rollups}
+    assert by_key[("minute", T0.replace(minute=16, second=0))]["requests"] == 2
+    hour = by_key[("hour", T0.replace(minute=0, second=0))]
+    assert (hour["requests"], hour["cached"], hour["latency_sum_ms"]) == (3, 1, 570)
+    assert by_key[("total", datetime(1970, 1, 1, tzinfo=timezone.utc))]["total_tokens"] == 60
+    assert len([b for b in bins if b["granularity"] == "hour"]) == 2  # 80 and 90 share the 100 ms bin
+
+    assert percentile_from_bins({}, 0.5) is None
+    assert percentile_from_bins({100: 9, 500: 1}, 0.50) == 100
+    assert percentile_from_bins({100: 9, 500: 1}, 0.95) == 500
+    # Slower than the last finite bound: no meaningful upper bound to report
+    assert percentile_from_bins({100: 9, 2**31 - 1: 1}, 0.95) is None
+    assert percentile_from_bins({100: 9, 2**31 - 1: 1}, 0.50) == 100
+
+
+def test_stats_and_timeseries_read_rollups(session_factory):
+    async def scenario():
+        async with session_factory() as session:
+            # Two flushes: the second adds to the rows the first created
+            for batch in ([_event(15, 80), _event(16, 400)], [_event(16, 90, cached=True), _event(17, 2500, 2)]):
+                for statement in rollup_statements("sqlite", batch):
+                    await session.exec(statement)
+                await session.commit()
+
+            assert len((await session.exec(select(UsageEvent))).all()) == 0  # raw table untouched
+            stats = await get_stats(session=session, current_user=None)
+            assert stats["queries"] == 4
+            assert stats["avg_latency_ms"] == (80 + 400 + 90 + 2500) // 4
+            assert round(stats["cost_usd"], 6) == 0.03
+
+            series = await get_stats_timeseries(
+                granularity="minute", start=T0.replace(minute=15), end=T0.replace(minute=17),
+                collection_id=None, model=None, session=session, current_user=None,
+            )
+            assert [b.requests for b in series] == [1, 2, 1]
+            assert (series[1].cached, series[1].p50_latency_ms, series[1].p95_latency_ms) == (1, 100, 500)
+            assert series[2].p95_latency_ms == 3000
+
+            only_1 = await get_stats_timeseries(
+                granularity="hour", start=T0, end=T0, collection_id=1, model="m",
+                session=session, current_user=None,
+            )
+            assert len(only_1) == 1 and only_1[0].requests == 3
+            rollups = (await session.exec(select(UsageRollup).where(UsageRollup.granularity == "total"))).all()
+            assert sorted(r.collection_id for r in rollups) == [1, 2]
+
+    asyncio.run(scenario())
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+
+from config import UPLOAD_CHUNK_BYTES, UPLOAD_SPOOL_DIR
+
+
+@dataclass
+class SpooledUpload:
+    """An upload copied to a private temp file, hashed on the way in."""
+    path: str
+    size: int
+    sha256: str
+
+    @property
+    def text_path(self) -> str:
+        # Where the extracted plain text goes (same lifetime as the upload)
+        return self.path + ".txt"
+
+    def cleanup(self) -> None:
+        for p in (self.path, self.text_path):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+
+def _size_error(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File size exceeds maximum allowed size of {max_bytes / (1024 * 1024):.0f} MB",
+    )
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+    allow_empty: bool = False,
+    spool_dir: str = UPLOAD_SPOOL_DIR,
+) -> SpooledUpload:
+    """
+    Copy an UploadFile to disk chunk by chunk, enforcing max_bytes and
+    computing SHA-256 as it streams, so the request body never sits in memory.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _size_error(max_bytes)
+
+    ext = os.path.splitext((file.filename or "").lower())[1]
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=ext, dir=spool_dir or None)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _size_error(max_bytes)
+                await asyncio.to_thread(_write_chunk, out, digest, chunk)
+        if size == 0 and not allow_empty:
+            raise HTTPException(status_code=400, detail="File is empty")
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest())
+
+
+def _write_chunk(out, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def file_has_text(path: str, chunk_size: int = UPLOAD_CHUNK_BYTES) -> bool:
+    """True if the (UTF-8) file contains any non-whitespace character."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while chunk := f.read(chunk_size):
+            if chunk.strip():
+                return True
+    return False
+
+
+@dataclass
+class ArchiveMember:
+    filename: str
+    spooled: SpooledUpload | None = None
+    error: str | None = None
+
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    if info.flag_bits & 0x800:
+        return info.filename
+    # No UTF-8 flag: zipfile decoded as cp437, but Korean Windows archives use cp949
+    raw = info.filename.encode("cp437")
+    for encoding in ("utf-8", "cp949"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def unpack_zip(
+    zip_path: str,
+    allowed_extensions: set[str],
+    max_member_bytes: int,
+    max_total_bytes: int,
+    max_files: int,
+    spool_dir: str = UPLOAD_SPOOL_DIR,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+) -> list[ArchiveMember]:
+    """
+    Spool each allowed member of a zip archive to its own temp file (blocking;
+    run in a thread). Sizes are counted while copying, not trusted from the
+    archive header, so a zip bomb stops at the limits.
+    """
+    members: list[ArchiveMember] = []
+    total = 0
+    spooled_count = 0
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            name = _member_name(info)
+            base = os.path.basename(name)
+            if info.is_dir() or name.startswith("__MACOSX/") or not base or base.startswith("."):
+                continue
+            ext = os.path.splitext(base.lower())[1]
+            if ext not in allowed_extensions:
+                members.append(ArchiveMember(base, error="File type not allowed"))
+                continue
+            if spooled_count >= max_files:
+                members.append(ArchiveMember(base, error=f"Too many files (max {max_files})"))
+                break
+
+            fd, path = tempfile.mkstemp(suffix=ext, dir=spool_dir or None)
+            digest = hashlib.sha256()
+            size = 0
+            error = None
+            with os.fdopen(fd, "wb") as out, archive.open(info) as src:
+                while chunk := src.read(chunk_size):
+                    size += len(chunk)
+                    if size > max_member_bytes:
+                        error = f"File size exceeds maximum allowed size of {max_member_bytes / (1024 * 1024):.0f} MB"
+                        break
+                    if total + size > max_total_bytes:
+                        error = "Archive exceeds the batch size limit"
+                        break
+                    _write_chunk(out, digest, chunk)
+            if error is None and size == 0:
+                error = "File is empty"
+            if error is not None:
+                os.remove(path)
+                members.append(ArchiveMember(base, error=error))
+                if total + size > max_total_bytes:
+                    break
+                continue
+            total += size
+            spooled_count += 1
+            members.append(ArchiveMember(base, SpooledUpload(path=path, size=size, sha256=digest.hexdigest())))
+    return members
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import deque
+
+from sqlalchemy import insert
+
+from config import USAGE_BUFFER_MAX, USAGE_FLUSH_BATCH, USAGE_FLUSH_INTERVAL_MS
+from database import get_session
+from models import UsageEvent
+from usage_rollup import prune_statements, rollup_statements
+
+# Expired minute/hour rollup buckets are deleted at most this often
+PRUNE_INTERVAL_SEC = 3600
+INSERT_CHUNK_ROWS = 1000
+
+
+class UsageRecorder:
+    """
+    Write-behind buffer for UsageEvent rows: handlers append to an in-memory
+    ring buffer and a background task writes them in multi-row INSERTs every
+    batch_size events or interval_ms, whichever comes first, folding them
+    into the usage rollups in the same transaction. stop() lets a write in
+    progress finish, then flushes what is left.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = USAGE_FLUSH_BATCH,
+        interval_ms: int = USAGE_FLUSH_INTERVAL_MS,
+        max_buffer: int = USAGE_BUFFER_MAX,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.interval_sec = interval_ms / 1000
+        self._buffer: deque[UsageEvent] = deque(maxlen=max(self.batch_size, max_buffer))
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+        self.dropped = 0
+        self._last_prune = 0.0
+
+    def record(self, event: UsageEvent) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            # Full (DB down or too slow): the oldest event makes room
+            self.dropped += 1
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # Not cancel(): that would interrupt a write with its batch already popped
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    await self._write(batch)
+                except asyncio.CancelledError:
+                    self._requeue(batch)
+                    raise
+                except Exception as e:
+                    print(f"Warning: failed to record {len(batch)} usage event(s): {e}")
+                    self._requeue(batch)
+                    break
+                written += len(batch)
+            if self.dropped:
+                print(f"Warning: usage buffer full; dropped {self.dropped} event(s)")
+                self.dropped = 0
+            return written
+
+    def _requeue(self, batch: list[UsageEvent]) -> None:
+        # Back to the front for the next flush. Events recorded meanwhile may
+        # have filled the buffer; as in record(), the oldest ones make room
+        room = self._buffer.maxlen - len(self._buffer)
+        if len(batch) > room:
+            self.dropped += len(batch) - room
+            batch = batch[len(batch) - room:]
+        self._buffer.extendleft(reversed(batch))
+
+    async def _write(self, batch: list[UsageEvent]) -> None:
+        rows = [event.model_dump(exclude={"id"}) for event in batch]
+        async for session in get_session():
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+                await session.exec(insert(UsageEvent).values(rows[i:i + INSERT_CHUNK_ROWS]))
+            for statement in rollup_statements(session.bind.dialect.name, batch):
+                await session.exec(statement)
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SEC:
+                for statement in prune_statements():
+                    await session.exec(statement)
+                self._last_prune = time.monotonic()
+            await session.commit()
+            break
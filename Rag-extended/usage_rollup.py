@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import USAGE_ROLLUP_HOUR_RETENTION_DAYS, USAGE_ROLLUP_MINUTE_RETENTION_HOURS
+from models import UsageLatencyBin, UsageRollup
+
+GRANULARITIES = ("minute", "hour", "day", "total")
+# Histogram bin upper bounds; the last one catches everything slower
+LATENCY_BINS_MS = (
+    50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000,
+    5000, 7500, 10000, 15000, 20000, 30000, 60000, 2**31 - 1,
+)
+OVERFLOW_BIN_MS = LATENCY_BINS_MS[-1]
+_TOTAL_BUCKET = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_COUNTERS = (
+    "requests", "cached", "coalesced", "latency_count", "latency_sum_ms",
+    "prompt_tokens", "completion_tokens", "total_tokens", "cost_usd",
+)
+
+
+def _utc(ts: datetime) -> datetime:
+    # SQLite drops the offset on the way back; everything is written as UTC (models._utcnow)
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    ts = _utc(ts)
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "total":
+        return _TOTAL_BUCKET
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def latency_bin(latency_ms: int) -> int:
+    for bound in LATENCY_BINS_MS:
+        if latency_ms <= bound:
+            return bound
+    return OVERFLOW_BIN_MS
+
+
+def aggregate(events: Iterable[Any]) -> tuple[list[dict], list[dict]]:
+    """
+    Fold UsageEvent-like objects (attribute access) into rollup and latency
+    bin rows, one per (granularity, bucket, collection, model) key.
+    """
+    rollups: dict[tuple, dict] = {}
+    bins: dict[tuple, int] = {}
+    for e in events:
+        collection_id = e.collection_id or 0
+        latency = e.latency_ms
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(e.created_at, granularity), collection_id, e.model)
+            row = rollups.get(key)
+            if row is None:
+                row = rollups[key] = dict.fromkeys(_COUNTERS, 0)
+            row["requests"] += 1
+            row["cached"] += int(bool(e.cached))
+            row["coalesced"] += int(bool(e.coalesced))
+            row["prompt_tokens"] += e.prompt_tokens or 0
+            row["completion_tokens"] += e.completion_tokens or 0
+            row["total_tokens"] += e.total_tokens or 0
+            row["cost_usd"] += e.cost_usd or 0.0
+            if latency is not None:
+                row["latency_count"] += 1
+                row["latency_sum_ms"] += latency
+                bin_key = key + (latency_bin(latency),)
+                bins[bin_key] = bins.get(bin_key, 0) + 1
+    keys = ("granularity", "bucket_start", "collection_id", "model")
+    rollup_rows = [dict(zip(keys, k), **v) for k, v in rollups.items()]
+    bin_rows = [dict(zip(keys + ("le_ms",), k), count=v) for k, v in bins.items()]
+    return rollup_rows, bin_rows
+
+
+def _upsert(dialect_name: str, model, rows: list[dict], counters: tuple[str, ...]):
+    # Counters are added in the database, so concurrent writers never lose updates
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(model).values(rows)
+    table = model.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key.columns],
+        set_={c: table.c[c] + stmt.excluded[c] for c in counters},
+    )
+
+
+def rollup_statements(dialect_name: str, events: Iterable[Any], chunk_size: int = 500) -> list:
+    """Upserts that add these events to the rollup tables (caller executes and commits)."""
+    rollup_rows, bin_rows = aggregate(events)
+    statements = []
+    for i in range(0, len(rollup_rows), chunk_size):
+        statements.append(_upsert(dialect_name, UsageRollup, rollup_rows[i:i + chunk_size], _COUNTERS))
+    for i in range(0, len(bin_rows), chunk_size):
+        statements.append(_upsert(dialect_name, UsageLatencyBin, bin_rows[i:i + chunk_size], ("count",)))
+    return statements
+
+
+def prune_statements(now: datetime | None = None) -> list:
+    """Drop minute and hour buckets older than their retention windows."""
+    now = _utc(now or datetime.now(timezone.utc))
+    cutoffs = {
+        "minute": now - timedelta(hours=USAGE_ROLLUP_MINUTE_RETENTION_HOURS),
+        "hour": now - timedelta(days=USAGE_ROLLUP_HOUR_RETENTION_DAYS),
+    }
+    statements = []
+    for model in (UsageRollup, UsageLatencyBin):
+        for granularity, cutoff in cutoffs.items():
+            statements.append(
+                delete(model).where(model.granularity == granularity, model.bucket_start < cutoff)
+            )
+    return statements
+
+
+def percentile_from_bins(bins: dict[int, int], q: float) -> int | None:
+    """
+    Upper bound (ms) of the histogram bin holding the q-th percentile; None
+    when there is no data or the percentile lies past the last finite bound.
+    """
+    total = sum(bins.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound in sorted(bins):
+        seen += bins[bound]
+        if seen >= rank:
+            return None if bound == OVERFLOW_BIN_MS else bound
+    return None
@@ -1,4 +1,17 @@
-from typing import Any
+from typing import Any, Callable
+
+from xai_sdk.proto import collections_pb2
+
+STATUS_PROCESSED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_PROCESSED
+STATUS_FAILED = collections_pb2.DocumentStatus.DOCUMENT_STATUS_FAILED
+
+
+def status_is_processed(status: object) -> bool:
+    return status in ("DOCUMENT_STATUS_PROCESSED", STATUS_PROCESSED)
+
+
+def status_is_failed(status: object) -> bool:
+    return status in ("DOCUMENT_STATUS_FAILED", STATUS_FAILED)
 
 
 def extract_document_id(upload_resp: Any) -> str | None:
@@ -24,3 +37,27 @@ async def delete_collection_document(client: Any, collection_id: str, doc_id: st
         await client.files.delete(file_id=doc_id)
         return
     raise RuntimeError("No supported delete method found for xAI client.")
+
+
+async def upload_document_file(
+    client: Any,
+    collection_id: str,
+    path: str,
+    name: str,
+    fields: dict[str, str] | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+) -> str | None:
+    """Upload a file from disk into a collection without loading it into memory."""
+    if hasattr(client, "files") and hasattr(client.collections, "add_existing_document"):
+        # files.upload streams the file in chunks; the collection document id is the file id
+        uploaded = await client.files.upload(path, filename=name, on_progress=on_progress)
+        await client.collections.add_existing_document(
+            collection_id=collection_id, file_id=uploaded.id, fields=fields
+        )
+        return str(uploaded.id) if uploaded.id else None
+    with open(path, "rb") as f:
+        data = f.read()
+    upload_resp = await client.collections.upload_document(
+        collection_id=collection_id, name=name, data=data, fields=fields
+    )
+    return extract_document_id(upload_resp)
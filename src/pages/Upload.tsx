@@ -165,40 +165,40 @@ const Upload = () => {
     const headers: Record<string, string> = {};
     if (token) headers["Authorization"] = `Bearer ${token}`;
 
-    const results = await Promise.allSettled(
-      files.map(async (file) => {
-        const formData = new FormData();
-        formData.append("file", file);
-        if (category) formData.append("category", category);
-        if (tags.length > 0) formData.append("tags", tags.join(","));
-
-        const res = await fetch(`${API_BASE_URL}/collections/${collId}/upload`, {
-          method: "POST",
-          headers,
-          body: formData,
-        });
-
-        if (!res.ok) {
-          const err = await res.json().catch(() => ({}));
-          throw new Error(err.detail || res.statusText || "Upload failed");
-        }
-        return file.name;
-      })
-    );
-
-    const normalized = results.map((result, index) => {
-      const name = files[index]?.name || `file-${index + 1}`;
-      if (result.status === "fulfilled") {
-        return { name, status: "success" as const };
+    // One request for the whole selection; the server queues an ingest job
+    // per file (GET /jobs/{id}) and answers 202 before anything reaches xAI
+    const formData = new FormData();
+    files.forEach((file) => formData.append("files", file));
+    if (category) formData.append("category", category);
+    if (tags.length > 0) formData.append("tags", tags.join(","));
+
+    let normalized: { name: string; status: "success" | "failed"; message?: string }[];
+    try {
+      const res = await fetch(`${API_BASE_URL}/collections/${collId}/upload-batch`, {
+        method: "POST",
+        headers,
+        body: formData,
+      });
+      if (!res.ok) {
+        const err = await res.json().catch(() => ({}));
+        throw new Error(err.detail || res.statusText || "Upload failed");
       }
-      return { name, status: "failed" as const, message: (result.reason as Error)?.message };
-    });
+      const data = await res.json();
+      normalized = (data.results || []).map((r: { filename: string; status: string; error?: string }) =>
+        r.status === "queued"
+          ? { name: r.filename, status: "success" as const, message: "업로드 대기열에 등록됨" }
+          : { name: r.filename, status: "failed" as const, message: r.error }
+      );
+    } catch (e) {
+      const message = (e as Error)?.message;
+      normalized = files.map((file) => ({ name: file.name, status: "failed" as const, message }));
+    }
 
     setUploadResults(normalized);
 
     const failed = normalized.filter(r => r.status === "failed");
     const succeeded = normalized.length - failed.length;
-    if (succeeded > 0) toast.success(`${succeeded}개 파일 업로드 성공`);
+    if (succeeded > 0) toast.success(`${succeeded}개 파일 업로드 대기열 등록`);
     if (failed.length > 0) toast.error(`${failed.length}개 파일 업로드 실패`);
   };
 